@@ -4,8 +4,10 @@ from .models import (
     FuncionarioFuneraria, ClienteFuneraria, DependenteFuneraria,
     PlanoFuneraria, PagamentoFuneraria, ServicoPrestadoFuneraria,
     FunerariaStatus, FunerariaTipos, DependenteStatus, ClientePlano,
-    FormaPagamento # Adicionado FormaPagamento aqui
+    FormaPagamento, # Adicionado FormaPagamento aqui
+    TarefaExportacao
 )
+from .busca import BuscaTextualAdminMixin
 
 
 @admin.register(FuncionarioFuneraria)
@@ -95,10 +97,11 @@ class DependenteFunerariaInline(admin.TabularInline):
 
 
 @admin.register(ClienteFuneraria)
-class ClienteFunerariaAdmin(admin.ModelAdmin):
+class ClienteFunerariaAdmin(BuscaTextualAdminMixin, admin.ModelAdmin):
     list_display = ('nome', 'cpf', 'telefone', 'email', 'cliente_status', 'created_at')
     list_filter = ('cliente_status', 'data_nascimento', 'created_at')
     search_fields = ('nome', 'cpf', 'email', 'telefone')
+    busca_nome_fields = ('nome',) # Busca sem acentos e por relevância (funeraria/busca.py)
     ordering = ('nome',)
     readonly_fields = ('created_at', 'updated_at')
 
@@ -120,10 +123,11 @@ class ClienteFunerariaAdmin(admin.ModelAdmin):
 
 
 @admin.register(DependenteFuneraria)
-class DependenteFunerariaAdmin(admin.ModelAdmin):
+class DependenteFunerariaAdmin(BuscaTextualAdminMixin, admin.ModelAdmin):
     list_display = ('nome', 'cpf', 'cliente', 'genero', 'dependente_status', 'created_at')
     list_filter = ('genero', 'dependente_status', 'data_nascimento', 'created_at')
     search_fields = ('nome', 'cpf', 'cliente__nome')
+    busca_nome_fields = ('nome',) # Busca sem acentos e por relevância (funeraria/busca.py)
     ordering = ('nome',)
     readonly_fields = ('created_at', 'updated_at')
 
@@ -154,8 +158,10 @@ class FormaPagamentoAdmin(admin.ModelAdmin):
 
 @admin.register(PagamentoFuneraria)
 class PagamentoFunerariaAdmin(admin.ModelAdmin):
-    list_display = ('id', 'valor_pago', 'data_hora_pagto', 'status_pagamento', 'plano_funeraria', 'created_at')
-    list_filter = ('status_pagamento', 'data_hora_pagto')
+    list_display = (
+        'id', 'valor_pago', 'data_hora_pagto', 'status_pagamento', 'plano_funeraria', 'competencia', 'created_at'
+    )
+    list_filter = ('status_pagamento', 'data_hora_pagto', 'competencia')
     search_fields = ('status_pagamento__status', 'plano_funeraria__id')
     ordering = ('-data_hora_pagto',)
     readonly_fields = ('created_at',)
@@ -164,7 +170,7 @@ class PagamentoFunerariaAdmin(admin.ModelAdmin):
 
     fieldsets = (
         ('Informações do Pagamento', {
-            'fields': ('valor_pago', 'data_hora_pagto', 'status_pagamento')
+            'fields': ('valor_pago', 'data_hora_pagto', 'status_pagamento', 'competencia')
         }),
         ('Relacionamento', {
             'fields': ('plano_funeraria',)
@@ -197,6 +203,24 @@ class ServicoPrestadoFunerariaAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(TarefaExportacao)
+class TarefaExportacaoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'formato', 'status', 'linhas_processadas', 'total_linhas', 'funcionario', 'created_at')
+    list_filter = ('tipo', 'formato', 'status', 'created_at')
+    list_select_related = ('funcionario',)
+    ordering = ('-created_at',)
+    readonly_fields = (
+        'status', 'linhas_processadas', 'total_linhas', 'nome_arquivo', 'erro',
+        'created_at', 'iniciada_em', 'concluida_em'
+    )
+    exclude = ('arquivo',)
+    
+    @admin.display(description='Arquivo')
+    def nome_arquivo(self, obj):
+        # Sem link: o arquivo fica fora de MEDIA_ROOT e é baixado por /api/exportacoes/{id}/download/
+        return obj.arquivo.name or '-'
+
+
 # Customização do site admin
 admin.site.site_header = "Sistema de Gerenciamento Funerária"
 admin.site.site_title = "Funerária Admin"
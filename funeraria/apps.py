@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class FunerariaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'funeraria'
-    verbose_name = 'Sistema Funerária'
\ No newline at end of file
+    verbose_name = 'Sistema Funerária'
+
+    def ready(self):
+        from . import signals  # noqa: F401
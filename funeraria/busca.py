@@ -0,0 +1,145 @@
+# funeraria/busca.py
+
+import operator
+import unicodedata
+from functools import reduce
+
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import CharField, F, Q, Value
+from django.db.models.functions import Greatest, Lower
+from rest_framework import filters
+
+from .models import CONFIG_BUSCA, ClienteFuneraria, DependenteFuneraria, SemAcento
+
+
+def expressao_busca(campo):
+    """Expressão indexada (GIN trigram) usada na busca por nome"""
+    return SemAcento(Lower(campo))
+
+
+def vetor_busca(campo):
+    """Vetor full-text indexado (GIN) usado na busca por nome"""
+    return SearchVector(campo, config=CONFIG_BUSCA)
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, como f_unaccent(lower(...)) no banco"""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).strip()
+
+
+def busca_disponivel():
+    return connection.vendor == 'postgresql'
+
+
+def buscar(queryset, termo, campos_nome, campos_contem=()):
+    """
+    Filtra `queryset` pelo termo e anota `relevancia_busca`.
+
+    Nos `campos_nome` a comparação ignora acentos e usa três critérios
+    servidos pelos índices GIN: substring (LIKE), similaridade de palavras
+    por trigramas (%>) e full-text em português. Os `campos_contem` (CPF,
+    e-mail, telefone...) mantêm o icontains do SearchFilter, acelerado pelos
+    índices de trigramas sobre UPPER(campo).
+    """
+    normalizado = normalizar(termo)
+    consulta = SearchQuery(termo, config=CONFIG_BUSCA, search_type='websearch')
+    aliases = {}
+    condicoes = []
+    relevancias = []
+    for campo in campos_nome:
+        texto, vetor = f'_busca_{campo}', f'_vetor_{campo}'
+        aliases[texto] = expressao_busca(campo)
+        aliases[vetor] = vetor_busca(campo)
+        condicoes += [
+            Q(**{f'{texto}__contains': normalizado}),
+            Q(**{f'{texto}__trigram_word_similar': normalizado}),
+            Q(**{vetor: consulta}),
+        ]
+        relevancias += [TrigramWordSimilarity(normalizado, texto), SearchRank(F(vetor), consulta)]
+    condicoes += [Q(**{f'{campo}__icontains': termo}) for campo in campos_contem]
+
+    return (
+        queryset
+        .alias(**aliases)
+        .filter(reduce(operator.or_, condicoes))
+        .annotate(relevancia_busca=Greatest(*relevancias) if len(relevancias) > 1 else relevancias[0])
+    )
+
+
+def pessoas_por_cpf(cpf):
+    """
+    Clientes e dependentes com o CPF informado, com ou sem máscara.
+
+    Uma única consulta (UNION ALL) com uma leitura no índice único de
+    `cpf_numero` de cada tabela. O titular é o próprio cliente ou o cliente
+    do dependente.
+    """
+    campos = ('id', 'nome', 'cpf', 'tipo', 'titular_id', 'titular_nome')
+    clientes = ClienteFuneraria.objects.por_cpf(cpf).annotate(
+        tipo=Value('cliente', output_field=CharField()), titular_id=F('id'), titular_nome=F('nome')
+    ).values(*campos)
+    dependentes = DependenteFuneraria.objects.por_cpf(cpf).annotate(
+        tipo=Value('dependente', output_field=CharField()), titular_id=F('cliente_id'),
+        titular_nome=F('cliente__nome')
+    ).values(*campos)
+    return clientes.order_by().union(dependentes.order_by(), all=True)
+
+
+class BuscaTextualFilter(filters.SearchFilter):
+    """
+    SearchFilter com busca por nome sem acentos e ordenada por relevância.
+
+    Usado quando o ViewSet define `busca_nome_fields` e o banco é PostgreSQL;
+    os demais `search_fields` continuam com icontains. Nos outros bancos o
+    comportamento é o do SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        campos_nome = getattr(view, 'busca_nome_fields', None)
+        termo = request.query_params.get(self.search_param, '').replace('\x00', '').strip()
+        if not campos_nome or not termo or not busca_disponivel():
+            return super().filter_queryset(request, queryset, view)
+        campos_contem = [
+            campo for campo in self.get_search_fields(view, request) if campo not in campos_nome
+        ]
+        return buscar(queryset, termo, campos_nome, campos_contem)
+
+
+class OrdenacaoFilter(filters.OrderingFilter):
+    """OrderingFilter que, sem `?ordering=`, ordena resultados de busca por relevância"""
+
+    def filter_queryset(self, request, queryset, view):
+        if (self.ordering_param not in request.query_params
+                and 'relevancia_busca' in queryset.query.annotations):
+            return queryset.order_by('-relevancia_busca', *(self.get_default_ordering(view) or []))
+        return super().filter_queryset(request, queryset, view)
+
+
+class ChangeListBusca(ChangeList):
+    """ChangeList que, sem ordenação escolhida na tela, lista os resultados da busca por relevância"""
+
+    def get_ordering(self, request, queryset):
+        ordering = super().get_ordering(request, queryset)
+        if ORDER_VAR not in self.params and 'relevancia_busca' in queryset.query.annotations:
+            return ['-relevancia_busca'] + ordering
+        return ordering
+
+
+class BuscaTextualAdminMixin:
+    """Aplica `buscar()` à busca do Django admin para os `busca_nome_fields`"""
+    busca_nome_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.replace('\x00', '').strip()
+        if not self.busca_nome_fields or not search_term or not busca_disponivel():
+            return super().get_search_results(request, queryset, search_term)
+        campos_contem = [
+            campo for campo in self.get_search_fields(request) if campo not in self.busca_nome_fields
+        ]
+        return buscar(queryset, search_term, self.busca_nome_fields, campos_contem), False
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListBusca
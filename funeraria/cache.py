@@ -0,0 +1,152 @@
+# funeraria/cache.py
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from rest_framework.response import Response
+
+from .models import VersaoTabela
+
+
+def _cache():
+    alias = getattr(settings, 'CACHE_RESPOSTAS', 'default')
+    return caches[alias] if alias else None
+
+
+def invalidar(*models):
+    """
+    Incrementa a versão das tabelas dos modelos quando a transação corrente
+    for confirmada (imediatamente, fora de transação).
+
+    O incremento roda fora da transação de gravação: o lock da linha em
+    `versao_tabela` não fica preso até o commit (o que serializaria as
+    gravações concorrentes na mesma tabela) e gravações desfeitas por
+    rollback não invalidam o cache.
+
+    Chamado pelos signals de gravação e exclusão; operações que não disparam
+    signals (`bulk_create`, `QuerySet.update()`, SQL direto) devem chamá-lo.
+    """
+    tabelas = sorted({model._meta.db_table for model in models})
+    if tabelas:
+        transaction.on_commit(lambda: _incrementar_versoes(tabelas))
+
+
+def _incrementar_versoes(tabelas):
+    tabela = connection.ops.quote_name(VersaoTabela._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {tabela} (tabela, versao) VALUES {', '.join(['(%s, 1)'] * len(tabelas))} "
+            f"ON CONFLICT (tabela) DO UPDATE SET versao = {tabela}.versao + 1",
+            tabelas
+        )
+
+
+def versoes(models):
+    tabelas = sorted({model._meta.db_table for model in models})
+    atuais = dict(VersaoTabela.objects.filter(tabela__in=tabelas).values_list('tabela', 'versao'))
+    return [(tabela, atuais.get(tabela, 0)) for tabela in tabelas]
+
+
+def dependencias_padrao(model):
+    """
+    Modelos que uma resposta sobre `model` pode ler: o próprio modelo, os que
+    apontam para ele (pagamentos de um plano, dependentes de um cliente...) e,
+    a partir de todos eles, as FKs que os serializers percorrem
+    (pagamento -> plano -> tipo do plano).
+    """
+    app_label = model._meta.app_label
+    modelos = {model} | {relacao.related_model for relacao in model._meta.related_objects}
+    pendentes = list(modelos)
+    while pendentes:
+        atual = pendentes.pop()
+        for field in atual._meta.get_fields():
+            relacionado = field.related_model if field.is_relation and field.concrete else None
+            if relacionado and relacionado._meta.app_label == app_label and relacionado not in modelos:
+                modelos.add(relacionado)
+                pendentes.append(relacionado)
+    return modelos
+
+
+def perfil_permissoes(user):
+    if not user or not user.is_authenticated:
+        return 'anonimo'
+    if user.is_superuser:
+        return 'superusuario'
+    return f"{user.is_staff}:{','.join(sorted(user.get_all_permissions()))}"
+
+
+def chave_resposta(request, dependencias, variacao=None):
+    partes = [
+        perfil_permissoes(request.user),
+        request.build_absolute_uri(request.path),
+        sorted(request.query_params.lists()),
+        request.accepted_media_type,
+        versoes(dependencias),
+        variacao,
+    ]
+    return 'resposta:' + hashlib.sha256(repr(partes).encode()).hexdigest()
+
+
+class RespostaEmCache(Exception):
+    """Interrompe o processamento do ViewSet devolvendo a resposta guardada"""
+
+    def __init__(self, resposta):
+        self.resposta = resposta
+
+
+class CacheRespostaMixin:
+    """
+    Cache das respostas GET de um ViewSet, sem expiração por tempo.
+
+    A chave combina o perfil de permissões do usuário, a URL, os parâmetros,
+    o formato negociado e a versão de cada tabela em `cache_dependencias`
+    (por padrão `dependencias_padrao()` do modelo do queryset). Como toda
+    gravação incrementa a versão das tabelas alteradas, uma resposta em cache
+    nunca é servida depois que os dados mudam. Views que dependem da data
+    corrente (ex.: totais do mês) incluem o período em `get_cache_variacao()`.
+    Só respostas 200 do DRF são guardadas; downloads (FileResponse,
+    streaming) passam direto.
+    """
+    cache_dependencias = None
+    cache_acoes_ignoradas = ('exportar_csv', 'exportar_xlsx')
+
+    def get_cache_dependencias(self):
+        if self.cache_dependencias is not None:
+            return self.cache_dependencias
+        return dependencias_padrao(self.queryset.model)
+
+    def get_cache_variacao(self):
+        """Parte extra da chave, para respostas que mudam sem gravações (ex.: o mês corrente)"""
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.chave_cache = None
+        cache = _cache()
+        if cache is None or request.method not in ('GET', 'HEAD') or self.action in self.cache_acoes_ignoradas:
+            return
+        # Requisições perfiladas (funeraria/perfilamento.py) medem a view, não o cache
+        if getattr(request, 'perfilando', False):
+            return
+        # As versões são lidas antes das consultas da view: a resposta gerada é no mínimo tão nova quanto a chave
+        self.chave_cache = chave_resposta(request, self.get_cache_dependencias(), self.get_cache_variacao())
+        dados = cache.get(self.chave_cache)
+        if dados is not None:
+            raise RespostaEmCache(Response(dados))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, RespostaEmCache):
+            self.chave_cache = None
+            exc.resposta['X-Cache'] = 'HIT'
+            return exc.resposta
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        chave = getattr(self, 'chave_cache', None)
+        if chave and isinstance(response, Response) and response.status_code == 200 and not response.exception:
+            _cache().set(chave, response.data, None)
+            response['X-Cache'] = 'MISS'
+        return response
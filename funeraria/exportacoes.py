@@ -0,0 +1,215 @@
+# funeraria/exportacoes.py
+
+import csv
+import itertools
+import tempfile
+from datetime import datetime
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from rest_framework.decorators import action
+
+TAMANHO_LOTE = 2000
+LINHAS_POR_BLOCO = 500
+LINHAS_POR_TABELA_PDF = 200
+LIMITE_LINHAS_PDF = 5000
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CONTENT_TYPE_PDF = 'application/pdf'
+
+
+def formatar_data(valor):
+    return timezone.localtime(valor).strftime('%d/%m/%Y') if valor else ''
+
+
+def formatar_data_hora(valor):
+    return timezone.localtime(valor).strftime('%d/%m/%Y %H:%M') if valor else ''
+
+
+class Coluna:
+    """Coluna de exportação: título, caminho no ORM e formatador opcional"""
+
+    def __init__(self, titulo, campo, formatador=None):
+        self.titulo = titulo
+        self.campo = campo
+        self.formatador = formatador
+
+
+def iterar_linhas(queryset, colunas, formatar=True, tamanho_lote=TAMANHO_LOTE):
+    """
+    Percorre o queryset buscando apenas as colunas exportadas.
+
+    Usa `values_list()` com `iterator()`, que no PostgreSQL abre um cursor
+    no servidor, de modo que apenas um lote fica em memória por vez.
+    """
+    campos = [coluna.campo for coluna in colunas]
+    formatadores = [
+        (i, coluna.formatador) for i, coluna in enumerate(colunas)
+        if coluna.formatador and formatar
+    ]
+    linhas = (
+        queryset
+        .select_related(None)
+        .prefetch_related(None)
+        .values_list(*campos)
+        .iterator(chunk_size=tamanho_lote)
+    )
+    for linha in linhas:
+        if formatadores:
+            linha = list(linha)
+            for i, formatador in formatadores:
+                linha[i] = formatador(linha[i])
+        yield linha
+
+
+class _Eco:
+    """Pseudo-arquivo que devolve o que recebe, para uso com csv.writer"""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(cabecalho, linhas, linhas_por_bloco=LINHAS_POR_BLOCO):
+    writer = csv.writer(_Eco())
+    bloco = [writer.writerow(cabecalho)]
+    for linha in linhas:
+        bloco.append(writer.writerow(linha))
+        if len(bloco) >= linhas_por_bloco:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+def resposta_csv(queryset, colunas, nome_arquivo):
+    """StreamingHttpResponse com o CSV do queryset, em memória constante"""
+    response = StreamingHttpResponse(
+        gerar_csv([coluna.titulo for coluna in colunas], iterar_linhas(queryset, colunas)),
+        content_type='text/csv'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
+
+
+def _celula_xlsx(valor):
+    # O Excel não armazena fuso horário: grava a data/hora local
+    if isinstance(valor, datetime) and timezone.is_aware(valor):
+        return timezone.localtime(valor).replace(tzinfo=None)
+    return valor
+
+
+def escrever_xlsx(destino, planilhas):
+    """
+    Grava um XLSX com o modo write-only do openpyxl.
+
+    `planilhas` é uma sequência de (título, cabeçalho, linhas); as linhas
+    podem ser geradores e são gravadas à medida que são consumidas.
+    """
+    workbook = Workbook(write_only=True)
+    for titulo, cabecalho, linhas in planilhas:
+        planilha = workbook.create_sheet(title=titulo)
+        planilha.append(cabecalho)
+        for linha in linhas:
+            planilha.append([_celula_xlsx(valor) for valor in linha])
+    workbook.save(destino)
+
+
+def _tabela_pdf(cabecalho, linhas):
+    tabela = Table([cabecalho] + linhas, repeatRows=1)
+    tabela.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#417690')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f2f2f2')]),
+    ]))
+    return tabela
+
+
+def escrever_pdf(destino, titulo, secoes, resumo=(), limite_linhas=LIMITE_LINHAS_PDF):
+    """
+    Grava um PDF de resumo com flowables do reportlab.
+
+    `secoes` é uma sequência de (subtítulo, cabeçalho, linhas). As linhas são
+    quebradas em tabelas de tamanho fixo para que a paginação não precise
+    medir uma única tabela enorme; cada seção é limitada a `limite_linhas`.
+    """
+    estilos = getSampleStyleSheet()
+    story = [
+        Paragraph(titulo, estilos['Title']),
+        Paragraph(f"Gerado em {timezone.localtime().strftime('%d/%m/%Y %H:%M')}", estilos['Normal']),
+        Spacer(1, 12),
+    ]
+    if resumo:
+        story.append(_tabela_pdf(['Indicador', 'Valor'], [[rotulo, str(valor)] for rotulo, valor in resumo]))
+        story.append(Spacer(1, 12))
+
+    for subtitulo, cabecalho, linhas in secoes:
+        story.append(Paragraph(subtitulo, estilos['Heading2']))
+        lote = []
+        total = 0
+        for linha in itertools.islice(linhas, limite_linhas + 1):
+            total += 1
+            if total > limite_linhas:
+                break
+            lote.append(['' if valor is None else str(valor) for valor in linha])
+            if len(lote) == LINHAS_POR_TABELA_PDF:
+                story.append(_tabela_pdf(cabecalho, lote))
+                lote = []
+        if lote:
+            story.append(_tabela_pdf(cabecalho, lote))
+        if total > limite_linhas:
+            story.append(Paragraph(
+                f'Exibindo as primeiras {limite_linhas} linhas. Use a exportação XLSX para o relatório completo.',
+                estilos['Italic']
+            ))
+        story.append(Spacer(1, 12))
+
+    SimpleDocTemplate(destino, pagesize=landscape(A4), title=titulo).build(story)
+
+
+def _resposta_arquivo(escrever, nome_arquivo, content_type):
+    # O documento é gravado em arquivo temporário e enviado em blocos a partir do disco
+    arquivo = tempfile.TemporaryFile()
+    escrever(arquivo)
+    arquivo.seek(0)
+    return FileResponse(arquivo, as_attachment=True, filename=nome_arquivo, content_type=content_type)
+
+
+def resposta_xlsx(nome_arquivo, planilhas):
+    return _resposta_arquivo(
+        lambda arquivo: escrever_xlsx(arquivo, planilhas), nome_arquivo, CONTENT_TYPE_XLSX
+    )
+
+
+def resposta_pdf(nome_arquivo, titulo, secoes, resumo=()):
+    return _resposta_arquivo(
+        lambda arquivo: escrever_pdf(arquivo, titulo, secoes, resumo), nome_arquivo, CONTENT_TYPE_PDF
+    )
+
+
+class ExportacaoMixin:
+    """Adiciona as actions `exportar_csv` e `exportar_xlsx` a um ViewSet que defina `colunas_exportacao`"""
+    colunas_exportacao = []
+    nome_exportacao = 'exportacao'
+
+    @action(detail=False)
+    def exportar_csv(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return resposta_csv(queryset, self.colunas_exportacao, f'{self.nome_exportacao}.csv')
+
+    @action(detail=False)
+    def exportar_xlsx(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        colunas = self.colunas_exportacao
+        return resposta_xlsx(f'{self.nome_exportacao}.xlsx', [(
+            self.nome_exportacao.capitalize(),
+            [coluna.titulo for coluna in colunas],
+            iterar_linhas(queryset, colunas, formatar=False),
+        )])
@@ -0,0 +1,108 @@
+# funeraria/faturamento.py
+
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from . import registro, resumos
+from .cache import invalidar
+from .models import ClientePlano, PagamentoFuneraria, PlanoFuneraria
+
+TAMANHO_LOTE = 5000
+# Chave do pg_advisory_xact_lock que serializa execuções do faturamento de uma mesma competência
+TRAVA_FATURAMENTO = 7301
+
+
+def competencia(valor=None):
+    """Primeiro dia do mês de `valor` (date ou 'AAAA-MM'); o mês corrente se não informado"""
+    if valor is None:
+        valor = timezone.localdate()
+    elif not isinstance(valor, date):
+        try:
+            ano, mes = (int(parte) for parte in str(valor).split('-'))
+            valor = date(ano, mes, 1)
+        except ValueError:
+            raise ValueError('Competência inválida. Use AAAA-MM.')
+    return valor.replace(day=1)
+
+
+def fim_do_mes(inicio):
+    return (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def planos_a_faturar(inicio):
+    """
+    Planos com mensalidade na competência que começa em `inicio`: algum vínculo
+    ativo vigente no mês, valor mensal positivo, plano não encerrado antes do
+    mês e ainda sem cobrança da competência.
+    """
+    fim = fim_do_mes(inicio)
+    vinculos = ClientePlano.objects.filter(plano=OuterRef('pk'), ativo=True, data_inicio__lte=fim).filter(
+        Q(data_fim__isnull=True) | Q(data_fim__gte=inicio)
+    )
+    cobrados = PagamentoFuneraria.objects.filter(plano_funeraria=OuterRef('pk'), competencia=inicio)
+    return (
+        PlanoFuneraria.objects
+        .filter(Exists(vinculos), valor_mensal__gt=0)
+        .filter(Q(data_fim__isnull=True) | Q(data_fim__gte=inicio))
+        .exclude(Exists(cobrados))
+        .order_by('pk')
+    )
+
+
+class ResultadoFaturamento:
+
+    def __init__(self, inicio):
+        self.competencia = inicio
+        self.geradas = 0
+        self.valor_total = Decimal('0')
+        self.ja_faturadas = 0
+
+    def como_dict(self):
+        return {
+            'competencia': self.competencia.strftime('%Y-%m'),
+            'cobrancas_geradas': self.geradas,
+            'valor_total': str(self.valor_total),
+            'cobrancas_existentes': self.ja_faturadas,
+        }
+
+
+def faturar(valor_competencia=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Gera as mensalidades pendentes da competência para todos os planos a
+    faturar, lidos numa única consulta e gravados com bulk_create em blocos.
+
+    Pode ser executado de novo: planos já cobrados na competência são
+    ignorados, execuções simultâneas da mesma competência esperam pela
+    trava e a restrição única (plano, competência) garante o resto.
+    """
+    inicio = competencia(valor_competencia)
+    resultado = ResultadoFaturamento(inicio)
+    status_pendente = registro.status.por_nome('Pendente', 'pagamento').pk
+    agora = timezone.now()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s, %s)', [TRAVA_FATURAMENTO, inicio.year * 100 + inicio.month]
+            )
+        resultado.ja_faturadas = PagamentoFuneraria.objects.filter(competencia=inicio).count()
+
+        planos = planos_a_faturar(inicio).values_list('pk', 'valor_mensal').iterator(chunk_size=tamanho_lote)
+        while bloco := list(islice(planos, tamanho_lote)):
+            criados = PagamentoFuneraria.objects.bulk_create([
+                PagamentoFuneraria(
+                    plano_funeraria_id=plano_id, valor_pago=valor_mensal, data_hora_pagto=agora,
+                    status_pagamento_id=status_pendente, competencia=inicio,
+                )
+                for plano_id, valor_mensal in bloco
+            ])
+            resumos.registrar_criados(criados)
+            resultado.geradas += len(criados)
+            resultado.valor_total += sum(valor_mensal for _, valor_mensal in bloco)
+        if resultado.geradas:
+            invalidar(PagamentoFuneraria)
+    return resultado
@@ -0,0 +1,647 @@
+# funeraria/importacoes.py
+
+import csv
+import io
+import json
+import zipfile
+from datetime import date, datetime, time
+from itertools import islice
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from . import registro, resumos
+from .cache import invalidar
+from .models import (
+    ClienteFuneraria, DependenteFuneraria, DependenteStatus, FunerariaStatus, PagamentoFuneraria,
+    PlanoFuneraria, normalizar_cpf
+)
+
+TAMANHO_LOTE = 1000
+FORMATOS = ('json', 'csv')
+FORMATOS_PLANILHA = ('csv', 'xlsx')
+FORMATOS_DATA_HORA = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y')
+
+
+class ArquivoInvalido(ValueError):
+    """O lote não pôde ser lido (formato, codificação ou estrutura)"""
+
+
+def formato_do_arquivo(nome, content_type='', formatos=FORMATOS):
+    extensao = nome.rsplit('.', 1)[-1].lower() if '.' in nome else ''
+    if extensao in formatos:
+        return extensao
+    for formato, trecho in (('csv', 'csv'), ('json', 'json'), ('xlsx', 'spreadsheetml')):
+        if formato in formatos and trecho in content_type:
+            return formato
+    raise ArquivoInvalido(f'Formato não reconhecido: use {", ".join(formatos)}')
+
+
+def ler_linhas(conteudo, formato, chave_json=None):
+    """
+    Linhas (dicionários) de um lote JSON ou CSV.
+
+    O JSON é uma lista de objetos ou um objeto com a lista em `chave_json`;
+    o CSV tem cabeçalho e usa vírgula ou ponto e vírgula como separador.
+    """
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ArquivoInvalido('O arquivo deve estar em UTF-8')
+    if formato == 'json':
+        try:
+            dados = json.loads(conteudo)
+        except ValueError as exc:
+            raise ArquivoInvalido(f'JSON inválido: {exc}')
+        return linhas_json(dados, chave_json)
+    if formato == 'csv':
+        amostra = conteudo[:4096]
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;')
+        except csv.Error:
+            dialeto = csv.excel
+        return list(csv.DictReader(io.StringIO(conteudo), dialect=dialeto))
+    raise ArquivoInvalido(f'Formato não reconhecido: use {", ".join(FORMATOS)}')
+
+
+def iterar_linhas(arquivo, formato):
+    """
+    Linhas (dicionários) de um arquivo binário CSV ou XLSX, lidas sob demanda.
+
+    O CSV é decodificado aos poucos; o XLSX é aberto pelo openpyxl em modo
+    read_only, que percorre a primeira planilha sem carregá-la inteira.
+    """
+    if formato == 'csv':
+        return _linhas_csv(arquivo)
+    if formato == 'xlsx':
+        return _linhas_xlsx(arquivo)
+    raise ArquivoInvalido(f'Formato não reconhecido: use {", ".join(FORMATOS_PLANILHA)}')
+
+
+def _linhas_csv(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    try:
+        amostra = texto.read(4096)
+        texto.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;')
+        except csv.Error:
+            dialeto = csv.excel
+        yield from csv.DictReader(texto, dialect=dialeto)
+    except UnicodeDecodeError:
+        raise ArquivoInvalido('O arquivo deve estar em UTF-8')
+    finally:
+        # O arquivo continua sendo de quem o abriu
+        texto.detach()
+
+
+def _linhas_xlsx(arquivo):
+    try:
+        planilha = load_workbook(arquivo, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError) as exc:
+        raise ArquivoInvalido(f'XLSX inválido: {exc}')
+    try:
+        linhas = planilha.active.iter_rows(values_only=True)
+        cabecalho = [str(valor).strip() if valor is not None else '' for valor in next(linhas, ())]
+        for valores in linhas:
+            if any(valor not in (None, '') for valor in valores):
+                yield dict(zip(cabecalho, valores))
+    finally:
+        planilha.close()
+
+
+def linhas_json(dados, chave_json=None):
+    if isinstance(dados, dict) and chave_json:
+        dados = dados.get(chave_json)
+    if not isinstance(dados, list) or not all(isinstance(linha, dict) for linha in dados):
+        raise ArquivoInvalido('O lote deve ser uma lista de objetos')
+    return dados
+
+
+def linhas_da_requisicao(request, chave_json):
+    """Linhas enviadas como arquivo (multipart, campo `arquivo`), corpo text/csv ou corpo JSON"""
+    if request.content_type.startswith('text/csv'):
+        return ler_linhas(request.body, 'csv')
+    arquivo = request.FILES.get('arquivo')
+    if arquivo is not None:
+        formato = request.query_params.get('formato') or formato_do_arquivo(arquivo.name, arquivo.content_type)
+        return ler_linhas(arquivo.read(), formato, chave_json)
+    return linhas_json(request.data, chave_json)
+
+
+def _valor(linha, nomes):
+    """Primeiro valor não vazio da linha entre os nomes aceitos para a coluna"""
+    for nome in nomes:
+        valor = linha.get(nome)
+        if isinstance(valor, str):
+            valor = valor.strip()
+        if valor not in (None, ''):
+            return valor
+    return None
+
+
+def _decimal(valor):
+    # Aceita "1234.56", "1234,56" e "1.234,56"
+    if isinstance(valor, str) and ',' in valor:
+        valor = valor.replace('.', '').replace(',', '.')
+    return valor
+
+
+def _data_hora(valor):
+    """Data/hora ISO 8601 ou no formato das exportações (dd/mm/aaaa hh:mm), no fuso local se não informado"""
+    if isinstance(valor, datetime):
+        momento = valor
+    else:
+        valor = str(valor)
+        try:
+            momento = parse_datetime(valor)
+            if momento is None:
+                data = parse_date(valor)
+                momento = datetime.combine(data, time()) if data else None
+        except ValueError:
+            momento = None
+        for formato in FORMATOS_DATA_HORA:
+            if momento is not None:
+                break
+            try:
+                momento = datetime.strptime(valor, formato)
+            except ValueError:
+                pass
+        if momento is None:
+            raise ValidationError('Data/hora inválida. Use AAAA-MM-DDTHH:MM ou DD/MM/AAAA HH:MM.')
+    return timezone.make_aware(momento) if timezone.is_naive(momento) else momento
+
+
+def _data(valor):
+    """Data ISO (AAAA-MM-DD), no formato das exportações (dd/mm/aaaa) ou célula de data do XLSX"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    valor = str(valor)
+    try:
+        data = parse_date(valor)
+    except ValueError:
+        data = None
+    if data is None:
+        try:
+            data = datetime.strptime(valor, '%d/%m/%Y').date()
+        except ValueError:
+            raise ValidationError('Data inválida. Use AAAA-MM-DD ou DD/MM/AAAA.')
+    return data
+
+
+def _inteiro(valor):
+    try:
+        return int(str(valor).strip())
+    except ValueError:
+        return None
+
+
+class ResultadoImportacao:
+    """Quantidade importada e erros por linha (numeradas a partir de 1, sem contar o cabeçalho)"""
+
+    def __init__(self, total=0):
+        self.total = total
+        self.importados = 0
+        self.erros = []
+
+    def erro(self, linha, erros):
+        self.erros.append({'linha': linha, 'erros': erros})
+
+    def como_dict(self):
+        return {
+            'total_linhas': self.total,
+            'importados': self.importados,
+            'rejeitados': len(self.erros),
+            'erros': self.erros,
+        }
+
+
+# Colunas aceitas para cada campo: nome do campo, variações e o título usado na exportação CSV
+COLUNAS_PAGAMENTO = {
+    'plano_funeraria': ('plano_funeraria', 'plano_funeraria_id', 'plano', 'Plano'),
+    'valor_pago': ('valor_pago', 'Valor Pago'),
+    'data_hora_pagto': ('data_hora_pagto', 'Data/Hora Pagamento'),
+    'status_pagamento': ('status_pagamento', 'status_pagamento_id', 'Status'),
+}
+
+
+def _plano(valor, planos_existentes):
+    pk = _inteiro(valor)
+    if pk is None:
+        raise ValidationError('Informe o id do plano.')
+    if pk not in planos_existentes:
+        raise ValidationError(f'Plano {pk} não existe.')
+    return pk
+
+
+def _valor_pago(valor, campo):
+    valor = campo.clean(_decimal(valor), None)
+    if valor <= 0:
+        raise ValidationError('O valor pago deve ser maior que zero.')
+    return valor
+
+
+def _status_por_id_ou_nome(valor, status_validos, por_nome, rotulo):
+    """Status pelo id (entre `status_validos`) ou pelo nome, via `por_nome`"""
+    pk = _inteiro(valor)
+    if pk is not None:
+        if pk not in status_validos:
+            raise ValidationError(f'{rotulo} {pk} não existe.')
+        return pk
+    try:
+        return por_nome(str(valor)).pk
+    except (FunerariaStatus.DoesNotExist, DependenteStatus.DoesNotExist):
+        raise ValidationError(f'{rotulo} "{valor}" não existe.')
+
+
+def _status_pagamento(valor, status_validos):
+    """Status da categoria 'pagamento' pelo id ou pelo nome"""
+    return _status_por_id_ou_nome(
+        valor, status_validos, lambda nome: registro.status.por_nome(nome, 'pagamento'), 'Status de pagamento'
+    )
+
+
+def validar_linhas(linhas, colunas, conversores, opcionais=(), inicio=1):
+    """
+    Aplica os `conversores` (campo -> função) aos valores das `colunas` de
+    cada linha; devolve [(número da linha, dados convertidos, erros por campo)].
+    Campos `opcionais` vazios ficam como None, sem passar pelo conversor.
+    """
+    validadas = []
+    for numero, linha in enumerate(linhas, start=inicio):
+        dados, erros = {}, {}
+        for campo, nomes in colunas.items():
+            valor = _valor(linha, nomes)
+            if valor is None:
+                if campo in opcionais:
+                    dados[campo] = None
+                else:
+                    erros[campo] = ['Este campo é obrigatório.']
+                continue
+            try:
+                dados[campo] = conversores[campo](valor)
+            except ValidationError as exc:
+                erros[campo] = exc.messages
+        validadas.append((numero, dados, erros))
+    return validadas
+
+
+def validar_pagamentos(linhas):
+    """
+    Valida as linhas e devolve (pagamentos não salvos, [(número da linha, erros)]).
+
+    Planos e status são conferidos contra conjuntos de ids carregados uma
+    única vez para o lote inteiro (uma consulta para os planos, o registro
+    em memória para os status), sem consulta por linha.
+    """
+    ids_planos = {_inteiro(_valor(linha, COLUNAS_PAGAMENTO['plano_funeraria'])) for linha in linhas} - {None}
+    planos_existentes = set(PlanoFuneraria.objects.filter(pk__in=ids_planos).values_list('pk', flat=True))
+    status_validos = registro.status.ids_validos('pagamento')
+    campo_valor = PagamentoFuneraria._meta.get_field('valor_pago')
+    conversores = {
+        'plano_funeraria': lambda valor: _plano(valor, planos_existentes),
+        'valor_pago': lambda valor: _valor_pago(valor, campo_valor),
+        'data_hora_pagto': _data_hora,
+        'status_pagamento': lambda valor: _status_pagamento(valor, status_validos),
+    }
+
+    pagamentos, erros = [], []
+    for numero, dados, erros_linha in validar_linhas(linhas, COLUNAS_PAGAMENTO, conversores):
+        if erros_linha:
+            erros.append((numero, erros_linha))
+            continue
+        pagamentos.append(PagamentoFuneraria(
+            plano_funeraria_id=dados['plano_funeraria'],
+            valor_pago=dados['valor_pago'],
+            data_hora_pagto=dados['data_hora_pagto'],
+            status_pagamento_id=dados['status_pagamento'],
+        ))
+    return pagamentos, erros
+
+
+def importar_pagamentos(linhas, tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa um lote de pagamentos: linhas inválidas são devolvidas com os
+    erros e as válidas são gravadas com bulk_create em blocos de
+    `tamanho_lote`, numa única transação. Como bulk_create não dispara
+    signals, os resumos do dashboard e as versões do cache são atualizados aqui.
+    """
+    resultado = ResultadoImportacao(len(linhas))
+    pagamentos, erros = validar_pagamentos(linhas)
+    for numero, erros_linha in erros:
+        resultado.erro(numero, erros_linha)
+    if pagamentos:
+        with transaction.atomic():
+            criados = []
+            for inicio in range(0, len(pagamentos), tamanho_lote):
+                criados += PagamentoFuneraria.objects.bulk_create(pagamentos[inicio:inicio + tamanho_lote])
+            resumos.registrar_criados(criados)
+            invalidar(PagamentoFuneraria)
+        resultado.importados = len(criados)
+    return resultado
+
+
+# Pesos dos dígitos verificadores do CPF e posição de cada dígito no número
+PESOS_CPF_1 = np.arange(10, 1, -1)
+PESOS_CPF_2 = np.arange(11, 1, -1)
+POTENCIAS_CPF = 10 ** np.arange(10, -1, -1, dtype=np.int64)
+ESPACOS = np.frombuffer(b' \t\n\r\f\v', dtype=np.uint8)
+
+
+def _digitos_cpf(valor):
+    # Células numéricas do XLSX perdem os zeros à esquerda
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    if isinstance(valor, int):
+        return f'{valor:011d}'
+    return normalizar_cpf(valor) if isinstance(valor, str) else ''
+
+
+def validar_cpfs(valores):
+    """
+    Confere os dígitos verificadores de um lote de CPFs de uma vez.
+
+    Os dígitos viram uma matriz (n x 11) e as duas somas ponderadas são
+    produtos matriciais, com as mesmas regras de `validate_cpf`. Devolve
+    (válidos, números): um array booleano e os CPFs como int64 (0 nos inválidos).
+    """
+    digitos = [_digitos_cpf(valor) for valor in valores]
+    tamanho_ok = np.fromiter((len(cpf) == 11 for cpf in digitos), dtype=bool, count=len(digitos))
+    texto = ''.join(cpf if len(cpf) == 11 else '0' * 11 for cpf in digitos).encode('ascii')
+    matriz = (np.frombuffer(texto, dtype=np.uint8).reshape(-1, 11) - ord('0')).astype(np.int64)
+
+    resto = (matriz[:, :9] @ PESOS_CPF_1) % 11
+    primeiro = np.where(resto < 2, 0, 11 - resto)
+    resto = (matriz[:, :10] @ PESOS_CPF_2) % 11
+    segundo = np.where(resto < 2, 0, 11 - resto)
+    repetidos = (matriz == matriz[:, :1]).all(axis=1)
+
+    validos = tamanho_ok & ~repetidos & (matriz[:, 9] == primeiro) & (matriz[:, 10] == segundo)
+    return validos, np.where(validos, matriz @ POTENCIAS_CPF, 0)
+
+
+def validar_telefones(valores):
+    """
+    Confere um lote de telefones no formato dos modelos, (99) 9999-9999 ou
+    (99) 99999-9999, comparando posição a posição uma matriz de bytes.
+    """
+    textos = [valor if isinstance(valor, str) else '' for valor in valores]
+    tamanhos = np.fromiter(map(len, textos), dtype=np.int64, count=len(textos))
+    bytes_ = np.array([texto.encode('ascii', 'replace') for texto in textos], dtype='S15')
+    matriz = bytes_.view(np.uint8).reshape(-1, 15)
+    digito = (matriz >= ord('0')) & (matriz <= ord('9'))
+
+    ddd = (
+        (matriz[:, 0] == ord('(')) & digito[:, 1] & digito[:, 2] & (matriz[:, 3] == ord(')'))
+        & np.isin(matriz[:, 4], ESPACOS)
+    )
+    fixo = (tamanhos == 14) & digito[:, 5:9].all(axis=1) & (matriz[:, 9] == ord('-')) & digito[:, 10:14].all(axis=1)
+    celular = (
+        (tamanhos == 15) & digito[:, 5:10].all(axis=1) & (matriz[:, 10] == ord('-'))
+        & digito[:, 11:15].all(axis=1)
+    )
+    return ddd & (fixo | celular)
+
+
+def formatar_cpf(numero):
+    cpf = f'{numero:011d}'
+    return f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}'
+
+
+COLUNAS_CLIENTE = {
+    'nome': ('nome', 'Nome'),
+    'cpf': ('cpf', 'CPF'),
+    'data_nascimento': ('data_nascimento', 'Data Nascimento'),
+    'telefone': ('telefone', 'Telefone'),
+    'endereco': ('endereco', 'Endereço'),
+    'email': ('email', 'Email'),
+    'cliente_status': ('cliente_status', 'cliente_status_id', 'Status'),
+}
+
+COLUNAS_DEPENDENTE = {
+    'nome': ('nome', 'Nome'),
+    'cpf': ('cpf', 'CPF'),
+    'data_nascimento': ('data_nascimento', 'Data Nascimento'),
+    'genero': ('genero', 'Gênero'),
+    'telefone': ('telefone', 'Telefone'),
+    'endereco': ('endereco', 'Endereço'),
+    'cliente_cpf': ('cliente_cpf', 'CPF do Cliente'),
+    'dependente_status': ('dependente_status', 'dependente_status_id', 'Status'),
+}
+
+GENEROS = {
+    **{chave.lower(): chave for chave, _ in DependenteFuneraria.GENERO_CHOICES},
+    **{rotulo.lower(): chave for chave, rotulo in DependenteFuneraria.GENERO_CHOICES},
+}
+
+
+def _texto(campo):
+    """Conversor pelo `clean` do campo do modelo (obrigatoriedade, tamanho e validadores)"""
+    return lambda valor: campo.clean(str(valor), None)
+
+
+def _data_nascimento(valor):
+    data = _data(valor)
+    if data > timezone.now().date():
+        raise ValidationError('A data de nascimento não pode ser no futuro.')
+    return data
+
+
+def _genero(valor):
+    try:
+        return GENEROS[str(valor).strip().lower()]
+    except KeyError:
+        raise ValidationError('Gênero inválido. Use M, F ou O.')
+
+
+def _titular(valor, titulares):
+    if valor not in titulares:
+        raise ValidationError('CPF do cliente inválido.')
+    if titulares[valor] is None:
+        raise ValidationError(f'Cliente com CPF {valor} não encontrado.')
+    return titulares[valor]
+
+
+class ImportacaoPessoas:
+    """
+    Importação de clientes e dependentes lida em blocos de `tamanho_lote` linhas.
+
+    Cada bloco é validado de uma vez: CPFs e telefones por validar_cpfs() e
+    validar_telefones(), a unicidade dos CPFs numa consulta por `cpf_numero`
+    (mais os CPFs já aceitos no arquivo) e os titulares dos dependentes em
+    outra, pelo CPF do cliente, inclusive os importados antes na mesma
+    transação. As linhas válidas são gravadas com bulk_create.
+    """
+
+    def __init__(self, funcionario, tamanho_lote=TAMANHO_LOTE):
+        self.funcionario_id = funcionario.pk
+        self.tamanho_lote = tamanho_lote
+        campo = ClienteFuneraria._meta.get_field
+        status_cliente = registro.status.ids_validos('cliente')
+        self.conversores_cliente = {
+            'nome': _texto(campo('nome')),
+            'cpf': _digitos_cpf,
+            'data_nascimento': _data_nascimento,
+            'telefone': str,
+            'endereco': _texto(campo('endereco')),
+            'email': _texto(campo('email')),
+            'cliente_status': lambda valor: _status_por_id_ou_nome(
+                valor, status_cliente, lambda nome: registro.status.por_nome(nome, 'cliente'), 'Status de cliente'
+            ),
+        }
+        campo = DependenteFuneraria._meta.get_field
+        status_dependente = {status.pk for status in registro.status_dependente.todos()}
+        self.conversores_dependente = {
+            'nome': _texto(campo('nome')),
+            'cpf': _digitos_cpf,
+            'data_nascimento': _data_nascimento,
+            'genero': _genero,
+            'telefone': str,
+            'endereco': _texto(campo('endereco')),
+            'dependente_status': lambda valor: _status_por_id_ou_nome(
+                valor, status_dependente, registro.status_dependente.por_nome, 'Status de dependente'
+            ),
+        }
+        self.status_padrao_cliente = self._status_padrao(lambda: registro.status.por_nome('Ativo', 'cliente'))
+        self.status_padrao_dependente = self._status_padrao(lambda: registro.status_dependente.por_nome('Ativo'))
+        self.cpfs_clientes = set()
+        self.cpfs_dependentes = set()
+
+    @staticmethod
+    def _status_padrao(buscar):
+        try:
+            return buscar().pk
+        except (FunerariaStatus.DoesNotExist, DependenteStatus.DoesNotExist):
+            return None
+
+    def _blocos(self, linhas):
+        linhas = iter(linhas)
+        inicio = 1
+        while bloco := list(islice(linhas, self.tamanho_lote)):
+            yield inicio, bloco
+            inicio += len(bloco)
+
+    def _validar_bloco(self, bloco, inicio, model, colunas, conversores, opcionais, vistos):
+        """Campos de cada linha, CPFs e telefones do bloco em lote e unicidade dos CPFs (uma consulta)"""
+        validadas = validar_linhas(bloco, colunas, conversores, opcionais, inicio)
+        cpfs_ok, numeros = validar_cpfs([dados.get('cpf') for _, dados, _ in validadas])
+        telefones_ok = validar_telefones([dados.get('telefone') for _, dados, _ in validadas])
+        existentes = set(
+            model.objects.filter(cpf_numero__in=numeros[cpfs_ok].tolist()).values_list('cpf_numero', flat=True)
+        )
+        for i, (_, dados, erros) in enumerate(validadas):
+            if 'cpf' in dados:
+                numero = int(numeros[i])
+                if not cpfs_ok[i]:
+                    erros['cpf'] = ['CPF inválido']
+                elif numero in existentes:
+                    erros['cpf'] = [f'Já existe um {model._meta.verbose_name.lower()} com este CPF.']
+                elif numero in vistos:
+                    erros['cpf'] = ['CPF repetido no arquivo.']
+                else:
+                    dados['cpf'] = formatar_cpf(numero)
+                    dados['cpf_numero'] = numero
+            if dados.get('telefone') is not None and not telefones_ok[i]:
+                erros['telefone'] = ['Telefone inválido. Use (99) 9999-9999 ou (99) 99999-9999.']
+            if not erros:
+                vistos.add(dados['cpf_numero'])
+        return validadas
+
+    def _gravar(self, model, objetos, resultado):
+        criados = model.objects.bulk_create(objetos)
+        resumos.registrar_criados(criados)
+        resultado.importados += len(criados)
+
+    def clientes(self, linhas):
+        resultado = ResultadoImportacao()
+        for inicio, bloco in self._blocos(linhas):
+            resultado.total += len(bloco)
+            validadas = self._validar_bloco(
+                bloco, inicio, ClienteFuneraria, COLUNAS_CLIENTE, self.conversores_cliente,
+                {'cliente_status'}, self.cpfs_clientes
+            )
+            clientes = []
+            for numero, dados, erros in validadas:
+                status_id = dados.get('cliente_status') or self.status_padrao_cliente
+                if status_id is None:
+                    erros['cliente_status'] = ['Informe o status do cliente.']
+                if erros:
+                    resultado.erro(numero, erros)
+                    continue
+                clientes.append(ClienteFuneraria(
+                    nome=dados['nome'], cpf=dados['cpf'], data_nascimento=dados['data_nascimento'],
+                    telefone=dados['telefone'], endereco=dados['endereco'], email=dados['email'],
+                    cliente_status_id=status_id,
+                    funcionario_cadastro_id=self.funcionario_id, funcionario_atualizacao_id=self.funcionario_id,
+                ))
+            self._gravar(ClienteFuneraria, clientes, resultado)
+        return resultado
+
+    def dependentes(self, linhas):
+        resultado = ResultadoImportacao()
+        for inicio, bloco in self._blocos(linhas):
+            resultado.total += len(bloco)
+            # Titulares do bloco inteiro numa consulta: valor da coluna -> id do cliente (None se não existir)
+            valores = [_valor(linha, COLUNAS_DEPENDENTE['cliente_cpf']) for linha in bloco]
+            validos, numeros = validar_cpfs(valores)
+            encontrados = dict(
+                ClienteFuneraria.objects.filter(cpf_numero__in=set(numeros[validos].tolist()))
+                .values_list('cpf_numero', 'pk')
+            )
+            titulares = {
+                valor: encontrados.get(int(numero))
+                for valor, numero, valido in zip(valores, numeros, validos) if valido
+            }
+            conversores = {
+                **self.conversores_dependente, 'cliente_cpf': lambda valor: _titular(valor, titulares),
+            }
+            validadas = self._validar_bloco(
+                bloco, inicio, DependenteFuneraria, COLUNAS_DEPENDENTE, conversores,
+                {'telefone', 'dependente_status'}, self.cpfs_dependentes
+            )
+            dependentes = []
+            for numero, dados, erros in validadas:
+                status_id = dados.get('dependente_status') or self.status_padrao_dependente
+                if status_id is None:
+                    erros['dependente_status'] = ['Informe o status do dependente.']
+                if erros:
+                    resultado.erro(numero, erros)
+                    continue
+                dependentes.append(DependenteFuneraria(
+                    nome=dados['nome'], cpf=dados['cpf'], data_nascimento=dados['data_nascimento'],
+                    genero=dados['genero'], telefone=dados['telefone'] or '', endereco=dados['endereco'],
+                    cliente_id=dados['cliente_cpf'], dependente_status_id=status_id,
+                    funcionario_criacao_id=self.funcionario_id, funcionario_atualizacao_id=self.funcionario_id,
+                ))
+            self._gravar(DependenteFuneraria, dependentes, resultado)
+        return resultado
+
+
+def importar_pessoas(funcionario, clientes=None, dependentes=None, simular=False, tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa clientes e depois dependentes (iteráveis de linhas, que podem
+    ser lidos sob demanda) numa única transação; os dependentes podem
+    apontar para clientes do mesmo arquivo. Com `simular`, tudo é validado
+    e gravado como de costume e a transação é desfeita no final: o relatório
+    é o mesmo de uma importação real, sem alterar o banco.
+    """
+    relatorio = {'simulacao': simular}
+    with transaction.atomic():
+        importacao = ImportacaoPessoas(funcionario, tamanho_lote)
+        if clientes is not None:
+            relatorio['clientes'] = importacao.clientes(clientes)
+        if dependentes is not None:
+            relatorio['dependentes'] = importacao.dependentes(dependentes)
+        if simular:
+            transaction.set_rollback(True)
+        else:
+            invalidar(ClienteFuneraria, DependenteFuneraria)
+    return relatorio
@@ -0,0 +1,227 @@
+# funeraria/instrumentacao.py
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('funeraria.sql')
+logger_lentas = logging.getLogger('funeraria.sql.lentas')
+
+# Listas de parâmetros de tamanho variável (IN (%s, %s, ...), VALUES (...), (...)) viram uma só
+_LISTA_PARAMETROS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)(?:\s*,\s*\(\s*%s(?:\s*,\s*%s)*\s*\))*')
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+TAMANHO_SQL_LOG = 300
+
+
+def rotulos_da_requisicao(request):
+    """(view, ação, método): a classe e a ação do viewset resolvido, inclusive as @action"""
+    metodo = request.method
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'nao_encontrada', metodo.lower(), metodo
+    cls = getattr(match.func, 'cls', None)
+    if cls is None:
+        return match.view_name or 'desconhecida', metodo.lower(), metodo
+    acoes = getattr(match.func, 'actions', None) or {}
+    return cls.__name__, acoes.get(metodo.lower(), metodo.lower()), metodo
+
+
+def forma_sql(sql):
+    """SQL sem literais e com listas de parâmetros colapsadas: consultas iguais a menos dos valores"""
+    return _LISTA_PARAMETROS.sub('(%s...)', _LITERAIS.sub('?', sql))
+
+
+class ColetorSQL:
+    """execute_wrapper que conta as consultas, soma o tempo e (com `agrupar`) agrupa pelo texto do SQL"""
+
+    def __init__(self, agrupar=True):
+        self.quantidade = 0
+        self.tempo = 0.0
+        self.agrupar = agrupar
+        self.por_sql = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.quantidade += 1
+            if self.agrupar:
+                self.por_sql[sql] += 1
+
+    def formas(self):
+        # A normalização só roda no fim, uma vez por SQL distinto
+        formas = Counter()
+        for sql, vezes in self.por_sql.items():
+            formas[forma_sql(sql)] += vezes
+        return formas
+
+
+class InstrumentacaoSQLMiddleware:
+    """
+    Mede as consultas SQL de uma fração das requisições (INSTRUMENTACAO_SQL):
+    quantidade, tempo total e formas repetidas, em cabeçalhos X-SQL-* e numa
+    linha JSON no logger `funeraria.sql`. Formas executadas ao menos
+    LIMITE_REPETICOES vezes são apontadas como N+1 (log em WARNING).
+
+    Desligada, o Django nem instancia o middleware; nas requisições fora da
+    amostra o custo é um sorteio. Em respostas em streaming só entram as
+    consultas feitas antes de a resposta começar a ser enviada.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, 'INSTRUMENTACAO_SQL', {})
+        if not config.get('ATIVA'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.amostragem = float(config.get('AMOSTRAGEM', 1.0))
+        self.limite_repeticoes = int(config.get('LIMITE_REPETICOES', 5))
+        self.cabecalhos = config.get('CABECALHOS', True)
+
+    def __call__(self, request):
+        if self.amostragem < 1 and random.random() >= self.amostragem:
+            return self.get_response(request)
+
+        coletor = ColetorSQL()
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(coletor))
+            response = self.get_response(request)
+        duracao = time.perf_counter() - inicio
+
+        formas = coletor.formas()
+        repetidas = sum(vezes - 1 for vezes in formas.values() if vezes > 1)
+        n_mais_1 = [(forma, vezes) for forma, vezes in formas.most_common() if vezes >= self.limite_repeticoes]
+        if self.cabecalhos:
+            response['X-SQL-Consultas'] = str(coletor.quantidade)
+            response['X-SQL-Tempo-Ms'] = f'{coletor.tempo * 1000:.1f}'
+            response['X-SQL-Repetidas'] = str(repetidas)
+            if n_mais_1:
+                response['X-SQL-N-Mais-1'] = str(len(n_mais_1))
+
+        nivel = logging.WARNING if n_mais_1 else logging.INFO
+        if not logger.isEnabledFor(nivel):
+            return response
+        registro = {
+            'metodo': request.method,
+            'caminho': request.path,
+            'status': response.status_code,
+            'consultas': coletor.quantidade,
+            'tempo_sql_ms': round(coletor.tempo * 1000, 1),
+            'tempo_total_ms': round(duracao * 1000, 1),
+            'repetidas': repetidas,
+            'n_mais_1': [{'sql': forma[:TAMANHO_SQL_LOG], 'vezes': vezes} for forma, vezes in n_mais_1],
+        }
+        logger.log(nivel, json.dumps(registro, ensure_ascii=False))
+        return response
+
+
+class ColetorConsultasLentas:
+    """
+    execute_wrapper que registra no logger `funeraria.sql.lentas` cada consulta
+    acima de LIMITE_MS, com a view e a ação da requisição. Para uma fração
+    (AMOSTRAGEM_EXPLAIN) das consultas SELECT lentas, no máximo uma vez a cada
+    INTERVALO_EXPLAIN segundos por forma de SQL, também guarda o plano de
+    EXPLAIN (ANALYZE, BUFFERS), que executa a consulta de novo.
+    """
+
+    # Última captura de plano por forma de SQL, compartilhada entre as threads do processo
+    ultimos_planos = {}
+    lock = threading.Lock()
+
+    def __init__(self, request, config):
+        self.request = request
+        self.limite = float(config.get('LIMITE_MS', 500)) / 1000
+        self.amostragem_explain = float(config.get('AMOSTRAGEM_EXPLAIN', 0.2))
+        self.intervalo_explain = float(config.get('INTERVALO_EXPLAIN', 300))
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        resultado = execute(sql, params, many, context)
+        duracao = time.perf_counter() - inicio
+        if duracao >= self.limite:
+            self.registrar(sql, params, many, context['connection'], duracao)
+        return resultado
+
+    def deve_explicar(self, sql, many, conexao, forma):
+        if many or conexao.vendor != 'postgresql' or sql.lstrip()[:6].upper() != 'SELECT':
+            return False
+        if random.random() >= self.amostragem_explain:
+            return False
+        agora = time.monotonic()
+        with self.lock:
+            if agora - self.ultimos_planos.get(forma, float('-inf')) < self.intervalo_explain:
+                return False
+            self.ultimos_planos[forma] = agora
+        return True
+
+    def explicar(self, sql, params, conexao):
+        """
+        Plano da consulta pelo cursor do driver, fora dos execute_wrappers (métricas
+        e instrumentação não contam o EXPLAIN). Dentro de uma transação, roda num
+        savepoint: uma falha não invalida a transação da requisição.
+        """
+        em_transacao = conexao.in_atomic_block
+        with conexao.connection.cursor() as cursor:
+            try:
+                if em_transacao:
+                    cursor.execute('SAVEPOINT explain_consulta_lenta')
+                cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+                plano = '\n'.join(linha for linha, in cursor.fetchall())
+            except conexao.Database.Error as erro:
+                plano = f'EXPLAIN falhou: {erro}'.strip()
+                if em_transacao:
+                    cursor.execute('ROLLBACK TO SAVEPOINT explain_consulta_lenta')
+            if em_transacao:
+                cursor.execute('RELEASE SAVEPOINT explain_consulta_lenta')
+        return plano
+
+    def registrar(self, sql, params, many, conexao, duracao):
+        if not logger_lentas.isEnabledFor(logging.WARNING):
+            return
+        view, acao, metodo = rotulos_da_requisicao(self.request)
+        forma = forma_sql(sql)
+        registro = {
+            'view': view,
+            'acao': acao,
+            'metodo': metodo,
+            'caminho': self.request.get_full_path(),
+            'tempo_ms': round(duracao * 1000, 1),
+            'sql': sql,
+            'forma': forma,
+        }
+        if self.deve_explicar(sql, many, conexao, forma):
+            registro['plano'] = self.explicar(sql, params, conexao)
+        logger_lentas.warning(json.dumps(registro, ensure_ascii=False))
+
+
+class ConsultasLentasMiddleware:
+    """
+    Log das consultas lentas (CONSULTAS_LENTAS) de todas as requisições, com o
+    plano de execução de uma amostra delas; o arquivo do log é rotativo
+    (LOGGING). O custo nas consultas rápidas é uma medição de tempo.
+    """
+
+    def __init__(self, get_response):
+        self.config = getattr(settings, 'CONSULTAS_LENTAS', {})
+        if not self.config.get('ATIVA'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        coletor = ColetorConsultasLentas(request, self.config)
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(coletor))
+            return self.get_response(request)
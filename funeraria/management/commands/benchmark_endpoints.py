@@ -0,0 +1,233 @@
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from funeraria import sinteticos
+from funeraria.instrumentacao import ColetorSQL
+from funeraria.models import ClienteFuneraria, FuncionarioFuneraria, PlanoFuneraria
+from funeraria.urls import router
+
+
+def periodo(amostra):
+    hoje = timezone.localdate()
+    return {'data_inicio': (hoje - timedelta(days=90)).isoformat(), 'data_fim': hoje.isoformat()}
+
+
+# Actions que exigem parâmetros: (prefixo do router, action) -> parâmetros a partir das amostras
+PARAMETROS = {
+    ('clientes', 'buscar_cpf'): lambda amostra: {'cpf': amostra['cliente'].cpf},
+    ('pessoas', 'buscar_cpf'): lambda amostra: {'cpf': amostra['cliente'].cpf},
+    ('dependentes', 'por_cliente'): lambda amostra: {'cliente_id': amostra['cliente'].pk},
+    ('servicos', 'por_cliente'): lambda amostra: {'cliente_id': amostra['cliente'].pk},
+    ('pagamentos', 'historico_plano'): lambda amostra: {'plano_id': amostra['plano'].pk},
+    ('planos', 'relatorio_financeiro'): periodo,
+    ('pagamentos', 'relatorio_periodo'): periodo,
+    ('servicos', 'relatorio_tipos'): periodo,
+}
+# Diferenças abaixo destes pisos são ruído, mesmo acima da tolerância
+PISO_LATENCIA_MS = 1.0
+PISO_MEMORIA_KIB = 256
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência, consultas SQL e memória de todas as listagens, detalhes e actions GET '
+        'dos viewsets do router, em uma ou mais escalas da massa sintética (gerar_dados). '
+        'Grava os resultados em JSON e compara com um baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escalas', help='Quantidades de clientes, ex.: 1000,10000,100000. A massa é completada até cada '
+                              'escala (use um banco dedicado); sem a opção, mede o banco como está'
+        )
+        parser.add_argument('--repeticoes', type=int, default=5, help='Medições de latência por rota')
+        parser.add_argument('--rotas', help='Mede só as rotas que contêm um destes trechos, ex.: clientes,relatorio')
+        parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+        parser.add_argument('--comparar', help='Arquivo JSON de uma execução anterior (baseline)')
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.25,
+            help='Aumento relativo de latência (mínima) ou memória aceito em relação ao baseline'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Semente da massa gerada')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as arquivo:
+                    baseline = json.load(arquivo)
+            except (OSError, ValueError) as erro:
+                raise CommandError(f'Baseline inválido: {erro}')
+        try:
+            escalas = [int(escala) for escala in options['escalas'].split(',')] if options['escalas'] else [None]
+        except ValueError:
+            raise CommandError('Escalas inválidas. Use quantidades separadas por vírgula, ex.: 1000,10000.')
+        filtros = [trecho for trecho in (options['rotas'] or '').split(',') if trecho]
+
+        usuario = FuncionarioFuneraria(username='benchmark', is_active=True, is_staff=True, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+
+        resultados = {
+            'gerado_em': timezone.now().isoformat(), 'banco': connection.vendor,
+            'repeticoes': options['repeticoes'], 'escalas': {},
+        }
+        for indice, escala in enumerate(escalas):
+            atual = ClienteFuneraria.objects.count()
+            if escala is not None and atual > escala:
+                self.stdout.write(f'-     escala {escala}: o banco já tem {atual} clientes')
+                continue
+            if escala is not None and atual < escala:
+                inicio = time.monotonic()
+                sinteticos.GeradorDados(options['seed'] + indice).gerar(escala - atual)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                self.stdout.write(f'Massa completada até {escala} clientes em {time.monotonic() - inicio:.1f}s')
+            escala = ClienteFuneraria.objects.count()
+            self.stdout.write(f'== {escala} clientes')
+            # O cache de respostas mediria o cache, não o endpoint; com DEBUG o log de consultas pesaria na medida
+            with override_settings(CACHE_RESPOSTAS=None, DEBUG=False):
+                rotas = self.medir_rotas(filtros, options['repeticoes'])
+            resultados['escalas'][str(escala)] = {'clientes': escala, 'rotas': rotas}
+
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultados, arquivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Resultados gravados em {options['saida']}")
+        if baseline is not None:
+            self.comparar(baseline, resultados, options['tolerancia'])
+
+    def rotas(self):
+        """(rota, prefixo, action, detalhe) de cada listagem, detalhe e action GET registrados no router"""
+        for prefixo, viewset, _ in router.registry:
+            if hasattr(viewset, 'list'):
+                yield f'/api/{prefixo}/', prefixo, 'list', False
+            if hasattr(viewset, 'retrieve'):
+                yield f'/api/{prefixo}/{{pk}}/', prefixo, 'retrieve', True
+            for acao in viewset.get_extra_actions():
+                if 'get' not in acao.mapping:
+                    continue
+                if acao.detail:
+                    yield f'/api/{prefixo}/{{pk}}/{acao.url_path}/', prefixo, acao.__name__, True
+                else:
+                    yield f'/api/{prefixo}/{acao.url_path}/', prefixo, acao.__name__, False
+
+    def medir_rotas(self, filtros, repeticoes):
+        amostra = {
+            'cliente': ClienteFuneraria.objects.order_by('-pk').first(),
+            'plano': PlanoFuneraria.objects.order_by('-pk').first(),
+        }
+        viewsets = {prefixo: viewset for prefixo, viewset, _ in router.registry}
+        medidas = {}
+        for rota, prefixo, acao, detalhe in self.rotas():
+            if filtros and not any(trecho in rota for trecho in filtros):
+                continue
+            parametros = {}
+            if (prefixo, acao) in PARAMETROS:
+                if None in amostra.values():
+                    self.stdout.write(f'-     {rota}: sem dados para medir')
+                    continue
+                parametros = PARAMETROS[prefixo, acao](amostra)
+            url = rota
+            if detalhe:
+                queryset = getattr(viewsets[prefixo], 'queryset', None)
+                pk = queryset.order_by('-pk').values_list('pk', flat=True).first() if queryset is not None else None
+                if pk is None:
+                    self.stdout.write(f'-     {rota}: sem registro para medir')
+                    continue
+                url = rota.format(pk=pk)
+
+            medida = self.medir(url, parametros, repeticoes)
+            medidas[rota] = medida
+            if medida['status'] != 200:
+                self.stdout.write(f"-     {rota}: respondeu {medida['status']}")
+                continue
+            self.stdout.write(
+                f"      {rota}: mínima {medida['latencia_ms']['minima']:.1f} ms, "
+                f"mediana {medida['latencia_ms']['mediana']:.1f} ms, p95 {medida['latencia_ms']['p95']:.1f} ms, "
+                f"{medida['consultas']} consultas ({medida['tempo_sql_ms']:.1f} ms), {medida['memoria_kib']:,.0f} KiB"
+            )
+        return medidas
+
+    def requisitar(self, url, parametros):
+        resposta = self.client.get(url, parametros)
+        # Exportações em streaming só fazem o trabalho quando o conteúdo é consumido
+        if resposta.streaming:
+            for _ in resposta.streaming_content:
+                pass
+        return resposta
+
+    def medir(self, url, parametros, repeticoes):
+        """Aquecimento, `repeticoes` medições de latência, uma de consultas e uma de memória (tracemalloc)"""
+        status = self.requisitar(url, parametros).status_code
+        if status != 200:
+            return {'status': status}
+        tempos = []
+        for _ in range(max(repeticoes, 1)):
+            inicio = time.perf_counter()
+            self.requisitar(url, parametros)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        coletor = ColetorSQL(agrupar=False)
+        with connection.execute_wrapper(coletor):
+            self.requisitar(url, parametros)
+        tracemalloc.start()
+        try:
+            self.requisitar(url, parametros)
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        p95 = statistics.quantiles(tempos, n=20, method='inclusive')[18] if len(tempos) > 1 else tempos[0]
+        return {
+            'status': status,
+            'latencia_ms': {
+                'mediana': round(statistics.median(tempos), 2), 'p95': round(p95, 2), 'minima': round(min(tempos), 2),
+            },
+            'consultas': coletor.quantidade,
+            'tempo_sql_ms': round(coletor.tempo * 1000, 2),
+            'memoria_kib': round(pico / 1024, 1),
+        }
+
+    def comparar(self, baseline, resultados, tolerancia):
+        """
+        Regressão: mais consultas, ou latência ou memória acima da tolerância (e
+        do piso de ruído). A latência comparada é a mínima das medições, a
+        menos sujeita a ruído da máquina.
+        """
+        regressoes = []
+        for escala, atual in resultados['escalas'].items():
+            anterior = baseline.get('escalas', {}).get(escala)
+            if anterior is None:
+                self.stdout.write(f'-     escala {escala}: sem baseline')
+                continue
+            for rota, medida in atual['rotas'].items():
+                base = anterior['rotas'].get(rota)
+                if base is None or base['status'] != 200 or medida['status'] != 200:
+                    self.stdout.write(f'-     [{escala}] {rota}: sem medida comparável no baseline')
+                    continue
+                antes, depois = base['latencia_ms']['minima'], medida['latencia_ms']['minima']
+                latencia = depois <= antes * (1 + tolerancia) or depois - antes < PISO_LATENCIA_MS
+                consultas = medida['consultas'] <= base['consultas']
+                memoria = (
+                    medida['memoria_kib'] <= base['memoria_kib'] * (1 + tolerancia)
+                    or medida['memoria_kib'] - base['memoria_kib'] < PISO_MEMORIA_KIB
+                )
+                ok = latencia and consultas and memoria
+                if not ok:
+                    regressoes.append(f'[{escala}] {rota}')
+                self.stdout.write(
+                    f"{'OK   ' if ok else 'FALHA'} [{escala}] {rota}: {antes:.1f} -> {depois:.1f} ms "
+                    f"({depois / antes if antes else 1:.2f}x), consultas {base['consultas']} -> {medida['consultas']}, "
+                    f"memória {base['memoria_kib']:,.0f} -> {medida['memoria_kib']:,.0f} KiB"
+                )
+        if regressoes:
+            raise CommandError(f"{len(regressoes)} regressão(ões) em relação ao baseline: {', '.join(regressoes)}")
+        self.stdout.write(self.style.SUCCESS('Nenhuma regressão em relação ao baseline.'))
@@ -0,0 +1,150 @@
+import csv
+import io
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from funeraria import importacoes
+from funeraria.models import ClienteFuneraria, DependenteStatus, FuncionarioFuneraria, FunerariaStatus
+from funeraria.serializers import ClienteFunerariaSerializer, DependenteFunerariaSerializer
+from funeraria.sinteticos import gerar_cpf
+
+
+class Desfazer(Exception):
+    """Desfaz a transação de uma medição"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a importação de clientes e dependentes linha a linha (serializers, '
+        'como no cadastro pela API) com a importação em blocos de importar_clientes. '
+        'As duas medições rodam em transações desfeitas no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=5000, help='Clientes do arquivo (um dependente cada)')
+        parser.add_argument(
+            '--amostra-por-linha', type=int, default=500,
+            help='Clientes medidos no caminho linha a linha (mais lento)'
+        )
+        parser.add_argument('--tamanho-lote', type=int, default=importacoes.TAMANHO_LOTE)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        clientes, dependentes = self.gerar_linhas(options['clientes'], rng)
+        amostra = min(options['amostra_por_linha'], len(clientes))
+
+        tempo_linha, importados_linha = self.medir(
+            lambda funcionario, status: self.por_linha(clientes[:amostra], dependentes[:amostra], funcionario, status)
+        )
+        tempo_blocos, importados_blocos = self.medir(
+            lambda funcionario, status: self.em_blocos(clientes, dependentes, funcionario, options['tamanho_lote'])
+        )
+
+        falhas = []
+        for nome, importados, esperado in (
+            ('linha a linha', importados_linha, 2 * amostra), ('em blocos', importados_blocos, 2 * len(clientes)),
+        ):
+            if importados != esperado:
+                falhas.append(nome)
+            self.stdout.write(
+                f"{'OK   ' if importados == esperado else 'FALHA'} {nome}: {importados} de {esperado} importados"
+            )
+        taxa_linha = importados_linha / tempo_linha
+        taxa_blocos = importados_blocos / tempo_blocos
+        self.stdout.write(
+            f'linha a linha {taxa_linha:,.0f} linhas/s, em blocos {taxa_blocos:,.0f} linhas/s, '
+            f'{taxa_blocos / taxa_linha:.1f}x'
+        )
+        if falhas:
+            raise CommandError(f"Linhas rejeitadas em: {', '.join(falhas)}")
+
+    def gerar_linhas(self, quantidade, rng):
+        """Planilhas CSV (em bytes) de clientes e de dependentes, com CPFs numa faixa aleatória"""
+        inicio = rng.randint(100_000_000, 800_000_000)
+        hoje = date.today()
+        clientes, dependentes = [], []
+        for i in range(quantidade):
+            cpf_cliente = gerar_cpf(inicio + 2 * i)
+            clientes.append({
+                'nome': f'Cliente importado {i}', 'cpf': cpf_cliente,
+                'data_nascimento': (hoje - timedelta(days=rng.randint(6570, 32850))).strftime('%d/%m/%Y'),
+                'telefone': f'(11) 9{rng.randint(0, 9999):04d}-{rng.randint(0, 9999):04d}',
+                'endereco': f'Rua {i}, {rng.randint(1, 999)}', 'email': f'cliente{i}@exemplo.com',
+            })
+            dependentes.append({
+                'nome': f'Dependente importado {i}', 'cpf': gerar_cpf(inicio + 2 * i + 1),
+                'data_nascimento': (hoje - timedelta(days=rng.randint(0, 32850))).isoformat(),
+                'genero': rng.choice('MFO'), 'telefone': '', 'endereco': f'Rua {i}, {rng.randint(1, 999)}',
+                'cliente_cpf': cpf_cliente,
+            })
+        return clientes, dependentes
+
+    @staticmethod
+    def csv_bytes(linhas):
+        saida = io.StringIO()
+        escritor = csv.DictWriter(saida, fieldnames=list(linhas[0]), delimiter=';')
+        escritor.writeheader()
+        escritor.writerows(linhas)
+        return io.BytesIO(saida.getvalue().encode('utf-8'))
+
+    def medir(self, funcao):
+        """Executa `funcao(funcionario, status)` numa transação desfeita; devolve (segundos, importados)"""
+        try:
+            with transaction.atomic():
+                funcionario = FuncionarioFuneraria.objects.get_or_create(
+                    username='benchmark_importacao',
+                    defaults={
+                        'first_name': 'Benchmark', 'last_name': 'Importação', 'cpf': gerar_cpf(999999998),
+                        'data_nascimento': '1990-01-01', 'telefone': '(11) 99999-9999',
+                    }
+                )[0]
+                status = (
+                    FunerariaStatus.objects.get_or_create(
+                        status='Ativo', categoria='cliente', defaults={'descricao': 'Ativo'})[0],
+                    DependenteStatus.objects.get_or_create(status='Ativo', defaults={'descricao': 'Ativo'})[0],
+                )
+                inicio = time.perf_counter()
+                importados = funcao(funcionario, status)
+                duracao = time.perf_counter() - inicio
+                raise Desfazer
+        except Desfazer:
+            pass
+        return duracao, importados
+
+    def por_linha(self, clientes, dependentes, funcionario, status):
+        """Um serializer por linha; o titular de cada dependente é buscado pelo CPF"""
+        status_cliente, status_dependente = status
+        importados = 0
+        for linha in csv.DictReader(io.TextIOWrapper(self.csv_bytes(clientes), encoding='utf-8'), delimiter=';'):
+            serializer = ClienteFunerariaSerializer(data={
+                **linha, 'data_nascimento': importacoes._data(linha['data_nascimento']),
+                'cliente_status': status_cliente.pk,
+                'funcionario_cadastro': funcionario.pk, 'funcionario_atualizacao': funcionario.pk,
+            })
+            if serializer.is_valid():
+                serializer.save()
+                importados += 1
+        for linha in csv.DictReader(io.TextIOWrapper(self.csv_bytes(dependentes), encoding='utf-8'), delimiter=';'):
+            titular = ClienteFuneraria.objects.por_cpf(linha['cliente_cpf']).values_list('pk', flat=True).first()
+            serializer = DependenteFunerariaSerializer(data={
+                **linha, 'cliente': titular, 'dependente_status': status_dependente.pk,
+                'funcionario_criacao': funcionario.pk, 'funcionario_atualizacao': funcionario.pk,
+            })
+            if serializer.is_valid():
+                serializer.save()
+                importados += 1
+        return importados
+
+    def em_blocos(self, clientes, dependentes, funcionario, tamanho_lote):
+        relatorio = importacoes.importar_pessoas(
+            funcionario,
+            clientes=importacoes.iterar_linhas(self.csv_bytes(clientes), 'csv'),
+            dependentes=importacoes.iterar_linhas(self.csv_bytes(dependentes), 'csv'),
+            tamanho_lote=tamanho_lote,
+        )
+        return relatorio['clientes'].importados + relatorio['dependentes'].importados
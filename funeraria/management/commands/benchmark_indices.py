@@ -0,0 +1,181 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from funeraria import relatorios, resumos
+from funeraria.busca import pessoas_por_cpf
+from funeraria.models import (
+    ClienteDependentePlano, ClienteFuneraria, ClientePlano, DependenteFuneraria,
+    DependenteStatus, FuncionarioFuneraria, FunerariaStatus, FunerariaTipos,
+    PagamentoFuneraria, PlanoFuneraria, ServicoPrestadoFuneraria
+)
+from funeraria.sinteticos import gerar_cpf
+
+TAMANHO_LOTE = 5000
+PREFIXO = 'bench'
+
+
+class Command(BaseCommand):
+    help = (
+        'Popula (opcionalmente) uma massa de dados e verifica com EXPLAIN que as '
+        'consultas quentes das views e do admin usam índices.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--popular', type=int, default=0, metavar='CLIENTES',
+            help='Cria esta quantidade de clientes (e planos, pagamentos e serviços proporcionais) antes de medir'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('O benchmark de índices requer PostgreSQL.')
+
+        if options['popular']:
+            inicio = time.monotonic()
+            self.popular(options['popular'], random.Random(options['seed']))
+            resumos.reconstruir()
+            self.stdout.write(f"Massa de dados criada em {time.monotonic() - inicio:.1f}s")
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        falhas = []
+        for nome, queryset in self.consultas():
+            plano = queryset.explain()
+            usa_indice = 'Index' in plano
+            tabela = queryset.model._meta.db_table
+            seq_scan = f'Seq Scan on {tabela}' in plano
+            ok = usa_indice and not seq_scan
+            self.stdout.write(f"{'OK   ' if ok else 'FALHA'} {nome}")
+            if not ok:
+                falhas.append(nome)
+                self.stdout.write(plano)
+
+        if falhas:
+            raise CommandError(f"{len(falhas)} consulta(s) sem uso de índice: {', '.join(falhas)}")
+        self.stdout.write(self.style.SUCCESS('Todas as consultas usam índices.'))
+
+    def consultas(self):
+        hoje = timezone.now()
+        inicio_mes = hoje.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        inicio_periodo = hoje - timedelta(days=30)
+        plano_id = PlanoFuneraria.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        cliente_id = ClienteFuneraria.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        tipo_id = FunerariaTipos.objects.filter(categoria='servico').values_list('pk', flat=True).first() or 0
+        status_id = FunerariaStatus.objects.filter(categoria='cliente').values_list('pk', flat=True).first() or 0
+        cpf = ClienteFuneraria.objects.order_by('-pk').values_list('cpf', flat=True).first() or ''
+        planos = PlanoFuneraria.objects.filter(pk__in=list(
+            PlanoFuneraria.objects.order_by('-created_at').values_list('pk', flat=True)[:20]
+        ))
+
+        return [
+            ('pagamentos: listagem por data', PagamentoFuneraria.objects.order_by('-data_hora_pagto', '-id')[:20]),
+            ('pagamentos: historico_plano', PagamentoFuneraria.objects.filter(plano_funeraria_id=plano_id)),
+            ('pagamentos: total do mês (dashboard)', PagamentoFuneraria.objects.filter(
+                data_hora_pagto__gte=inicio_mes).order_by().values('valor_pago')),
+            ('pagamentos: relatorio_periodo', PagamentoFuneraria.objects.filter(
+                data_hora_pagto__gte=inicio_periodo).order_by().values('status_pagamento')
+                .annotate(total=Sum('valor_pago'), quantidade=Count('id'))),
+            ('planos: relatorio_financeiro', relatorios.relatorio_financeiro(planos)),
+            ('planos: listagem por criação', PlanoFuneraria.objects.order_by('-created_at')[:20]),
+            ('servicos: listagem por data', ServicoPrestadoFuneraria.objects.order_by('-data_hora_servico', '-id')[:20]),
+            ('servicos: por_cliente', ServicoPrestadoFuneraria.objects.filter(cliente_id=cliente_id)),
+            ('servicos: por tipo e data', ServicoPrestadoFuneraria.objects.filter(
+                tipo_id=tipo_id, data_hora_servico__gte=inicio_periodo)),
+            ('servicos: relatorio_tipos', ServicoPrestadoFuneraria.objects.filter(
+                data_hora_servico__gte=inicio_periodo).order_by().values('tipo').annotate(quantidade=Count('id'))),
+            ('clientes: listagem por nome', ClienteFuneraria.objects.order_by('nome')[:20]),
+            ('clientes: por status e nome', ClienteFuneraria.objects.filter(
+                cliente_status_id=status_id).order_by('nome')[:20]),
+            ('pessoas: buscar_cpf', pessoas_por_cpf(cpf)),
+            ('dependentes: por_cliente', DependenteFuneraria.objects.filter(cliente_id=cliente_id).order_by('nome')),
+            ('cliente_plano: ativos vencidos', ClientePlano.objects.filter(ativo=True, data_fim__lt=hoje.date())),
+            ('dependente_plano: ativos vencidos', ClienteDependentePlano.objects.filter(
+                ativo=True, data_fim__lt=hoje.date())),
+        ]
+
+    @transaction.atomic
+    def popular(self, quantidade, rng):
+        """Massa de dados simples, inserida com bulk_create"""
+        agora = timezone.now()
+        funcionario, _ = FuncionarioFuneraria.objects.get_or_create(
+            username=f'{PREFIXO}_funcionario',
+            defaults={
+                'first_name': 'Benchmark', 'last_name': 'Índices', 'cpf': gerar_cpf(999999999),
+                'data_nascimento': '1990-01-01', 'telefone': '(11) 99999-9999',
+            }
+        )
+        status_cliente = FunerariaStatus.objects.get_or_create(
+            status='Ativo', categoria='cliente', defaults={'descricao': 'Ativo'})[0]
+        status_pagamento = FunerariaStatus.objects.get_or_create(
+            status='Pago', categoria='pagamento', defaults={'descricao': 'Pago'})[0]
+        status_dependente = DependenteStatus.objects.get_or_create(
+            status='Ativo', defaults={'descricao': 'Ativo'})[0]
+        tipo_plano = FunerariaTipos.objects.get_or_create(descricao=f'{PREFIXO} plano', categoria='plano')[0]
+        tipos_servico = [
+            FunerariaTipos.objects.get_or_create(descricao=f'{PREFIXO} serviço {i}', categoria='servico')[0]
+            for i in range(5)
+        ]
+
+        inicio_cpf = ClienteFuneraria.objects.count() + DependenteFuneraria.objects.count() + 1
+        auditoria = {'funcionario_criacao': funcionario, 'funcionario_atualizacao': funcionario}
+        for offset in range(0, quantidade, TAMANHO_LOTE):
+            lote = range(offset, min(offset + TAMANHO_LOTE, quantidade))
+            clientes = ClienteFuneraria.objects.bulk_create([
+                ClienteFuneraria(
+                    nome=f'Cliente {PREFIXO} {i}', cpf=gerar_cpf(inicio_cpf + 2 * i),
+                    data_nascimento=agora.date() - timedelta(days=rng.randint(6570, 32850)),
+                    telefone='(11) 98888-7777', endereco='Rua do Benchmark', email=f'cliente{i}@bench.local',
+                    cliente_status=status_cliente, funcionario_cadastro=funcionario,
+                    funcionario_atualizacao=funcionario
+                ) for i in lote
+            ])
+            dependentes = DependenteFuneraria.objects.bulk_create([
+                DependenteFuneraria(
+                    nome=f'Dependente {PREFIXO} {i}', cpf=gerar_cpf(inicio_cpf + 2 * i + 1),
+                    data_nascimento=agora.date() - timedelta(days=rng.randint(0, 32850)),
+                    genero=rng.choice('MFO'), endereco='Rua do Benchmark', cliente=cliente,
+                    dependente_status=status_dependente, **auditoria
+                ) for i, cliente in zip(lote, clientes)
+            ])
+            planos = PlanoFuneraria.objects.bulk_create([
+                PlanoFuneraria(
+                    valor_mensal=Decimal(rng.choice(['49.90', '89.90', '149.90'])), cobertura='Cobertura padrão',
+                    tipo_plano=tipo_plano, plano_status=status_cliente, **auditoria
+                ) for _ in lote
+            ])
+            ClientePlano.objects.bulk_create([
+                ClientePlano(
+                    cliente=cliente, plano=plano, ativo=True,
+                    data_inicio=agora.date() - timedelta(days=365),
+                    data_fim=agora.date() + timedelta(days=rng.randint(-60, 365))
+                ) for cliente, plano in zip(clientes, planos)
+            ])
+            ClienteDependentePlano.objects.bulk_create([
+                ClienteDependentePlano(
+                    dependente=dependente, plano=plano, ativo=True,
+                    data_inicio=agora.date() - timedelta(days=365),
+                    data_fim=agora.date() + timedelta(days=rng.randint(-60, 365))
+                ) for dependente, plano in zip(dependentes, planos)
+            ])
+            PagamentoFuneraria.objects.bulk_create([
+                PagamentoFuneraria(
+                    valor_pago=plano.valor_mensal, plano_funeraria=plano, status_pagamento=status_pagamento,
+                    data_hora_pagto=agora - timedelta(days=30 * mes, minutes=rng.randint(0, 1440))
+                ) for plano in planos for mes in range(10)
+            ], batch_size=TAMANHO_LOTE)
+            ServicoPrestadoFuneraria.objects.bulk_create([
+                ServicoPrestadoFuneraria(
+                    cliente=cliente, plano=plano, tipo=rng.choice(tipos_servico),
+                    data_hora_servico=agora - timedelta(days=rng.randint(0, 3650)), **auditoria
+                ) for cliente, plano in zip(clientes, planos) if rng.random() < 0.3
+            ])
+            self.stdout.write(f'  {lote.stop}/{quantidade} clientes')
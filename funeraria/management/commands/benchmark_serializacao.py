@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from funeraria.models import DependenteFuneraria, PagamentoFuneraria, PlanoFuneraria, ServicoPrestadoFuneraria
+from funeraria.otimizacao import otimizar
+from funeraria.serializacao import compilar
+from funeraria.serializers import (
+    DependenteFunerariaSerializer, PagamentoFunerariaSerializer, PlanoFunerariaSerializer,
+    ServicoPrestadoFunerariaSerializer
+)
+
+# (nome, queryset ordenado como a listagem, serializer da listagem)
+LISTAGENS = [
+    ('pagamentos', PagamentoFuneraria.objects.order_by('-data_hora_pagto', '-id'), PagamentoFunerariaSerializer),
+    ('servicos', ServicoPrestadoFuneraria.objects.order_by('-data_hora_servico', '-id'),
+     ServicoPrestadoFunerariaSerializer),
+    ('dependentes', DependenteFuneraria.objects.order_by('nome', 'id'), DependenteFunerariaSerializer),
+    ('planos', PlanoFuneraria.objects.order_by('-created_at', '-id'), PlanoFunerariaSerializer),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara o serializer do DRF com a serialização por values() das listagens: '
+        'confere que o JSON é idêntico e mede linhas por segundo (consulta + serialização).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=2000, help='Linhas serializadas por medição')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Medições por caminho (vale a melhor)')
+
+    def handle(self, *args, **options):
+        linhas, repeticoes = options['linhas'], options['repeticoes']
+        renderer = JSONRenderer()
+        divergentes = []
+
+        for nome, queryset, serializer_class in LISTAGENS:
+            rapido = compilar(serializer_class)
+            if rapido is None:
+                self.stdout.write(f'-     {nome}: serializer não compilável')
+                continue
+            quantidade = min(linhas, queryset.count())
+            if not quantidade:
+                self.stdout.write(f'-     {nome}: sem dados (use benchmark_indices --popular)')
+                continue
+
+            def pelo_serializer():
+                objetos = otimizar(queryset, serializer_class)[:linhas]
+                return renderer.render(serializer_class(objetos, many=True).data)
+
+            def por_values():
+                return renderer.render(rapido.serializar(rapido.preparar(queryset)[:linhas]))
+
+            tempo_serializer, saida_serializer = self.medir(pelo_serializer, repeticoes)
+            tempo_values, saida_values = self.medir(por_values, repeticoes)
+            identico = saida_serializer == saida_values
+            if not identico:
+                divergentes.append(nome)
+            self.stdout.write(
+                f"{'OK   ' if identico else 'FALHA'} {nome} ({quantidade} linhas): "
+                f'serializer {quantidade / tempo_serializer:,.0f} linhas/s, '
+                f'values() {quantidade / tempo_values:,.0f} linhas/s, '
+                f'{tempo_serializer / tempo_values:.1f}x'
+            )
+
+        if divergentes:
+            raise CommandError(f"JSON diferente do serializer em: {', '.join(divergentes)}")
+        self.stdout.write(self.style.SUCCESS('Saída idêntica ao serializer em todas as listagens.'))
+
+    def medir(self, funcao, repeticoes):
+        funcao()
+        melhor, saida = None, None
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            saida = funcao()
+            duracao = time.perf_counter() - inicio
+            melhor = duracao if melhor is None else min(melhor, duracao)
+        return melhor, saida
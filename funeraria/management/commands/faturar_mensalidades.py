@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from funeraria import faturamento
+from funeraria.models import FunerariaStatus
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera as mensalidades pendentes de uma competência para todos os planos com vínculo '
+        'ativo (como POST /api/pagamentos/faturar/). Pode ser executado de novo: planos já '
+        'cobrados na competência são ignorados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--competencia', help='Mês cobrado, AAAA-MM (padrão: mês corrente)')
+        parser.add_argument(
+            '--tamanho-lote', type=int, default=faturamento.TAMANHO_LOTE,
+            help='Cobranças por INSERT (bulk_create)'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        try:
+            resultado = faturamento.faturar(options['competencia'], options['tamanho_lote'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        except FunerariaStatus.DoesNotExist:
+            raise CommandError('Cadastre o status "Pendente" na categoria pagamento.')
+
+        dados = resultado.como_dict()
+        self.stdout.write(
+            f"Competência {dados['competencia']}: {dados['cobrancas_geradas']} cobrança(s) gerada(s), "
+            f"R$ {dados['valor_total']}, {dados['cobrancas_existentes']} já existente(s), "
+            f'em {time.monotonic() - inicio:.1f}s'
+        )
@@ -0,0 +1,74 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from funeraria import importacoes
+from funeraria.models import FuncionarioFuneraria
+
+ERROS_EXIBIDOS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa planilhas CSV ou XLSX de clientes e/ou dependentes (como no endpoint '
+        '/api/clientes/importar/), lidas em blocos; linhas inválidas são listadas e não '
+        'impedem a importação das demais. Com --simular nada é gravado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', help='Planilha de clientes (.csv ou .xlsx)')
+        parser.add_argument('--dependentes', help='Planilha de dependentes (.csv ou .xlsx)')
+        parser.add_argument('--funcionario', required=True, help='Username do funcionário registrado no cadastro')
+        parser.add_argument('--simular', action='store_true', help='Valida e mostra o relatório sem gravar')
+        parser.add_argument(
+            '--tamanho-lote', type=int, default=importacoes.TAMANHO_LOTE,
+            help='Linhas validadas e gravadas por bloco'
+        )
+
+    def handle(self, *args, **options):
+        caminhos = {
+            nome: Path(options[nome]) for nome in ('clientes', 'dependentes') if options[nome]
+        }
+        if not caminhos:
+            raise CommandError('Informe --clientes e/ou --dependentes.')
+        for caminho in caminhos.values():
+            if not caminho.is_file():
+                raise CommandError(f'Arquivo não encontrado: {caminho}')
+        try:
+            funcionario = FuncionarioFuneraria.objects.get(username=options['funcionario'])
+        except FuncionarioFuneraria.DoesNotExist:
+            raise CommandError(f"Funcionário não encontrado: {options['funcionario']}")
+
+        inicio = time.monotonic()
+        arquivos = {nome: caminho.open('rb') for nome, caminho in caminhos.items()}
+        try:
+            linhas = {
+                nome: importacoes.iterar_linhas(arquivo, importacoes.formato_do_arquivo(
+                    caminhos[nome].name, formatos=importacoes.FORMATOS_PLANILHA
+                ))
+                for nome, arquivo in arquivos.items()
+            }
+            relatorio = importacoes.importar_pessoas(
+                funcionario, simular=options['simular'], tamanho_lote=options['tamanho_lote'], **linhas
+            )
+        except importacoes.ArquivoInvalido as exc:
+            raise CommandError(str(exc))
+        finally:
+            for arquivo in arquivos.values():
+                arquivo.close()
+
+        for nome in caminhos:
+            self.relatar(nome, relatorio[nome], options['simular'])
+        self.stdout.write(f'Concluído em {time.monotonic() - inicio:.1f}s')
+        if not options['simular'] and not any(relatorio[nome].importados for nome in caminhos):
+            raise CommandError('Nenhum registro importado.')
+
+    def relatar(self, nome, resultado, simular):
+        for erro in resultado.erros[:ERROS_EXIBIDOS]:
+            detalhes = '; '.join(f"{campo}: {' '.join(mensagens)}" for campo, mensagens in erro['erros'].items())
+            self.stdout.write(f"FALHA {nome} linha {erro['linha']}: {detalhes}")
+        if len(resultado.erros) > ERROS_EXIBIDOS:
+            self.stdout.write(f'... e mais {len(resultado.erros) - ERROS_EXIBIDOS} linha(s) com erro')
+        verbo = 'seriam importados' if simular else 'importados'
+        self.stdout.write(f'{nome}: {resultado.importados} de {resultado.total} {verbo}')
@@ -0,0 +1,50 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from funeraria import importacoes
+
+ERROS_EXIBIDOS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa um lote de pagamentos (JSON ou CSV, como no endpoint '
+        '/api/pagamentos/importar/) com bulk_create em blocos; linhas inválidas '
+        'são listadas e não impedem a importação das demais.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo .json ou .csv')
+        parser.add_argument('--formato', choices=importacoes.FORMATOS, help='Padrão: pela extensão do arquivo')
+        parser.add_argument(
+            '--tamanho-lote', type=int, default=importacoes.TAMANHO_LOTE,
+            help='Linhas por INSERT (bulk_create)'
+        )
+
+    def handle(self, *args, **options):
+        caminho = Path(options['arquivo'])
+        if not caminho.is_file():
+            raise CommandError(f'Arquivo não encontrado: {caminho}')
+
+        inicio = time.monotonic()
+        try:
+            formato = options['formato'] or importacoes.formato_do_arquivo(caminho.name)
+            linhas = importacoes.ler_linhas(caminho.read_bytes(), formato, 'pagamentos')
+        except importacoes.ArquivoInvalido as exc:
+            raise CommandError(str(exc))
+
+        resultado = importacoes.importar_pagamentos(linhas, options['tamanho_lote'])
+        for erro in resultado.erros[:ERROS_EXIBIDOS]:
+            detalhes = '; '.join(f"{campo}: {' '.join(mensagens)}" for campo, mensagens in erro['erros'].items())
+            self.stdout.write(f"FALHA linha {erro['linha']}: {detalhes}")
+        if len(resultado.erros) > ERROS_EXIBIDOS:
+            self.stdout.write(f'... e mais {len(resultado.erros) - ERROS_EXIBIDOS} linha(s) com erro')
+
+        self.stdout.write(
+            f'{resultado.importados} de {resultado.total} pagamento(s) importado(s) '
+            f'em {time.monotonic() - inicio:.1f}s'
+        )
+        if resultado.erros and not resultado.importados:
+            raise CommandError('Nenhum pagamento importado.')
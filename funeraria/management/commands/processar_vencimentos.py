@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from funeraria import vencimentos
+
+
+class Command(BaseCommand):
+    help = (
+        'Varredura noturna dos vínculos de clientes e dependentes a planos: prorroga os '
+        'vencidos de planos com tipo de renovação e desativa os demais, com UPDATEs em '
+        'blocos, sem carregar os registros.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', help='Data de referência, AAAA-MM-DD (padrão: hoje)')
+        parser.add_argument(
+            '--tamanho-lote', type=int, default=vencimentos.TAMANHO_LOTE,
+            help='Linhas por UPDATE (cada bloco numa transação)'
+        )
+
+    def handle(self, *args, **options):
+        hoje = None
+        if options['data']:
+            try:
+                hoje = parse_date(options['data'])
+            except ValueError:
+                hoje = None
+            if hoje is None:
+                raise CommandError('Data inválida. Use AAAA-MM-DD.')
+
+        inicio = time.monotonic()
+        relatorio = vencimentos.processar_vencimentos(hoje, options['tamanho_lote'])
+        for nome, contagens in relatorio.items():
+            self.stdout.write(
+                f"{nome}: {contagens['renovados']} vínculo(s) renovado(s), "
+                f"{contagens['encerrados']} encerrado(s)"
+            )
+        self.stdout.write(f'Concluído em {time.monotonic() - inicio:.1f}s')
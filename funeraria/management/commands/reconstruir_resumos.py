@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from funeraria import resumos
+from funeraria.models import ResumoEstatistica
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula os resumos diários, mensais e acumulados do dashboard a partir '
+        'de clientes, dependentes, planos, serviços e pagamentos (ex.: após cargas em massa).'
+    )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        resumos.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'{ResumoEstatistica.objects.count()} linhas de resumo recalculadas '
+            f'em {time.monotonic() - inicio:.1f}s'
+        ))
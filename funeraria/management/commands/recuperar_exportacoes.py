@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from funeraria import tarefas
+from funeraria.models import TarefaExportacao
+
+
+class Command(BaseCommand):
+    help = (
+        'Recupera exportações em segundo plano que ficaram pendentes ou em execução após um '
+        'reinício ou deploy (sem atualização há mais de --minutos): executa de novo as que '
+        'ainda têm tentativas e marca as demais como erro. Para rodar periodicamente (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutos', type=int, default=int(tarefas.TEMPO_PARADA.total_seconds() // 60),
+            help='Minutos sem atualização para considerar a tarefa parada'
+        )
+        parser.add_argument(
+            '--tentativas', type=int, default=tarefas.MAX_TENTATIVAS,
+            help='Execuções permitidas por tarefa antes de marcá-la como erro'
+        )
+
+    def handle(self, *args, **options):
+        if options['minutos'] <= 0 or options['tentativas'] <= 0:
+            raise CommandError('Informe minutos e tentativas positivos.')
+
+        recuperadas, falhas = tarefas.recuperar_paradas(
+            timedelta(minutes=options['minutos']), options['tentativas']
+        )
+        if falhas:
+            self.stdout.write(f'FALHA {falhas} tarefa(s) esgotaram as tentativas e foram marcadas como erro')
+        for tarefa_id in recuperadas:
+            tarefas.executar(tarefa_id)
+            tarefa = TarefaExportacao.objects.only('status', 'tipo', 'erro').get(pk=tarefa_id)
+            if tarefa.status == 'concluida':
+                self.stdout.write(f'OK    tarefa {tarefa_id} ({tarefa.tipo}) executada de novo')
+            else:
+                self.stdout.write(f'FALHA tarefa {tarefa_id} ({tarefa.tipo}): {tarefa.erro}')
+        if not recuperadas and not falhas:
+            self.stdout.write('Nenhuma exportação parada.')
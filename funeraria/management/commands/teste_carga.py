@@ -0,0 +1,477 @@
+import asyncio
+import ipaddress
+import json
+import random
+import statistics
+import time
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.settings import api_settings
+
+from funeraria import sinteticos
+from funeraria.models import ClienteFuneraria, FunerariaStatus, PlanoFuneraria
+
+AMOSTRA_MAXIMA = 1000
+MISTURA_PADRAO = 'leitura=80,relatorio=10,escrita=10'
+HOSTS_LOCAIS = ('localhost',)
+
+
+def periodo(dias=90):
+    hoje = timezone.localdate()
+    return {'data_inicio': (hoje - timedelta(days=dias)).isoformat(), 'data_fim': hoje.isoformat()}
+
+
+def _com_parametros(caminho, parametros):
+    return f'{caminho}?{urlencode(parametros)}' if parametros else caminho
+
+
+# Operações de cada categoria da mistura: função (usuário virtual) -> (rótulo, método, caminho, corpo)
+def listar_clientes(usuario):
+    pagina = usuario.rng.randint(1, usuario.amostra['paginas'])
+    return 'GET /api/clientes/', 'GET', _com_parametros('/api/clientes/', {'page': pagina}), None
+
+
+def detalhar_cliente(usuario):
+    pk = usuario.rng.choice(usuario.amostra['clientes'])
+    return 'GET /api/clientes/{id}/', 'GET', f'/api/clientes/{pk}/', None
+
+
+def buscar_cpf(usuario):
+    cpf = usuario.rng.choice(usuario.amostra['cpfs'])
+    return 'GET /api/clientes/buscar_cpf/', 'GET', _com_parametros('/api/clientes/buscar_cpf/', {'cpf': cpf}), None
+
+
+def pesquisar_clientes(usuario):
+    termo = usuario.rng.choice(sinteticos.SOBRENOMES)
+    return 'GET /api/clientes/?search=', 'GET', _com_parametros('/api/clientes/', {'search': termo}), None
+
+
+def historico_plano(usuario):
+    pk = usuario.rng.choice(usuario.amostra['planos'])
+    caminho = _com_parametros('/api/pagamentos/historico_plano/', {'plano_id': pk})
+    return 'GET /api/pagamentos/historico_plano/', 'GET', caminho, None
+
+
+def estatisticas_dashboard(usuario):
+    return 'GET /api/dashboard/estatisticas/', 'GET', '/api/dashboard/estatisticas/', None
+
+
+def relatorio_financeiro(usuario):
+    caminho = _com_parametros('/api/planos/relatorio_financeiro/', periodo())
+    return 'GET /api/planos/relatorio_financeiro/', 'GET', caminho, None
+
+
+def relatorio_pagamentos(usuario):
+    caminho = _com_parametros('/api/pagamentos/relatorio_periodo/', periodo())
+    return 'GET /api/pagamentos/relatorio_periodo/', 'GET', caminho, None
+
+
+def relatorio_servicos(usuario):
+    caminho = _com_parametros('/api/servicos/relatorio_tipos/', periodo())
+    return 'GET /api/servicos/relatorio_tipos/', 'GET', caminho, None
+
+
+def criar_cliente(usuario):
+    rng = usuario.rng
+    numero = usuario.teste.proximo_cpf()
+    corpo = {
+        'nome': f'{rng.choice(sinteticos.NOMES)} {rng.choice(sinteticos.SOBRENOMES)}',
+        'cpf': sinteticos.gerar_cpf(numero),
+        'data_nascimento': f'{rng.randint(1940, 2000)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        'telefone': f'(11) 9{rng.randint(1000, 9999)}-{rng.randint(0, 9999):04d}',
+        'endereco': f'{rng.choice(sinteticos.RUAS)}, {rng.randint(1, 2000)}',
+        'email': f'cliente{numero}@carga.test',
+        'cliente_status': usuario.amostra['status_cliente'],
+        'funcionario_cadastro': usuario.usuario_id,
+        'funcionario_atualizacao': usuario.usuario_id,
+    }
+    return 'POST /api/clientes/', 'POST', '/api/clientes/', corpo
+
+
+def atualizar_cliente(usuario):
+    pk = usuario.rng.choice(usuario.amostra['clientes'])
+    corpo = {'telefone': f'(11) 9{usuario.rng.randint(1000, 9999)}-{usuario.rng.randint(0, 9999):04d}'}
+    return 'PATCH /api/clientes/{id}/', 'PATCH', f'/api/clientes/{pk}/', corpo
+
+
+OPERACOES = {
+    'leitura': [listar_clientes, detalhar_cliente, buscar_cpf, pesquisar_clientes, historico_plano,
+                estatisticas_dashboard],
+    'relatorio': [relatorio_financeiro, relatorio_pagamentos, relatorio_servicos],
+    'escrita': [criar_cliente, atualizar_cliente],
+}
+
+
+class ErroConexao(Exception):
+    pass
+
+
+class ConexaoHTTP:
+    """
+    Cliente HTTP/1.1 mínimo sobre asyncio, com keep-alive: reaproveita a
+    conexão enquanto o servidor permitir (o runserver permite; o gunicorn
+    com workers sync fecha a cada resposta) e reconecta quando ela cai.
+    """
+
+    def __init__(self, host, porta, tempo_limite):
+        self.host = host
+        self.porta = porta
+        self.tempo_limite = tempo_limite
+        self.leitor = self.escritor = None
+
+    async def requisitar(self, metodo, caminho, corpo=None, token=None):
+        dados = json.dumps(corpo).encode() if corpo is not None else b''
+        cabecalhos = [
+            f'{metodo} {caminho} HTTP/1.1', f'Host: {self.host}:{self.porta}', 'Accept: application/json',
+            f'Content-Length: {len(dados)}',
+        ]
+        if corpo is not None:
+            cabecalhos.append('Content-Type: application/json')
+        if token:
+            cabecalhos.append(f'Authorization: Bearer {token}')
+        pedido = ('\r\n'.join(cabecalhos) + '\r\n\r\n').encode() + dados
+
+        # Uma conexão reaproveitada pode ter sido fechada pelo servidor enquanto estava ociosa
+        for tentativa in range(2):
+            reaproveitada = self.escritor is not None
+            try:
+                return await asyncio.wait_for(self._trocar(pedido), self.tempo_limite)
+            except (OSError, asyncio.IncompleteReadError, ErroConexao) as erro:
+                self.fechar()
+                if not reaproveitada or tentativa:
+                    raise ErroConexao(str(erro) or type(erro).__name__)
+            except asyncio.TimeoutError:
+                self.fechar()
+                raise ErroConexao('tempo limite esgotado')
+
+    async def _trocar(self, pedido):
+        if self.escritor is None:
+            self.leitor, self.escritor = await asyncio.open_connection(self.host, self.porta)
+        self.escritor.write(pedido)
+        await self.escritor.drain()
+
+        linha = await self.leitor.readline()
+        if not linha:
+            raise ErroConexao('conexão fechada pelo servidor')
+        versao, status = linha.decode('latin-1').split(' ', 2)[:2]
+        cabecalhos = {}
+        while True:
+            linha = await self.leitor.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            cabecalhos[nome.strip().lower()] = valor.strip()
+
+        if cabecalhos.get('transfer-encoding', '').lower() == 'chunked':
+            partes = []
+            while True:
+                tamanho = int((await self.leitor.readline()).split(b';')[0], 16)
+                if not tamanho:
+                    await self.leitor.readline()
+                    break
+                partes.append(await self.leitor.readexactly(tamanho))
+                await self.leitor.readexactly(2)
+            conteudo = b''.join(partes)
+            manter = True
+        elif 'content-length' in cabecalhos:
+            conteudo = await self.leitor.readexactly(int(cabecalhos['content-length']))
+            manter = True
+        else:
+            conteudo = await self.leitor.read()
+            manter = False
+
+        conexao = cabecalhos.get('connection', '').lower()
+        if not manter or conexao == 'close' or (versao == 'HTTP/1.0' and conexao != 'keep-alive'):
+            self.fechar()
+        return int(status), conteudo
+
+    def fechar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+        self.leitor = self.escritor = None
+
+
+class UsuarioVirtual:
+    """Entra pelo login, renova o token periodicamente e executa operações sorteadas pela mistura"""
+
+    def __init__(self, teste, numero):
+        self.teste = teste
+        self.amostra = teste.amostra
+        self.rng = random.Random(teste.seed + numero)
+        self.conexao = ConexaoHTTP(teste.host, teste.porta, teste.tempo_limite)
+        self.acesso = self.renovacao = None
+        self.usuario_id = None
+        self.ultima_renovacao = 0.0
+
+    async def chamar(self, rotulo, metodo, caminho, corpo=None, autenticar=True):
+        inicio = time.monotonic()
+        try:
+            status, conteudo = await self.conexao.requisitar(
+                metodo, self.teste.prefixo + caminho, corpo, self.acesso if autenticar else None
+            )
+        except ErroConexao as erro:
+            self.teste.registrar(rotulo, inicio, time.monotonic(), 0, str(erro))
+            return 0, b''
+        self.teste.registrar(rotulo, inicio, time.monotonic(), status)
+        return status, conteudo
+
+    async def entrar(self):
+        status, conteudo = await self.chamar(
+            'POST /api/auth/login/', 'POST', '/api/auth/login/',
+            {'username': self.teste.usuario, 'password': self.teste.senha}, autenticar=False,
+        )
+        if status != 200:
+            return False
+        dados = json.loads(conteudo)
+        self.acesso, self.renovacao = dados['access'], dados['refresh']
+        self.usuario_id = dados['user']['id']
+        self.ultima_renovacao = time.monotonic()
+        return True
+
+    async def renovar(self):
+        """Token novo pelo refresh; com rotação, o refresh também é trocado. Se falhar, entra de novo"""
+        status, conteudo = await self.chamar(
+            'POST /api/token/refresh/', 'POST', '/api/token/refresh/', {'refresh': self.renovacao}, autenticar=False,
+        )
+        if status != 200:
+            return await self.entrar()
+        dados = json.loads(conteudo)
+        self.acesso = dados['access']
+        self.renovacao = dados.get('refresh', self.renovacao)
+        self.ultima_renovacao = time.monotonic()
+        return True
+
+    async def executar(self, fim):
+        try:
+            if not await self.entrar():
+                self.teste.desistencias += 1
+                return
+            while time.monotonic() < fim:
+                if time.monotonic() - self.ultima_renovacao >= self.teste.renovar_a_cada:
+                    if not await self.renovar():
+                        self.teste.desistencias += 1
+                        return
+                categoria = self.rng.choices(self.teste.categorias, self.teste.pesos)[0]
+                operacao = self.rng.choice(OPERACOES[categoria])
+                status, _ = await self.chamar(*operacao(self))
+                if status == 401 and not await self.renovar():
+                    self.teste.desistencias += 1
+                    return
+                if self.teste.pausa:
+                    await asyncio.sleep(self.rng.expovariate(1 / self.teste.pausa))
+        finally:
+            self.conexao.fechar()
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga contra um servidor local: usuários virtuais asyncio entram pelo login JWT, '
+        'renovam o token e executam uma mistura de leituras, relatórios e escritas. Mostra a vazão e '
+        'a latência p50/p95/p99 por endpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Servidor local (só HTTP em loopback)')
+        parser.add_argument('--usuario', required=True, help='Funcionário usado no login')
+        parser.add_argument('--senha', required=True, help='Senha do funcionário')
+        parser.add_argument('--concorrencia', type=int, default=20, help='Usuários virtuais simultâneos')
+        parser.add_argument('--duracao', type=float, default=30, help='Segundos de medição')
+        parser.add_argument('--aquecimento', type=float, default=5, help='Segundos iniciais descartados')
+        parser.add_argument(
+            '--mistura', default=MISTURA_PADRAO,
+            help=f'Pesos das categorias de operação (padrão: {MISTURA_PADRAO}); escrita=0 não altera o banco'
+        )
+        parser.add_argument('--pausa', type=float, default=0, help='Pausa média entre operações, em segundos')
+        parser.add_argument('--renovar-token', type=float, default=60, help='Segundos entre renovações do token')
+        parser.add_argument('--tempo-limite', type=float, default=30, help='Tempo limite de cada requisição')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do sorteio das operações')
+        parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+
+    def handle(self, *args, **options):
+        endereco = urlsplit(options['url'])
+        if endereco.scheme != 'http' or not endereco.hostname:
+            raise CommandError('Informe a URL HTTP do servidor local, ex.: http://127.0.0.1:8000')
+        if not self.local(endereco.hostname):
+            raise CommandError(f'O teste de carga só roda contra servidores locais, não {endereco.hostname}.')
+        try:
+            mistura = {}
+            for item in options['mistura'].split(','):
+                categoria, peso = item.split('=')
+                mistura[categoria.strip()] = float(peso)
+        except ValueError:
+            raise CommandError(f"Mistura inválida. Use, por exemplo, {MISTURA_PADRAO}.")
+        desconhecidas = set(mistura) - set(OPERACOES)
+        if desconhecidas:
+            raise CommandError(f"Categorias desconhecidas: {', '.join(sorted(desconhecidas))}")
+        mistura = {categoria: peso for categoria, peso in mistura.items() if peso > 0}
+        if not mistura or options['concorrencia'] <= 0 or options['duracao'] <= 0:
+            raise CommandError('Informe uma mistura com algum peso positivo, concorrência e duração positivas.')
+
+        self.host, self.porta = endereco.hostname, endereco.port or 80
+        self.prefixo = endereco.path.rstrip('/')
+        self.usuario, self.senha = options['usuario'], options['senha']
+        self.categorias, self.pesos = list(mistura), list(mistura.values())
+        self.pausa = options['pausa']
+        self.renovar_a_cada = options['renovar_token']
+        self.tempo_limite = options['tempo_limite']
+        self.seed = options['seed']
+        self.amostra = self.montar_amostra(mistura)
+        self.cpf_seguinte = sinteticos.proximo_cpf_livre()
+        self.medidas = {}
+        self.erros = {}
+        self.desistencias = 0
+
+        self.stdout.write(
+            f"{options['concorrencia']} usuários virtuais contra {options['url']} por {options['duracao']:.0f}s "
+            f"(+{options['aquecimento']:.0f}s de aquecimento), mistura "
+            + ', '.join(f'{categoria}={peso:g}' for categoria, peso in mistura.items())
+        )
+        self.inicio_medicao = time.monotonic() + options['aquecimento']
+        fim = self.inicio_medicao + options['duracao']
+        asyncio.run(self.executar(options['concorrencia'], fim))
+        duracao = min(time.monotonic(), fim) - self.inicio_medicao
+        if duracao <= 0:
+            raise CommandError('O teste terminou antes do fim do aquecimento. Verifique o usuário e a senha.')
+
+        resultados = self.resumir(duracao)
+        resultados.update(
+            gerado_em=timezone.now().isoformat(), url=options['url'], concorrencia=options['concorrencia'],
+            mistura=mistura, pausa=self.pausa,
+        )
+        self.mostrar(resultados)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultados, arquivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Resultados gravados em {options['saida']}")
+        if not resultados['total']['requisicoes']:
+            raise CommandError('Nenhuma requisição concluída no período medido.')
+
+    @staticmethod
+    def local(host):
+        if host in HOSTS_LOCAIS:
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            return False
+
+    def montar_amostra(self, mistura):
+        """Ids e CPFs sorteados do banco local (o mesmo do servidor) para montar as requisições"""
+        total = ClienteFuneraria.objects.count()
+        if not total:
+            raise CommandError('Não há clientes no banco. Gere uma massa antes: manage.py gerar_dados --clientes N')
+        clientes = list(
+            ClienteFuneraria.objects.order_by('?').values_list('pk', 'cpf')[:AMOSTRA_MAXIMA]
+        )
+        planos = list(PlanoFuneraria.objects.order_by('?').values_list('pk', flat=True)[:AMOSTRA_MAXIMA])
+        status_cliente = FunerariaStatus.objects.filter(categoria='cliente').values_list('pk', flat=True).first()
+        if 'escrita' in mistura and status_cliente is None:
+            raise CommandError('Não há status de cliente cadastrado para as escritas.')
+        return {
+            'clientes': [pk for pk, _ in clientes],
+            'cpfs': [cpf for _, cpf in clientes],
+            'planos': planos or [0],
+            'paginas': max(1, -(-total // (api_settings.PAGE_SIZE or total))),
+            'status_cliente': status_cliente,
+        }
+
+    def proximo_cpf(self):
+        """CPFs novos e únicos para as escritas, acima dos já cadastrados"""
+        numero = self.cpf_seguinte
+        self.cpf_seguinte += 1
+        return numero
+
+    def registrar(self, rotulo, inicio, fim, status, erro=None):
+        if inicio < self.inicio_medicao:
+            return
+        medida = self.medidas.setdefault(rotulo, {'tempos': [], 'status': {}})
+        medida['tempos'].append(fim - inicio)
+        chave = str(status) if status else 'erro de conexão'
+        medida['status'][chave] = medida['status'].get(chave, 0) + 1
+        if erro:
+            self.erros[erro] = self.erros.get(erro, 0) + 1
+
+    async def executar(self, concorrencia, fim):
+        usuarios = [UsuarioVirtual(self, numero) for numero in range(concorrencia)]
+        # Um login de verificação antes da carga: credenciais ou URL erradas falham aqui, com a resposta
+        conexao = ConexaoHTTP(self.host, self.porta, self.tempo_limite)
+        try:
+            status, conteudo = await conexao.requisitar(
+                'POST', f'{self.prefixo}/api/auth/login/', {'username': self.usuario, 'password': self.senha}
+            )
+        except ErroConexao as erro:
+            raise CommandError(f'Servidor inacessível em {self.host}:{self.porta}: {erro}')
+        finally:
+            conexao.fechar()
+        if status != 200:
+            raise CommandError(f"Login recusado ({status}): {conteudo.decode('utf-8', 'replace')[:200]}")
+        await asyncio.gather(*(usuario.executar(fim) for usuario in usuarios))
+
+    @staticmethod
+    def percentis(tempos):
+        if len(tempos) > 1:
+            cortes = statistics.quantiles(tempos, n=100, method='inclusive')
+            p50, p95, p99 = cortes[49], cortes[94], cortes[98]
+        else:
+            p50 = p95 = p99 = tempos[0]
+        return {
+            'p50': round(p50 * 1000, 2), 'p95': round(p95 * 1000, 2), 'p99': round(p99 * 1000, 2),
+            'maxima': round(max(tempos) * 1000, 2),
+        }
+
+    def resumir(self, duracao):
+        endpoints = {}
+        todos = []
+        falhas = 0
+        for rotulo, medida in sorted(self.medidas.items()):
+            tempos = medida['tempos']
+            todos += tempos
+            falhas_rotulo = sum(
+                quantidade for status, quantidade in medida['status'].items()
+                if not status.isdigit() or int(status) >= 400
+            )
+            falhas += falhas_rotulo
+            endpoints[rotulo] = {
+                'requisicoes': len(tempos), 'vazao_rps': round(len(tempos) / duracao, 2),
+                'falhas': falhas_rotulo, 'status': medida['status'], 'latencia_ms': self.percentis(tempos),
+            }
+        total = {'requisicoes': len(todos), 'vazao_rps': round(len(todos) / duracao, 2), 'falhas': falhas}
+        if todos:
+            total['latencia_ms'] = self.percentis(todos)
+        return {
+            'duracao_s': round(duracao, 2), 'total': total, 'endpoints': endpoints, 'erros': self.erros,
+            'desistencias': self.desistencias,
+        }
+
+    def mostrar(self, resultados):
+        largura = max([len(rotulo) for rotulo in resultados['endpoints']] + [5])
+        self.stdout.write(
+            f"{'Endpoint':<{largura}} {'req':>7} {'req/s':>8} {'falhas':>7} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8}"
+        )
+        linhas = list(resultados['endpoints'].items()) + [('Total', resultados['total'])]
+        for rotulo, medida in linhas:
+            latencia = medida.get('latencia_ms')
+            percentis = (
+                f"{latencia['p50']:>8.1f} {latencia['p95']:>8.1f} {latencia['p99']:>8.1f} {latencia['maxima']:>8.1f}"
+                if latencia else ''
+            )
+            self.stdout.write(
+                f"{rotulo:<{largura}} {medida['requisicoes']:>7} {medida['vazao_rps']:>8.1f} "
+                f"{medida['falhas']:>7} {percentis}"
+            )
+        for erro, quantidade in resultados['erros'].items():
+            self.stdout.write(f'FALHA {quantidade}x {erro}')
+        if resultados['desistencias']:
+            self.stdout.write(
+                f"FALHA {resultados['desistencias']} usuário(s) virtual(is) pararam: login ou renovação recusados"
+            )
+        problemas = resultados['total']['falhas'] or resultados['desistencias']
+        estilo = self.style.WARNING if problemas else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{resultados['total']['requisicoes']} requisições em {resultados['duracao_s']:.1f}s "
+            f"({resultados['total']['vazao_rps']:.1f} req/s), {resultados['total']['falhas']} falhas"
+        ))
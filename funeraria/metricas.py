@@ -0,0 +1,332 @@
+# funeraria/metricas.py
+
+import atexit
+import fcntl
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from .instrumentacao import ColetorSQL, rotulos_da_requisicao
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METODOS = ('get', 'post', 'put', 'patch', 'delete')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Soma dos estados dos workers encerrados, na PASTA
+ENCERRADOS = 'encerrados.json'
+
+
+def _config():
+    return getattr(settings, 'METRICAS', {})
+
+
+def _buckets():
+    return tuple(float(limite) for limite in _config().get('BUCKETS', BUCKETS))
+
+
+@lru_cache(maxsize=1)
+def rotas_conhecidas():
+    """(view, ação, método) de todas as views DRF das URLs: as séries já aparecem zeradas na exportação"""
+    rotas = set()
+    pendentes = list(get_resolver().url_patterns)
+    while pendentes:
+        padrao = pendentes.pop()
+        if isinstance(padrao, URLResolver):
+            pendentes.extend(padrao.url_patterns)
+            continue
+        if not isinstance(padrao, URLPattern):
+            continue
+        cls = getattr(padrao.callback, 'cls', None)
+        if cls is None:
+            continue
+        acoes = getattr(padrao.callback, 'actions', None)
+        if acoes:
+            rotas.update(
+                (cls.__name__, acao, metodo.upper()) for metodo, acao in acoes.items() if metodo in METODOS
+            )
+        else:
+            rotas.update((cls.__name__, metodo, metodo.upper()) for metodo in METODOS if hasattr(cls, metodo))
+    return sorted(rotas)
+
+
+class Metricas:
+    """
+    Agregação das métricas de um processo: contagem por (view, ação, método,
+    status) e, por (view, ação, método), o histograma de latência e o tempo e
+    a quantidade de consultas SQL. Um lock protege as atualizações das
+    threads do processo.
+
+    Com uma PASTA configurada, o processo grava o próprio estado em
+    PASTA/<pid>-<início>.json a cada INTERVALO_GRAVACAO segundos e ao
+    terminar; a exportação soma os arquivos de todos os workers e os
+    arquivos de workers encerrados (`consolidar_encerrados()`).
+    """
+
+    def __init__(self, buckets):
+        self.pid = os.getpid()
+        self.arquivo = f'{self.pid}-{int(time.time() * 1000)}.json'
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.requisicoes = {}
+        self.series = {}
+        self.proxima_gravacao = 0.0
+
+    def registrar(self, rotulos, status, duracao, tempo_sql, consultas):
+        posicao = bisect_left(self.buckets, duracao)
+        with self.lock:
+            chave = (*rotulos, str(status))
+            self.requisicoes[chave] = self.requisicoes.get(chave, 0) + 1
+            serie = self.series.get(rotulos)
+            if serie is None:
+                serie = self.series[rotulos] = [[0] * (len(self.buckets) + 1), 0.0, 0.0, 0]
+            serie[0][posicao] += 1
+            serie[1] += duracao
+            serie[2] += tempo_sql
+            serie[3] += consultas
+
+    def estado(self):
+        with self.lock:
+            return {
+                'buckets': list(self.buckets),
+                'requisicoes': [[*chave, total] for chave, total in self.requisicoes.items()],
+                'series': [[*rotulos, list(serie[0]), *serie[1:]] for rotulos, serie in self.series.items()],
+            }
+
+    def gravar_se_preciso(self, pasta):
+        agora = time.monotonic()
+        if agora < self.proxima_gravacao:
+            return
+        self.proxima_gravacao = agora + float(_config().get('INTERVALO_GRAVACAO', 5))
+        self.gravar(pasta)
+
+    def gravar(self, pasta):
+        """Substitui atomicamente o arquivo do processo (os.replace), sem bloquear os leitores"""
+        pasta.mkdir(parents=True, exist_ok=True)
+        temporario = pasta / f'.{self.arquivo}.{threading.get_ident()}'
+        temporario.write_text(json.dumps(self.estado()), encoding='utf-8')
+        os.replace(temporario, pasta / self.arquivo)
+
+
+_processo = None
+_lock_processo = threading.Lock()
+
+
+def metricas_do_processo():
+    """Agregador do processo atual; um worker criado por fork começa do zero"""
+    global _processo
+    if _processo is None or _processo.pid != os.getpid():
+        with _lock_processo:
+            if _processo is None or _processo.pid != os.getpid():
+                _processo = Metricas(_buckets())
+                pasta = pasta_metricas()
+                if pasta is not None:
+                    atexit.register(_processo.gravar, pasta)
+    return _processo
+
+
+def pasta_metricas():
+    pasta = _config().get('PASTA')
+    return Path(pasta) if pasta else None
+
+
+def combinar(estados):
+    """Soma os estados de vários processos; arquivos com outros buckets são ignorados"""
+    buckets = list(_buckets())
+    requisicoes, series = {}, {}
+    processos = 0
+    for estado in estados:
+        if estado.get('buckets') != buckets:
+            continue
+        processos += not estado.get('encerrados')
+        for *chave, total in estado['requisicoes']:
+            chave = tuple(chave)
+            requisicoes[chave] = requisicoes.get(chave, 0) + total
+        for view, acao, metodo, contagens, soma, tempo_sql, consultas in estado['series']:
+            serie = series.setdefault((view, acao, metodo), [[0] * len(contagens), 0.0, 0.0, 0])
+            serie[0] = [a + b for a, b in zip(serie[0], contagens)]
+            serie[1] += soma
+            serie[2] += tempo_sql
+            serie[3] += consultas
+    return requisicoes, series, processos
+
+
+def _processo_encerrado(arquivo):
+    try:
+        os.kill(int(arquivo.stem.split('-')[0]), 0)
+    except ProcessLookupError:
+        return True
+    except (ValueError, OSError):
+        return False
+    return False
+
+
+def consolidar_encerrados(pasta):
+    """
+    Soma os arquivos de workers encerrados (pid inexistente) em ENCERRADOS e
+    os remove: cada worker reciclado deixaria um arquivo lido em toda
+    exportação, e somá-los mantém os contadores crescentes. Como usa os
+    pids, a PASTA só pode ser compartilhada por workers do mesmo host.
+    """
+    with open(pasta / '.consolidacao', 'w') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        encerrados = [arquivo for arquivo in pasta.glob('*-*.json') if _processo_encerrado(arquivo)]
+        if not encerrados:
+            return
+        estados = []
+        for arquivo in (pasta / ENCERRADOS, *encerrados):
+            try:
+                estados.append(json.loads(arquivo.read_text(encoding='utf-8')))
+            except (OSError, ValueError):
+                continue
+        requisicoes, series, _ = combinar(estados)
+        soma = {
+            'buckets': list(_buckets()),
+            'encerrados': True,
+            'requisicoes': [[*chave, total] for chave, total in requisicoes.items()],
+            'series': [[*rotulos, *serie] for rotulos, serie in series.items()],
+        }
+        temporario = pasta / f'.{ENCERRADOS}.{os.getpid()}'
+        temporario.write_text(json.dumps(soma), encoding='utf-8')
+        os.replace(temporario, pasta / ENCERRADOS)
+        for arquivo in encerrados:
+            arquivo.unlink(missing_ok=True)
+
+
+def estados_gravados():
+    """Estado do processo atual e, com PASTA, os arquivos dos demais workers e dos encerrados"""
+    atual = metricas_do_processo()
+    pasta = pasta_metricas()
+    if pasta is None:
+        return [atual.estado()]
+    atual.gravar(pasta)
+    consolidar_encerrados(pasta)
+    estados = []
+    for arquivo in pasta.glob('*.json'):
+        try:
+            estados.append(json.loads(arquivo.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue
+    return estados
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(**valores):
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in valores.items()) + '}'
+
+
+def exportar(estados):
+    """Métricas no formato de texto do Prometheus"""
+    requisicoes, series, processos = combinar(estados)
+    buckets = _buckets()
+    for rotulos in rotas_conhecidas():
+        series.setdefault(rotulos, [[0] * (len(buckets) + 1), 0.0, 0.0, 0])
+    ordenadas = sorted(series.items())
+
+    linhas = [
+        '# HELP funeraria_requisicoes_total Requisições atendidas por view, ação, método e status HTTP.',
+        '# TYPE funeraria_requisicoes_total counter',
+    ]
+    for (view, acao, metodo, status), total in sorted(requisicoes.items()):
+        linhas.append(f'funeraria_requisicoes_total{_rotulos(view=view, acao=acao, metodo=metodo, status=status)} {total}')
+
+    linhas += [
+        '# HELP funeraria_requisicao_duracao_segundos Latência das requisições (até a view devolver a resposta).',
+        '# TYPE funeraria_requisicao_duracao_segundos histogram',
+    ]
+    for (view, acao, metodo), (contagens, soma, _, _) in ordenadas:
+        acumulado = 0
+        for limite, quantidade in zip((*(repr(limite) for limite in buckets), '+Inf'), contagens):
+            acumulado += quantidade
+            rotulos = _rotulos(view=view, acao=acao, metodo=metodo, le=limite)
+            linhas.append(f'funeraria_requisicao_duracao_segundos_bucket{rotulos} {acumulado}')
+        rotulos = _rotulos(view=view, acao=acao, metodo=metodo)
+        linhas.append(f'funeraria_requisicao_duracao_segundos_sum{rotulos} {soma!r}')
+        linhas.append(f'funeraria_requisicao_duracao_segundos_count{rotulos} {acumulado}')
+
+    linhas += [
+        '# HELP funeraria_requisicao_sql_segundos_total Tempo gasto em consultas SQL durante as requisições.',
+        '# TYPE funeraria_requisicao_sql_segundos_total counter',
+    ]
+    for (view, acao, metodo), (_, _, tempo_sql, _) in ordenadas:
+        linhas.append(f'funeraria_requisicao_sql_segundos_total{_rotulos(view=view, acao=acao, metodo=metodo)} {tempo_sql!r}')
+
+    linhas += [
+        '# HELP funeraria_requisicao_sql_consultas_total Consultas SQL executadas durante as requisições.',
+        '# TYPE funeraria_requisicao_sql_consultas_total counter',
+    ]
+    for (view, acao, metodo), (_, _, _, consultas) in ordenadas:
+        linhas.append(f'funeraria_requisicao_sql_consultas_total{_rotulos(view=view, acao=acao, metodo=metodo)} {consultas}')
+
+    linhas += [
+        '# HELP funeraria_metricas_processos Processos (workers) somados nesta exportação.',
+        '# TYPE funeraria_metricas_processos gauge',
+        f'funeraria_metricas_processos {processos}',
+    ]
+    return '\n'.join(linhas) + '\n'
+
+
+class MetricasMiddleware:
+    """
+    Registra cada requisição nas métricas do processo: view e ação do viewset
+    resolvido, método, status, latência e tempo em SQL. O custo por
+    requisição é um execute_wrapper e uma atualização sob lock.
+
+    Em respostas em streaming a latência vai até a view devolver a resposta,
+    não até o último byte.
+    """
+
+    def __init__(self, get_response):
+        if not _config().get('ATIVA'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pasta = pasta_metricas()
+
+    def __call__(self, request):
+        coletor = ColetorSQL(agrupar=False)
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(coletor))
+            response = self.get_response(request)
+        duracao = time.perf_counter() - inicio
+        metricas = metricas_do_processo()
+        metricas.registrar(
+            rotulos_da_requisicao(request), response.status_code, duracao, coletor.tempo, coletor.quantidade
+        )
+        if self.pasta is not None:
+            metricas.gravar_se_preciso(self.pasta)
+        return response
+
+
+def metricas_view(request):
+    """
+    GET /metricas/: exportação para o Prometheus, com o TOKEN configurado
+    (Authorization: Bearer <token>) e só para os IPs de IPS_PERMITIDOS.
+
+    O IP sozinho não basta: atrás de um proxy na mesma máquina, REMOTE_ADDR
+    é sempre o do proxy. Sem TOKEN configurado, nenhuma requisição passa.
+    """
+    config = _config()
+    if not config.get('ATIVA'):
+        raise Http404
+    token = config.get('TOKEN')
+    enviado = request.META.get('HTTP_AUTHORIZATION', '')
+    if not token or not hmac.compare_digest(enviado.encode(), f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    if request.META.get('REMOTE_ADDR') not in config.get('IPS_PERMITIDOS', ('127.0.0.1', '::1')):
+        return HttpResponseForbidden()
+    return HttpResponse(exportar(estados_gravados()), content_type=CONTENT_TYPE)
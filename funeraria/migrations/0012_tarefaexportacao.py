@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0011_alter_planofuneraria_data_fim'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaExportacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('clientes', 'Clientes'), ('dependentes', 'Dependentes'), ('pagamentos', 'Pagamentos'), ('servicos', 'Serviços')], max_length=20, verbose_name='Tipo')),
+                ('formato', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'XLSX')], default='csv', max_length=10, verbose_name='Formato')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parâmetros de Filtro')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=20, verbose_name='Status')),
+                ('linhas_processadas', models.PositiveIntegerField(default=0, verbose_name='Linhas Processadas')),
+                ('total_linhas', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total de Linhas')),
+                ('arquivo', models.FileField(blank=True, upload_to='exportacoes/', verbose_name='Arquivo')),
+                ('erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciada em')),
+                ('concluida_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluída em')),
+                ('funcionario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tarefas_exportacao', to='funeraria.funcionariofuneraria', verbose_name='Funcionário Solicitante')),
+            ],
+            options={
+                'verbose_name': 'Tarefa de Exportação',
+                'verbose_name_plural': 'Tarefas de Exportação',
+                'db_table': 'tarefa_exportacao',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0012_tarefaexportacao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pagamentofuneraria',
+            index=models.Index(fields=['-data_hora_pagto', '-id'], name='pagamento_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicoprestadofuneraria',
+            index=models.Index(fields=['-data_hora_servico', '-id'], name='servico_data_id_idx'),
+        ),
+    ]
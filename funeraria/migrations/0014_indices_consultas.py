@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0013_indices_paginacao_cursor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clientedependenteplano',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['data_fim'], name='dependente_plano_ativo_fim_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientefuneraria',
+            index=models.Index(fields=['nome'], name='cliente_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientefuneraria',
+            index=models.Index(fields=['cliente_status', 'nome'], name='cliente_status_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientefuneraria',
+            index=models.Index(fields=['-created_at'], name='cliente_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clienteplano',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['data_fim'], name='cliente_plano_ativo_fim_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dependentefuneraria',
+            index=models.Index(fields=['nome'], name='dependente_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dependentefuneraria',
+            index=models.Index(fields=['cliente', 'nome'], name='dependente_cliente_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamentofuneraria',
+            index=models.Index(fields=['plano_funeraria', '-data_hora_pagto'], include=('valor_pago',), name='pagamento_plano_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamentofuneraria',
+            index=models.Index(fields=['status_pagamento', '-data_hora_pagto'], name='pagamento_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planofuneraria',
+            index=models.Index(fields=['-created_at'], name='plano_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planofuneraria',
+            index=models.Index(fields=['plano_status', '-created_at'], name='plano_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicoprestadofuneraria',
+            index=models.Index(fields=['tipo', '-data_hora_servico'], name='servico_tipo_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicoprestadofuneraria',
+            index=models.Index(fields=['cliente', '-data_hora_servico'], name='servico_cliente_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicoprestadofuneraria',
+            index=models.Index(fields=['plano', '-data_hora_servico'], name='servico_plano_data_idx'),
+        ),
+    ]
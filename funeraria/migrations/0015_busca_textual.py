@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:18
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+import funeraria.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0014_indices_consultas'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        django.contrib.postgres.operations.UnaccentExtension(),
+        # unaccent() é STABLE; o wrapper IMMUTABLE permite usá-lo em índices
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+                AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+            """,
+            reverse_sql='DROP FUNCTION IF EXISTS f_unaccent(text);',
+        ),
+        # Full-text em português sem acentos
+        migrations.RunSQL(
+            sql="""
+                CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            """,
+            reverse_sql='DROP TEXT SEARCH CONFIGURATION IF EXISTS portuguese_unaccent;',
+        ),
+        migrations.AddIndex(
+            model_name='clientefuneraria',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(funeraria.models.SemAcento(django.db.models.functions.text.Lower('nome')), name='gin_trgm_ops'), name='cliente_nome_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientefuneraria',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('nome', config='portuguese_unaccent'), name='cliente_nome_fts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientefuneraria',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('cpf', output_field=models.TextField())), name='gin_trgm_ops'), name='cliente_cpf_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientefuneraria',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('email', output_field=models.TextField())), name='gin_trgm_ops'), name='cliente_email_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientefuneraria',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('telefone', output_field=models.TextField())), name='gin_trgm_ops'), name='cliente_telefone_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dependentefuneraria',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(funeraria.models.SemAcento(django.db.models.functions.text.Lower('nome')), name='gin_trgm_ops'), name='dependente_nome_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dependentefuneraria',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('nome', config='portuguese_unaccent'), name='dependente_nome_fts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dependentefuneraria',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('cpf', output_field=models.TextField())), name='gin_trgm_ops'), name='dependente_cpf_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:21
+
+import re
+
+from django.db import migrations, models
+
+
+def preencher_cpf_numero(apps, schema_editor):
+    # CPFs gravados com e sem máscara podem coincidir: o registro mais antigo fica com a chave
+    for nome_modelo in ('ClienteFuneraria', 'DependenteFuneraria'):
+        modelo = apps.get_model('funeraria', nome_modelo)
+        usados = set()
+        alterados = []
+        repetidos = []
+        for pessoa in modelo.objects.order_by('pk').only('pk', 'cpf').iterator():
+            digitos = re.sub(r'[^0-9]', '', pessoa.cpf or '')
+            numero = int(digitos) if len(digitos) == 11 else None
+            if numero is None:
+                continue
+            if numero in usados:
+                repetidos.append(pessoa.pk)
+                continue
+            usados.add(numero)
+            pessoa.cpf_numero = numero
+            alterados.append(pessoa)
+        modelo.objects.bulk_update(alterados, ['cpf_numero'], batch_size=1000)
+        # Os repetidos ficam sem a chave e não podem ser gravados até o CPF ser corrigido
+        if repetidos:
+            print(f'\n  {nome_modelo}: CPF repetido, sem cpf_numero (corrigir o CPF): ids {repetidos}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0015_busca_textual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientefuneraria',
+            name='cpf_numero',
+            field=models.BigIntegerField(editable=False, null=True, verbose_name='CPF (numérico)'),
+        ),
+        migrations.AddField(
+            model_name='dependentefuneraria',
+            name='cpf_numero',
+            field=models.BigIntegerField(editable=False, null=True, verbose_name='CPF (numérico)'),
+        ),
+        migrations.RunPython(preencher_cpf_numero, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='clientefuneraria',
+            name='cpf_numero',
+            field=models.BigIntegerField(editable=False, null=True, unique=True, verbose_name='CPF (numérico)'),
+        ),
+        migrations.AlterField(
+            model_name='dependentefuneraria',
+            name='cpf_numero',
+            field=models.BigIntegerField(editable=False, null=True, unique=True, verbose_name='CPF (numérico)'),
+        ),
+    ]
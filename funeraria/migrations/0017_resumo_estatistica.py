@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0016_cpf_numerico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoEstatistica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(choices=[('dia', 'Diário'), ('mes', 'Mensal'), ('total', 'Acumulado')], max_length=5, verbose_name='Período')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('metrica', models.CharField(max_length=30, verbose_name='Métrica')),
+                ('chave', models.CharField(blank=True, default='', max_length=30, verbose_name='Chave')),
+                ('quantidade', models.BigIntegerField(default=0, verbose_name='Quantidade')),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor')),
+            ],
+            options={
+                'verbose_name': 'Resumo Estatístico',
+                'verbose_name_plural': 'Resumos Estatísticos',
+                'db_table': 'resumo_estatistica',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumoestatistica',
+            constraint=models.UniqueConstraint(fields=('periodo', 'data', 'metrica', 'chave'), name='resumo_periodo_metrica_uniq'),
+        ),
+    ]
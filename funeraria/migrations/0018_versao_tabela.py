@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0017_resumo_estatistica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoTabela',
+            fields=[
+                ('tabela', models.CharField(max_length=63, primary_key=True, serialize=False, verbose_name='Tabela')),
+                ('versao', models.BigIntegerField(default=0, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Versão de Tabela',
+                'verbose_name_plural': 'Versões de Tabelas',
+                'db_table': 'versao_tabela',
+            },
+        ),
+    ]
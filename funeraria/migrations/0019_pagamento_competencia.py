@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0018_versao_tabela'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pagamentofuneraria',
+            name='competencia',
+            field=models.DateField(blank=True, null=True, verbose_name='Competência'),
+        ),
+        migrations.AddConstraint(
+            model_name='pagamentofuneraria',
+            constraint=models.UniqueConstraint(condition=models.Q(('competencia__isnull', False)), fields=('plano_funeraria', 'competencia'), name='pagamento_plano_competencia_uniq'),
+        ),
+    ]
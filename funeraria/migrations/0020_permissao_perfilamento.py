@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0019_pagamento_competencia'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='funcionariofuneraria',
+            options={'permissions': [('perfilar_requisicoes', 'Pode perfilar requisições da API (funeraria/perfilamento.py)')], 'verbose_name': 'Funcionário', 'verbose_name_plural': 'Funcionários'},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0020_permissao_perfilamento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarefaexportacao',
+            name='tentativas',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas'),
+        ),
+        migrations.AddField(
+            model_name='tarefaexportacao',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:57
+
+import secrets
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations, models
+import funeraria.models
+
+
+def mover_arquivos(apps, schema_editor):
+    # Arquivos já gerados em MEDIA_ROOT/exportacoes/ vão para a pasta privada, com nome imprevisível
+    TarefaExportacao = apps.get_model('funeraria', 'TarefaExportacao')
+    pasta = Path(funeraria.models.armazenamento_exportacoes().location)
+    for tarefa in TarefaExportacao.objects.exclude(arquivo='').only('pk', 'tipo', 'formato', 'arquivo'):
+        origem = Path(settings.MEDIA_ROOT) / tarefa.arquivo.name
+        if not origem.is_file():
+            continue
+        nome = f'{tarefa.tipo}_{tarefa.pk}_{secrets.token_urlsafe(16)}.{tarefa.formato}'
+        pasta.mkdir(parents=True, exist_ok=True)
+        shutil.move(origem, pasta / nome)
+        TarefaExportacao.objects.filter(pk=tarefa.pk).update(arquivo=nome)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funeraria', '0021_tarefa_exportacao_recuperacao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tarefaexportacao',
+            name='arquivo',
+            field=models.FileField(blank=True, storage=funeraria.models.armazenamento_exportacoes, upload_to='', verbose_name='Arquivo'),
+        ),
+        migrations.RunPython(mover_arquivos, migrations.RunPython.noop),
+    ]
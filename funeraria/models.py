@@ -1,16 +1,33 @@
+from django.conf import settings
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector
+from django.db.models.functions import Cast, Lower, Upper
 from django.contrib.auth.models import Group, Permission
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files.storage import FileSystemStorage
 from django.utils import timezone
 import re
 from datetime import timedelta
+from pathlib import Path
+
+
+def normalizar_cpf(value):
+    """Apenas os dígitos do CPF"""
+    return re.sub(r'[^0-9]', '', value or '')
+
+
+def cpf_numerico(value):
+    """CPF como inteiro (chave de busca), ou None se não tiver 11 dígitos"""
+    cpf = normalizar_cpf(value)
+    return int(cpf) if len(cpf) == 11 else None
 
 
 def validate_cpf(value):
     """Valida CPF"""
-    cpf = re.sub(r'[^0-9]', '', value)
+    cpf = normalizar_cpf(value)
     if len(cpf) != 11 or cpf == cpf[0] * 11:
         raise ValidationError('CPF inválido')
     
@@ -27,6 +44,85 @@ def validate_cpf(value):
         raise ValidationError('CPF inválido')
 
 
+# Configuração de full-text criada na migração 0015: dicionário português + unaccent
+CONFIG_BUSCA = 'portuguese_unaccent'
+
+
+class SemAcento(models.Func):
+    """f_unaccent(): wrapper IMMUTABLE de unaccent(), utilizável em índices"""
+    function = 'f_unaccent'
+    output_field = models.TextField()
+
+
+def indice_trigram(expressao, name):
+    """Índice GIN de trigramas sobre uma expressão"""
+    return GinIndex(OpClass(expressao, name='gin_trgm_ops'), name=name)
+
+
+def indice_trigram_icontains(campo, name):
+    """Índice de trigramas no formato gerado pelo icontains: UPPER(campo::text)"""
+    return indice_trigram(Upper(Cast(campo, output_field=models.TextField())), name)
+
+
+MENSAGEM_CPF_EM_USO = 'Já existe um cadastro com este CPF.'
+
+
+class PessoaQuerySet(models.QuerySet):
+    """QuerySet de clientes e dependentes, com busca pela chave numérica do CPF"""
+
+    def por_cpf(self, cpf):
+        numero = cpf_numerico(cpf)
+        return self.filter(cpf_numero=numero) if numero is not None else self.none()
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create não chama save(): a chave numérica é preenchida aqui
+        objs = list(objs)
+        for obj in objs:
+            obj.cpf_numero = cpf_numerico(obj.cpf)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class PessoaCpfMixin(models.Model):
+    """
+    Mantém `cpf_numero` (dígitos do CPF como inteiro) sincronizado com `cpf`.
+
+    Registros antigos com CPF repetido (com e sem máscara) ficaram sem a
+    chave na migração 0016; gravá-los sem corrigir o CPF é recusado com
+    ValidationError, e não com IntegrityError.
+    """
+    cpf_numero = models.BigIntegerField(
+        unique=True,
+        null=True,
+        editable=False,
+        verbose_name='CPF (numérico)'
+    )
+
+    objects = PessoaQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def cpf_em_uso(self, cpf=None):
+        """Outro registro já tem a chave numérica do CPF (por padrão, o `cpf` atual)"""
+        numero = cpf_numerico(self.cpf if cpf is None else cpf)
+        return numero is not None and type(self).objects.filter(cpf_numero=numero).exclude(pk=self.pk).exists()
+
+    def clean(self):
+        super().clean()
+        if self.cpf_em_uso():
+            raise ValidationError({'cpf': MENSAGEM_CPF_EM_USO})
+
+    def save(self, *args, **kwargs):
+        numero = cpf_numerico(self.cpf)
+        if numero is not None and self.cpf_numero is None and not self._state.adding and self.cpf_em_uso():
+            raise ValidationError({'cpf': MENSAGEM_CPF_EM_USO})
+        self.cpf_numero = numero
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'cpf' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'cpf_numero'}
+        super().save(*args, **kwargs)
+
+
 class FuncionarioFuneraria(AbstractUser):
     first_name = models.CharField('Nome', max_length=150, blank=False, null=False)
     last_name = models.CharField('Sobrenome', max_length=150, blank=False, null=False)
@@ -66,6 +162,9 @@ class FuncionarioFuneraria(AbstractUser):
         verbose_name = 'Funcionário'
         verbose_name_plural = 'Funcionários'
         db_table = 'funcionario_funeraria'
+        permissions = [
+            ('perfilar_requisicoes', 'Pode perfilar requisições da API (funeraria/perfilamento.py)'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -219,12 +318,17 @@ class PlanoFuneraria(models.Model):
         verbose_name = 'Plano Funerário'
         verbose_name_plural = 'Planos Funerários'
         db_table = 'plano_funeraria'
+        indexes = [
+            # Listagem padrão (-created_at), filtrada ou não por status
+            models.Index(fields=['-created_at'], name='plano_created_idx'),
+            models.Index(fields=['plano_status', '-created_at'], name='plano_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Plano {self.tipo_plano} - Renovação: {self.tipo_renovacao or 'N/A'} - R$ {self.valor_mensal}"
 
 
-class ClienteFuneraria(models.Model):
+class ClienteFuneraria(PessoaCpfMixin):
     """Clientes da funerária"""
     nome = models.CharField(max_length=100, verbose_name='Nome')
     cpf = models.CharField(
@@ -266,6 +370,18 @@ class ClienteFuneraria(models.Model):
         verbose_name = 'Cliente'
         verbose_name_plural = 'Clientes'
         db_table = 'cliente_funeraria'
+        indexes = [
+            # Listagem ordenada por nome, filtrada ou não por status
+            models.Index(fields=['nome'], name='cliente_nome_idx'),
+            models.Index(fields=['cliente_status', 'nome'], name='cliente_status_nome_idx'),
+            models.Index(fields=['-created_at'], name='cliente_created_idx'),
+            # Busca textual (funeraria/busca.py e search_fields do admin)
+            indice_trigram(SemAcento(Lower('nome')), name='cliente_nome_trgm_idx'),
+            GinIndex(SearchVector('nome', config=CONFIG_BUSCA), name='cliente_nome_fts_idx'),
+            indice_trigram_icontains('cpf', name='cliente_cpf_trgm_idx'),
+            indice_trigram_icontains('email', name='cliente_email_trgm_idx'),
+            indice_trigram_icontains('telefone', name='cliente_telefone_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nome} - {self.cpf}"
@@ -275,7 +391,7 @@ class ClienteFuneraria(models.Model):
         if self.data_nascimento and self.data_nascimento > timezone.now().date():
             raise ValidationError({'data_nascimento': 'A data de nascimento não pode ser no futuro.'})
 
-class DependenteFuneraria(models.Model):
+class DependenteFuneraria(PessoaCpfMixin):
     """Dependentes dos clientes"""
     GENERO_CHOICES = [
         ('M', 'Masculino'),
@@ -333,6 +449,15 @@ class DependenteFuneraria(models.Model):
         verbose_name = 'Dependente'
         verbose_name_plural = 'Dependentes'
         db_table = 'dependente_funeraria'
+        indexes = [
+            models.Index(fields=['nome'], name='dependente_nome_idx'),
+            # por_cliente e o inline do admin: dependentes de um cliente por nome
+            models.Index(fields=['cliente', 'nome'], name='dependente_cliente_nome_idx'),
+            # Busca textual (funeraria/busca.py e search_fields do admin)
+            indice_trigram(SemAcento(Lower('nome')), name='dependente_nome_trgm_idx'),
+            GinIndex(SearchVector('nome', config=CONFIG_BUSCA), name='dependente_nome_fts_idx'),
+            indice_trigram_icontains('cpf', name='dependente_cpf_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nome} - Dependente de {self.cliente.nome}"
@@ -388,6 +513,9 @@ class PagamentoFuneraria(models.Model):
         verbose_name='Plano Funerário'
     )
 
+    # Mês cobrado (primeiro dia) das mensalidades geradas pelo faturamento (funeraria/faturamento.py)
+    competencia = models.DateField(null=True, blank=True, verbose_name='Competência')
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -395,6 +523,27 @@ class PagamentoFuneraria(models.Model):
         verbose_name_plural = 'Pagamentos'
         db_table = 'pagamento_funeraria'
         ordering = ['-data_hora_pagto']
+        indexes = [
+            # Ordenação das listagens e chave da paginação por cursor
+            models.Index(fields=['-data_hora_pagto', '-id'], name='pagamento_data_id_idx'),
+            # historico_plano e totais por plano (relatorio_financeiro); valor_pago
+            # incluído para que a soma por plano seja um index-only scan
+            models.Index(
+                fields=['plano_funeraria', '-data_hora_pagto'],
+                include=['valor_pago'],
+                name='pagamento_plano_data_idx'
+            ),
+            # relatorio_periodo e filtro de status na listagem
+            models.Index(fields=['status_pagamento', '-data_hora_pagto'], name='pagamento_status_data_idx'),
+        ]
+        constraints = [
+            # Uma mensalidade por plano e competência: o faturamento pode ser executado de novo
+            models.UniqueConstraint(
+                fields=['plano_funeraria', 'competencia'],
+                condition=models.Q(competencia__isnull=False),
+                name='pagamento_plano_competencia_uniq'
+            ),
+        ]
 
     def __str__(self):
         return f"Pagamento R$ {self.valor_pago} - {self.data_hora_pagto.strftime('%d/%m/%Y')}"
@@ -445,6 +594,14 @@ class ServicoPrestadoFuneraria(models.Model):
         verbose_name_plural = 'Serviços Prestados'
         db_table = 'servico_prestado_funeraria'
         ordering = ['-data_hora_servico']
+        indexes = [
+            # Ordenação das listagens e chave da paginação por cursor
+            models.Index(fields=['-data_hora_servico', '-id'], name='servico_data_id_idx'),
+            # Filtros da listagem e por_cliente, sempre ordenados por data
+            models.Index(fields=['tipo', '-data_hora_servico'], name='servico_tipo_data_idx'),
+            models.Index(fields=['cliente', '-data_hora_servico'], name='servico_cliente_data_idx'),
+            models.Index(fields=['plano', '-data_hora_servico'], name='servico_plano_data_idx'),
+        ]
     
     def __str__(self):
         return f"{self.tipo.descricao} - {self.cliente.nome} - {self.data_hora_servico.strftime('%d/%m/%Y')}"
@@ -472,6 +629,10 @@ class ClientePlano(models.Model):
         verbose_name_plural = 'Clientes Planos'
         db_table = 'cliente_plano'
         unique_together = ('cliente', 'plano')
+        indexes = [
+            # Vínculos ativos por vencimento (expiração e renovação de planos)
+            models.Index(fields=['data_fim'], condition=models.Q(ativo=True), name='cliente_plano_ativo_fim_idx'),
+        ]
     
     def __str__(self):
         return f"{self.cliente.nome} - {self.plano.tipo_plano.descricao}"
@@ -533,6 +694,9 @@ class ClienteDependentePlano(models.Model):
         verbose_name_plural = 'Dependentes Planos'
         db_table = 'cliente_dependente_plano'
         unique_together = ('dependente', 'plano')
+        indexes = [
+            models.Index(fields=['data_fim'], condition=models.Q(ativo=True), name='dependente_plano_ativo_fim_idx'),
+        ]
 
     def __str__(self):
         return f"{self.dependente.nome} - {self.plano.tipo_plano.descricao}"
@@ -542,5 +706,119 @@ class ClienteDependentePlano(models.Model):
         if self.data_fim and self.data_fim < self.data_inicio:
             raise ValidationError({'data_fim': 'A data de fim não pode ser anterior à data de início.'})
 
-        if self.data_fim and self.data_fim > timezone.now().date():
-            raise ValidationError({'data_fim': 'A data de fim não pode ser no futuro.'})
\ No newline at end of file
+        # No futuro, só até um período de renovação do plano: é onde o processar_vencimentos a deixa
+        hoje = timezone.now().date()
+        if self.data_fim and self.data_fim > hoje:
+            tipo_renovacao = self.plano.tipo_renovacao if self.plano_id else None
+            duracao = tipo_renovacao.duracao_em_dias if tipo_renovacao else None
+            if not duracao or self.data_fim > hoje + timedelta(days=duracao):
+                raise ValidationError({
+                    'data_fim': 'A data de fim não pode ser no futuro além de um período de renovação do plano.'
+                })
+
+def armazenamento_exportacoes():
+    """
+    Arquivos das exportações em EXPORTACAO_PASTA, nunca dentro de MEDIA_ROOT
+    (servida sem autenticação): só saem pela action `download`, com permissão.
+    """
+    pasta = Path(getattr(settings, 'EXPORTACAO_PASTA', None) or Path(settings.BASE_DIR) / 'exportacoes').resolve()
+    media = Path(settings.MEDIA_ROOT).resolve()
+    if pasta == media or media in pasta.parents:
+        raise ImproperlyConfigured('EXPORTACAO_PASTA não pode ficar dentro de MEDIA_ROOT.')
+    return FileSystemStorage(location=pasta)
+
+
+class TarefaExportacao(models.Model):
+    """Exportações executadas em segundo plano pelo pool de workers local"""
+    TIPO_CHOICES = [
+        ('clientes', 'Clientes'),
+        ('dependentes', 'Dependentes'),
+        ('pagamentos', 'Pagamentos'),
+        ('servicos', 'Serviços'),
+    ]
+    FORMATO_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'XLSX'),
+    ]
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('executando', 'Executando'),
+        ('concluida', 'Concluída'),
+        ('erro', 'Erro'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name='Tipo')
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES, default='csv', verbose_name='Formato')
+    parametros = models.JSONField(default=dict, blank=True, verbose_name='Parâmetros de Filtro')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente', verbose_name='Status')
+    linhas_processadas = models.PositiveIntegerField(default=0, verbose_name='Linhas Processadas')
+    total_linhas = models.PositiveIntegerField(null=True, blank=True, verbose_name='Total de Linhas')
+    arquivo = models.FileField(storage=armazenamento_exportacoes, blank=True, verbose_name='Arquivo')
+    erro = models.TextField(blank=True, verbose_name='Erro')
+    funcionario = models.ForeignKey(
+        FuncionarioFuneraria,
+        on_delete=models.CASCADE,
+        related_name='tarefas_exportacao',
+        verbose_name='Funcionário Solicitante'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Também atualizado a cada bloco de progresso: tarefas sem atualização recente estão paradas
+    updated_at = models.DateTimeField(auto_now=True)
+    iniciada_em = models.DateTimeField(null=True, blank=True, verbose_name='Iniciada em')
+    concluida_em = models.DateTimeField(null=True, blank=True, verbose_name='Concluída em')
+    tentativas = models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')
+
+    class Meta:
+        verbose_name = 'Tarefa de Exportação'
+        verbose_name_plural = 'Tarefas de Exportação'
+        db_table = 'tarefa_exportacao'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Exportação {self.tipo}.{self.formato} #{self.pk} ({self.status})"
+
+
+class ResumoEstatistica(models.Model):
+    """
+    Totais pré-agregados do dashboard, mantidos a cada gravação
+    (funeraria/resumos.py) e reconstruídos com `reconstruir_resumos`.
+    """
+    PERIODO_CHOICES = [
+        ('dia', 'Diário'),
+        ('mes', 'Mensal'),
+        ('total', 'Acumulado'),
+    ]
+
+    periodo = models.CharField(max_length=5, choices=PERIODO_CHOICES, verbose_name='Período')
+    data = models.DateField(verbose_name='Data')  # dia, 1º dia do mês ou data fixa no acumulado
+    metrica = models.CharField(max_length=30, verbose_name='Métrica')
+    chave = models.CharField(max_length=30, blank=True, default='', verbose_name='Chave')  # ex.: id do status
+    quantidade = models.BigIntegerField(default=0, verbose_name='Quantidade')
+    valor = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='Valor')
+
+    class Meta:
+        verbose_name = 'Resumo Estatístico'
+        verbose_name_plural = 'Resumos Estatísticos'
+        db_table = 'resumo_estatistica'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['periodo', 'data', 'metrica', 'chave'], name='resumo_periodo_metrica_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.metrica} {self.chave} ({self.periodo} {self.data}): {self.quantidade} / {self.valor}"
+
+
+class VersaoTabela(models.Model):
+    """Contador de alterações por tabela, usado nas chaves do cache de respostas (funeraria/cache.py)"""
+    tabela = models.CharField(max_length=63, primary_key=True, verbose_name='Tabela')
+    versao = models.BigIntegerField(default=0, verbose_name='Versão')
+
+    class Meta:
+        verbose_name = 'Versão de Tabela'
+        verbose_name_plural = 'Versões de Tabelas'
+        db_table = 'versao_tabela'
+
+    def __str__(self):
+        return f"{self.tabela} v{self.versao}"
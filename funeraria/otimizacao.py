@@ -0,0 +1,227 @@
+# funeraria/otimizacao.py
+
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+# Métodos de gerenciadores de relação que não leem colunas dos objetos (ex.: `dependentes.count`)
+METODOS_SEM_COLUNAS = {'count', 'exists'}
+
+
+def _nomes(valor):
+    return frozenset(nome.strip() for nome in (valor or '').split(',') if nome.strip())
+
+
+def campos_solicitados(request):
+    """(?fields=, ?exclude=) de uma requisição de leitura, ou None quando nenhum dos dois foi informado"""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    incluir = _nomes(request.query_params.get('fields'))
+    excluir = _nomes(request.query_params.get('exclude'))
+    if not incluir and not excluir:
+        return None
+    return incluir, excluir
+
+
+def selecionar_campos(nomes, selecao):
+    """Nomes mantidos pela seleção; nomes desconhecidos em ?fields=/?exclude= são ignorados"""
+    incluir, excluir = selecao
+    return frozenset(nome for nome in nomes if (not incluir or nome in incluir) and nome not in excluir)
+
+
+class ArvoreRelacoes:
+    """
+    Relações e colunas que um serializer lê a partir de `model`.
+
+    `juncoes` são FKs/one-to-one (select_related, no mesmo SELECT) e
+    `prefetches` são relações reversas e many-to-many (uma consulta por
+    relação, com o seu próprio select_related). Cada entrada aponta para a
+    árvore do modelo relacionado. `colunas` são os campos lidos diretamente;
+    `completo` indica que algum método ou propriedade recebe o objeto inteiro.
+    `anotacoes` são agregações (ex.: `Count('dependentes')`) calculadas no
+    próprio SELECT, por nome.
+    """
+
+    def __init__(self, model, relacao_inversa=None):
+        self.model = model
+        # FK do modelo de um prefetch reverso que aponta de volta para o pai:
+        # o Django já a preenche com a instância pai, sem JOIN
+        self.relacao_inversa = relacao_inversa
+        self.juncoes = {}
+        self.prefetches = {}
+        self.colunas = set()
+        self.anotacoes = {}
+        self.completo = False
+
+    def relacao(self, nome):
+        """Nó da relação `nome` (criado se necessário) ou None se `nome` não for uma relação"""
+        try:
+            campo = self.model._meta.get_field(nome)
+        except FieldDoesNotExist:
+            return None
+        # `tipo_id` também é encontrado por get_field, mas lê só a coluna da FK
+        if not campo.is_relation or campo.name != nome:
+            return None
+        if campo.many_to_one or campo.one_to_one:
+            destino, inversa = self.juncoes, None
+            if campo.concrete:
+                self.colunas.add(nome)
+        else:
+            destino, inversa = self.prefetches, campo.field.name if campo.one_to_many else None
+        if nome not in destino:
+            destino[nome] = ArvoreRelacoes(campo.related_model, inversa)
+        return destino[nome]
+
+    def ler(self, nome):
+        """Registra a leitura do atributo `nome`: uma coluna, a FK pelo id ou um método/propriedade"""
+        try:
+            campo = self.model._meta.get_field(nome)
+        except FieldDoesNotExist:
+            # Não dá para saber quais colunas um método usa
+            if nome not in METODOS_SEM_COLUNAS:
+                self.completo = True
+            return
+        if campo.concrete:
+            self.colunas.add(campo.name)
+
+    def percorrer(self, caminho):
+        """Registra as relações e colunas de um `source` pontuado; devolve o nó final se tudo for relação"""
+        no = self
+        for nome in caminho:
+            filho = no.relacao(nome)
+            if filho is None:
+                no.ler(nome)
+                return None
+            no = filho
+        return no
+
+    def colunas_carregadas(self):
+        if self.completo:
+            return [campo.name for campo in self.model._meta.concrete_fields]
+        colunas = self.colunas | {self.model._meta.pk.name}
+        if self.relacao_inversa:
+            colunas.add(self.relacao_inversa)
+        return sorted(colunas)
+
+    def lookups(self, prefixo='', restringir=False):
+        """Argumentos de select_related, prefetch_related e (se `restringir`) only() que carregam esta árvore"""
+        juncoes, prefetches = [], []
+        colunas = [prefixo + coluna for coluna in self.colunas_carregadas()] if restringir else []
+        for nome, filho in self.juncoes.items():
+            if nome == self.relacao_inversa and not (filho.juncoes or filho.prefetches):
+                continue
+            juncoes.append(prefixo + nome)
+            sub_juncoes, sub_prefetches, sub_colunas = filho.lookups(f'{prefixo}{nome}__', restringir)
+            juncoes += sub_juncoes
+            prefetches += sub_prefetches
+            colunas += sub_colunas
+        for nome, filho in self.prefetches.items():
+            queryset = filho.aplicar(filho.model._default_manager.all(), restringir)
+            prefetches.append(Prefetch(prefixo + nome, queryset=queryset))
+        return juncoes, prefetches, colunas
+
+    def aplicar(self, queryset, restringir=False, colunas_extras=()):
+        juncoes, prefetches, colunas = self.lookups(restringir=restringir)
+        if juncoes:
+            queryset = queryset.select_related(*juncoes)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        if restringir:
+            queryset = queryset.only(*colunas, *colunas_extras)
+        if self.anotacoes:
+            queryset = queryset.annotate(**self.anotacoes)
+        return queryset
+
+
+def _adicionar_serializer(arvore, serializer, campos=None):
+    for nome, campo in serializer.fields.items():
+        if campo.write_only or (campos is not None and nome not in campos):
+            continue
+        # Agregações (CampoContagem) viram anotações do queryset, sem prefetch da relação
+        if getattr(campo, 'anotacao', None) is not None:
+            arvore.anotacoes[campo.source] = campo.anotacao
+            continue
+        # source='*' (SerializerMethodField...): o campo recebe o objeto inteiro
+        if not campo.source_attrs:
+            arvore.completo = True
+            continue
+        # PrimaryKeyRelatedField lê só o id da FK
+        if isinstance(campo, serializers.RelatedField) and campo.use_pk_only_optimization():
+            no = arvore.percorrer(campo.source_attrs[:-1])
+            if no is not None:
+                no.ler(campo.source_attrs[-1])
+            continue
+        no = arvore.percorrer(campo.source_attrs)
+        if no is None:
+            continue
+        aninhado = campo.child if isinstance(campo, serializers.ListSerializer) else campo
+        if isinstance(aninhado, serializers.Serializer):
+            _adicionar_serializer(no, aninhado)
+        elif getattr(campo, 'colunas_lidas', None):
+            # Campos que recebem o objeto relacionado podem declarar as colunas que usam
+            for coluna in campo.colunas_lidas:
+                no.ler(coluna)
+        else:
+            no.completo = True
+
+
+@lru_cache(maxsize=None)
+def campos_serializer(serializer_class):
+    return tuple(serializer_class().fields)
+
+
+@lru_cache(maxsize=256)
+def arvore_serializer(serializer_class, campos=None):
+    """Árvore de relações de um ModelSerializer (ou só dos `campos`), pelos `source` e aninhados"""
+    arvore = ArvoreRelacoes(serializer_class.Meta.model)
+    _adicionar_serializer(arvore, serializer_class(), campos)
+    return arvore
+
+
+def otimizar(queryset, serializer_class, campos=None, colunas_extras=()):
+    """
+    `queryset` com o select_related/prefetch_related que `serializer_class`
+    vai percorrer. Com `campos` (seleção de ?fields=/?exclude=), só as
+    relações desses campos são carregadas e o SELECT se limita às colunas
+    lidas por eles (only()), mais as `colunas_extras`.
+    """
+    if campos is None:
+        return arvore_serializer(serializer_class).aplicar(queryset)
+    return arvore_serializer(serializer_class, campos).aplicar(queryset, True, colunas_extras)
+
+
+class OtimizacaoConsultasMixin:
+    """
+    Completa o queryset do ViewSet com as relações lidas pelo serializer da
+    ação (`get_serializer_class()`), inclusive serializers aninhados. O
+    queryset declarado não deve repetir esses select_related/prefetch_related.
+
+    `serializers_acoes` mapeia ações para serializers próprios (ex.: o
+    detalhado), para que o queryset da ação seja planejado a partir deles.
+    Em leituras com ?fields=/?exclude= o planejamento considera só os campos
+    mantidos e o SELECT traz só as colunas que eles leem (e as da ordenação
+    por cursor, usadas para montar o próximo cursor).
+
+    Ações em `acoes_sem_serializer` (exportações, que leem colunas com
+    values_list() em um cursor no servidor) recebem o queryset declarado,
+    sem relações nem anotações do serializer.
+    """
+    serializers_acoes = {}
+    acoes_sem_serializer = ('exportar_csv', 'exportar_xlsx')
+
+    def get_serializer_class(self):
+        return self.serializers_acoes.get(getattr(self, 'action', None)) or super().get_serializer_class()
+
+    def get_queryset(self):
+        if getattr(self, 'action', None) in self.acoes_sem_serializer:
+            return super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        selecao = campos_solicitados(getattr(self, 'request', None))
+        if selecao is None:
+            return otimizar(super().get_queryset(), serializer_class)
+        campos = selecionar_campos(campos_serializer(serializer_class), selecao)
+        colunas_cursor = [campo.lstrip('-') for campo in getattr(self, 'ordenacao_cursor', ('-pk',))]
+        return otimizar(super().get_queryset(), serializer_class, campos, colunas_cursor)
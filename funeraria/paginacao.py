@@ -0,0 +1,179 @@
+# funeraria/paginacao.py
+
+import base64
+import json
+from datetime import date, datetime
+
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class PaginacaoPorCursor(BasePagination):
+    """
+    Paginação por chave (keyset) sem COUNT(*) nem OFFSET.
+
+    A ordenação é a tupla `ordenacao` (todos os campos na mesma direção,
+    terminando em um campo único, como o id) e cada página filtra com uma
+    comparação de linha `(campo1, campo2) < (%s, %s)`, que percorre o índice
+    composto correspondente a partir da posição do cursor. Assim a página N
+    custa o mesmo que a primeira.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Cursor inválido'
+
+    def __init__(self, ordenacao=('-pk',)):
+        self.ordenacao = tuple(ordenacao)
+        descendentes = {campo.startswith('-') for campo in self.ordenacao}
+        if len(descendentes) != 1:
+            raise ValueError('Todos os campos da ordenação por cursor devem ter a mesma direção')
+        self.descendente = descendentes.pop()
+        self.campos = [campo.lstrip('-') for campo in self.ordenacao]
+
+    def get_page_size(self, request):
+        try:
+            tamanho = int(request.query_params[self.page_size_query_param])
+            if tamanho > 0:
+                return min(tamanho, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return api_settings.PAGE_SIZE
+
+    def _fields(self, model):
+        return [
+            model._meta.pk if campo == 'pk' else model._meta.get_field(campo)
+            for campo in self.campos
+        ]
+
+    def _codificar(self, valores, anterior):
+        valores = [v.isoformat() if isinstance(v, (date, datetime)) else str(v) for v in valores]
+        dados = json.dumps({'v': valores, 'a': anterior}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(dados.encode()).decode()
+
+    def _decodificar(self, cursor, fields):
+        try:
+            dados = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if len(dados['v']) != len(fields):
+                raise ValueError(cursor)
+            valores = [field.to_python(valor) for field, valor in zip(fields, dados['v'])]
+            return valores, bool(dados['a'])
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _posicao(self, item, fields):
+        if isinstance(item, dict):
+            return [item[field.name] if field.name in item else item[field.attname] for field in fields]
+        return [getattr(item, field.attname) for field in fields]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        model = queryset.model
+        fields = self._fields(model)
+        cursor = request.query_params.get(self.cursor_query_param)
+        valores, self.anterior = self._decodificar(cursor, fields) if cursor else (None, False)
+
+        # Ao voltar uma página a ordenação é invertida e o resultado desinvertido no final
+        descendente = self.descendente != self.anterior
+        queryset = queryset.order_by(*[('-' if descendente else '') + field.name for field in fields])
+
+        if valores is not None:
+            qn = connection.ops.quote_name
+            tabela = qn(model._meta.db_table)
+            colunas = ', '.join(f'{tabela}.{qn(field.column)}' for field in fields)
+            marcadores = ', '.join(['%s'] * len(fields))
+            operador = '<' if descendente else '>'
+            queryset = queryset.filter(RawSQL(
+                f'({colunas}) {operador} ({marcadores})',
+                [field.get_db_prep_value(v, connection) for field, v in zip(fields, valores)],
+                output_field=BooleanField()
+            ))
+
+        resultados = list(queryset[:self.page_size + 1])
+        mais = len(resultados) > self.page_size
+        resultados = resultados[:self.page_size]
+        if self.anterior:
+            resultados.reverse()
+
+        self.tem_proxima = mais if not self.anterior else True
+        self.tem_anterior = (mais if self.anterior else cursor is not None) and bool(resultados)
+        self.inicio = self._posicao(resultados[0], fields) if resultados else None
+        self.fim = self._posicao(resultados[-1], fields) if resultados else None
+        return resultados
+
+    def get_next_link(self):
+        if not self.tem_proxima or self.fim is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self._codificar(self.fim, False))
+
+    def get_previous_link(self):
+        if not self.tem_anterior:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self._codificar(self.inicio, True))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class PaginacaoPadrao(BasePagination):
+    """
+    Paginação por número de página, com modo cursor opcional.
+
+    Com `?paginacao=cursor` (ou um `cursor` já emitido) a listagem usa
+    PaginacaoPorCursor com a `ordenacao_cursor` do ViewSet, que por padrão
+    é a chave primária decrescente. Nesse modo um `?ordering=` diferente
+    dessa ordenação é recusado (400), em vez de ignorado.
+    """
+
+    @staticmethod
+    def _normalizar(campos):
+        # `id` e `pk` são o mesmo campo
+        normalizados = []
+        for campo in (campo.strip() for campo in campos):
+            if campo:
+                nome = campo.lstrip('-')
+                normalizados.append(campo[:len(campo) - len(nome)] + ('pk' if nome == 'id' else nome))
+        return normalizados
+
+    def _conferir_ordenacao(self, request, ordenacao):
+        solicitada = request.query_params.get(api_settings.ORDERING_PARAM)
+        if solicitada and self._normalizar(solicitada.split(',')) != self._normalizar(ordenacao):
+            raise ValidationError({api_settings.ORDERING_PARAM: [
+                f'A paginação por cursor só aceita a ordenação {",".join(ordenacao)}.'
+            ]})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        modo_cursor = (
+            request.query_params.get('paginacao') == 'cursor'
+            or PaginacaoPorCursor.cursor_query_param in request.query_params
+        )
+        if modo_cursor:
+            ordenacao = getattr(view, 'ordenacao_cursor', ('-pk',))
+            self._conferir_ordenacao(request, ordenacao)
+            self.paginacao = PaginacaoPorCursor(ordenacao)
+        else:
+            self.paginacao = PageNumberPagination()
+        return self.paginacao.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginacao.get_paginated_response(data)
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginacao, 'display_page_controls', False)
+
+    def to_html(self):
+        return self.paginacao.to_html()
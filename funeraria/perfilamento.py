@@ -0,0 +1,179 @@
+# funeraria/perfilamento.py
+
+import cProfile
+import io
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import permissions
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+PERMISSAO = 'funeraria.perfilar_requisicoes'
+PARAMETRO = 'perfil'
+CABECALHO = 'HTTP_X_PERFIL'
+NOME_ARQUIVO = re.compile(r'^[\w.-]+\.(prof|txt)$')
+LINHAS_RESUMO = 40
+
+# O tracemalloc é do processo: só é parado quando o último perfil de memória em andamento termina
+_memoria_lock = threading.Lock()
+_perfis_memoria = 0
+_tracemalloc_iniciado = False
+
+
+def _config():
+    return getattr(settings, 'PERFILAMENTO', {})
+
+
+def pasta_perfis():
+    """Pasta dos perfis; nunca dentro de MEDIA_ROOT, que é servida sem autenticação"""
+    pasta = Path(_config().get('PASTA') or Path(settings.BASE_DIR) / 'perfis').resolve()
+    media = Path(settings.MEDIA_ROOT).resolve()
+    if pasta == media or media in pasta.parents:
+        raise ImproperlyConfigured('PERFILAMENTO["PASTA"] não pode ficar dentro de MEDIA_ROOT.')
+    return pasta
+
+
+def listar_perfis():
+    """Perfis gravados, do mais recente para o mais antigo"""
+    return sorted(pasta_perfis().glob('*.prof'), key=lambda caminho: caminho.stat().st_mtime, reverse=True)
+
+
+def arquivo_perfil(nome):
+    """Caminho de um perfil (.prof) ou resumo (.txt) gravado, ou None se o nome não for de um deles"""
+    if not NOME_ARQUIVO.match(nome or ''):
+        return None
+    caminho = pasta_perfis() / nome
+    return caminho if caminho.is_file() else None
+
+
+def modo_solicitado(request):
+    """'cpu', 'memoria' (cProfile + tracemalloc) ou None, pelo ?perfil= ou pelo cabeçalho X-Perfil"""
+    valor = (request.GET.get(PARAMETRO) or request.META.get(CABECALHO) or '').strip().lower()
+    if not valor or valor in ('0', 'false', 'nao'):
+        return None
+    return 'memoria' if valor in ('memoria', 'mem') else 'cpu'
+
+
+def usuario_da_requisicao(request):
+    """Usuário da sessão ou, antes do DRF autenticar, do token JWT do cabeçalho Authorization"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    try:
+        autenticado = JWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+    return autenticado[0] if autenticado else None
+
+
+def _aplicar_retencao():
+    """Mantém só os MAX_PERFIS perfis mais recentes (cada um com o .prof e o resumo .txt)"""
+    maximo = int(_config().get('MAX_PERFIS', 50))
+    for antigo in listar_perfis()[maximo:]:
+        antigo.unlink(missing_ok=True)
+        antigo.with_suffix('.txt').unlink(missing_ok=True)
+
+
+def salvar_perfil(request, user, perfil, duracao, memoria=None):
+    """Grava o perfil (.prof, para pstats/snakeviz) e um resumo legível (.txt); devolve o nome base"""
+    pasta = pasta_perfis()
+    pasta.mkdir(parents=True, exist_ok=True)
+    caminho_url = re.sub(r'[^\w]+', '-', request.path).strip('-')[:80] or 'raiz'
+    nome = f"{datetime.now():%Y%m%d-%H%M%S-%f}_{request.method}_{caminho_url}_{user.pk}"
+
+    perfil.dump_stats(pasta / f'{nome}.prof')
+    resumo = io.StringIO()
+    resumo.write(f'{request.method} {request.get_full_path()}\nUsuário: {user}\n')
+    resumo.write(f'Duração: {duracao * 1000:.1f} ms\n\n')
+    pstats.Stats(perfil, stream=resumo).sort_stats('cumulative').print_stats(LINHAS_RESUMO)
+    if memoria is not None:
+        snapshot, pico = memoria
+        resumo.write(f'\nMemória alocada (tracemalloc), pico: {pico / 1024:.1f} KiB\n')
+        for estatistica in snapshot.statistics('lineno')[:LINHAS_RESUMO]:
+            resumo.write(f'{estatistica}\n')
+    (pasta / f'{nome}.txt').write_text(resumo.getvalue(), encoding='utf-8')
+
+    _aplicar_retencao()
+    return nome
+
+
+def _iniciar_memoria():
+    global _perfis_memoria, _tracemalloc_iniciado
+    with _memoria_lock:
+        if _perfis_memoria == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_iniciado = True
+        _perfis_memoria += 1
+        tracemalloc.reset_peak()
+
+
+def _encerrar_memoria():
+    global _perfis_memoria, _tracemalloc_iniciado
+    with _memoria_lock:
+        _perfis_memoria -= 1
+        if _perfis_memoria == 0 and _tracemalloc_iniciado:
+            tracemalloc.stop()
+            _tracemalloc_iniciado = False
+
+
+class PerfilamentoMiddleware:
+    """
+    Perfila uma requisição sob demanda: com ?perfil=1 (ou o cabeçalho
+    X-Perfil: 1) e a permissão `perfilar_requisicoes`, a requisição roda sob
+    o cProfile e, com ?perfil=memoria, também sob o tracemalloc. O perfil é
+    gravado na PASTA configurada (com retenção) e o nome volta no cabeçalho
+    X-Perfil; a listagem e o download ficam em /api/perfis/.
+
+    Requisições perfiladas não leem o cache de respostas. O tracemalloc é
+    global ao processo: com outras threads ativas, o resumo de memória
+    também inclui as alocações delas, e perfis de memória simultâneos
+    compartilham o rastreamento (o pico é contado a partir do último que
+    começou); ele só é desligado quando o último termina.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        modo = modo_solicitado(request)
+        if modo is None:
+            return self.get_response(request)
+        user = usuario_da_requisicao(request)
+        if user is None or not user.has_perm(PERMISSAO):
+            return self.get_response(request)
+
+        request.perfilando = True
+        memoria = modo == 'memoria'
+        if memoria:
+            _iniciar_memoria()
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        try:
+            perfil.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                perfil.disable()
+            duracao = time.perf_counter() - inicio
+            dados_memoria = (tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()[1]) if memoria else None
+        finally:
+            if memoria:
+                _encerrar_memoria()
+
+        response['X-Perfil'] = salvar_perfil(request, user, perfil, duracao, dados_memoria)
+        return response
+
+
+class PodePerfilar(permissions.BasePermission):
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.has_perm(PERMISSAO))
@@ -0,0 +1,147 @@
+# funeraria/registro.py
+
+import threading
+import time
+
+from django.core.signals import request_started
+from django.db import transaction
+
+from .models import DependenteStatus, FunerariaStatus, FunerariaTipos, VersaoTabela
+
+
+class Registro:
+    """
+    Cópia em memória de uma tabela auxiliar pequena (status, tipos).
+
+    A tabela é carregada uma vez por processo e consultada por id, nome ou
+    categoria em O(1). Gravações no próprio processo limpam o registro após
+    o commit; as feitas em outros workers são detectadas pela versão da
+    tabela em `versao_tabela`, conferida no início de cada requisição e, em
+    threads de longa duração (exportações, comandos), a cada
+    INTERVALO_CONFERENCIA segundos.
+    """
+
+    def __init__(self, model, campo_nome, campo_categoria=None):
+        self.model = model
+        self.campo_nome = campo_nome
+        self.campo_categoria = campo_categoria
+        self._dados = None
+        self._versao = None
+        self._lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # Serializers copiam os argumentos dos campos: o registro é único por processo
+        return self
+
+    @property
+    def tabela(self):
+        return self.model._meta.db_table
+
+    def _carregar(self):
+        with self._lock:
+            if self._dados is not None:
+                return self._dados
+            versao = VersaoTabela.objects.filter(tabela=self.tabela).values_list('versao', flat=True).first() or 0
+            objetos = list(self.model.objects.order_by('pk'))
+            por_nome = {}
+            por_categoria = {}
+            for obj in objetos:
+                nome = getattr(obj, self.campo_nome)
+                categoria = getattr(obj, self.campo_categoria) if self.campo_categoria else None
+                por_nome.setdefault((nome, categoria), obj)
+                por_nome.setdefault((nome, None), obj)
+                por_categoria.setdefault(categoria, []).append(obj)
+            # O dicionário é substituído de uma vez: leitores em outras threads nunca veem uma carga parcial
+            self._dados = {
+                'por_id': {obj.pk: obj for obj in objetos},
+                'por_nome': por_nome,
+                'por_categoria': por_categoria,
+            }
+            self._versao = versao
+            return self._dados
+
+    def _obter(self):
+        _conferir_versoes()
+        return self._dados or self._carregar()
+
+    def limpar(self):
+        self._dados = None
+
+    def todos(self):
+        return list(self._obter()['por_id'].values())
+
+    def por_id(self, pk):
+        return self._obter()['por_id'].get(pk)
+
+    def por_nome(self, nome, categoria=None):
+        """
+        Primeiro registro com o nome na categoria informada ou, se não houver
+        nela (dados sem categoria preenchida), com o nome em qualquer
+        categoria; DoesNotExist se nenhum tiver o nome.
+        """
+        por_nome = self._obter()['por_nome']
+        obj = por_nome.get((nome, categoria)) or por_nome.get((nome, None))
+        if obj is None:
+            raise self.model.DoesNotExist(f'{self.model._meta.verbose_name} "{nome}" não encontrado')
+        return obj
+
+    def da_categoria(self, categoria):
+        return list(self._obter()['por_categoria'].get(categoria, []))
+
+    def ids_validos(self, categoria):
+        """
+        Ids aceitos para a categoria, com a mesma regra de `por_nome`: os da
+        categoria ou, se nenhum registro a tiver (dados iniciais sem categoria
+        preenchida), todos.
+        """
+        return {obj.pk for obj in self.da_categoria(categoria) or self.todos()}
+
+
+status = Registro(FunerariaStatus, 'status', 'categoria')
+status_dependente = Registro(DependenteStatus, 'status')
+tipos = Registro(FunerariaTipos, 'descricao', 'categoria')
+
+REGISTROS = {registro.model: registro for registro in (status, status_dependente, tipos)}
+
+# Status de pagamento que contam como valor arrecadado (mensalidades faturadas nascem 'Pendente')
+STATUS_PAGOS = ('Pago',)
+
+
+def status_pagos():
+    """Ids dos status de STATUS_PAGOS, pelo nome (os dados iniciais não têm categoria)"""
+    return [obj.pk for obj in status.todos() if obj.status in STATUS_PAGOS]
+
+INTERVALO_CONFERENCIA = 5
+
+_local = threading.local()
+
+
+def _conferir_versoes():
+    # Uma consulta por requisição (ou por intervalo, fora delas) cobre todos os registros
+    agora = time.monotonic()
+    if agora - getattr(_local, 'conferido_em', float('-inf')) < INTERVALO_CONFERENCIA:
+        return
+    _local.conferido_em = agora
+    carregados = [registro for registro in REGISTROS.values() if registro._dados is not None]
+    if not carregados:
+        return
+    versoes = dict(VersaoTabela.objects.filter(
+        tabela__in=[registro.tabela for registro in carregados]
+    ).values_list('tabela', 'versao'))
+    for registro in carregados:
+        if versoes.get(registro.tabela, 0) != registro._versao:
+            registro.limpar()
+
+
+def _nova_requisicao(**kwargs):
+    _local.conferido_em = float('-inf')
+
+
+def invalidar(model):
+    """Limpa o registro do modelo quando a transação corrente for confirmada"""
+    registro = REGISTROS.get(model)
+    if registro is not None:
+        transaction.on_commit(registro.limpar)
+
+
+request_started.connect(_nova_requisicao, dispatch_uid='registro_nova_requisicao')
@@ -0,0 +1,138 @@
+# funeraria/relatorios.py
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import registro
+from .models import PagamentoFuneraria, ServicoPrestadoFuneraria
+
+
+def _agregado_por_plano(model, campo_plano, expressao, output_field, vazio, **filtros):
+    """Subquery correlacionada que agrega as linhas de `model` (filtradas por `filtros`) de cada plano"""
+    subquery = (
+        model.objects
+        .filter(**{campo_plano: OuterRef('pk')}, **filtros)
+        .order_by()
+        .values(campo_plano)
+        .annotate(valor=expressao)
+        .values('valor')
+    )
+    return Coalesce(Subquery(subquery, output_field=output_field), Value(vazio), output_field=output_field)
+
+
+def _inicio_do_dia(data):
+    return timezone.make_aware(datetime.combine(data, time.min))
+
+
+def filtrar_periodo(queryset, campo, data_inicio=None, data_fim=None):
+    """Aplica limites de data (inclusivos) a um DateTimeField sem impedir o uso de índices"""
+    if data_inicio:
+        queryset = queryset.filter(**{f'{campo}__gte': _inicio_do_dia(data_inicio)})
+    if data_fim:
+        queryset = queryset.filter(**{f'{campo}__lt': _inicio_do_dia(data_fim + timedelta(days=1))})
+    return queryset
+
+
+def relatorio_financeiro(planos):
+    """
+    Relatório financeiro por plano em uma única consulta agrupada.
+
+    Os totais de pagamentos e serviços são calculados por subqueries
+    correlacionadas, evitando o produto cartesiano de dois JOINs e as
+    consultas por plano. O total arrecadado soma só os pagamentos com
+    status pago; mensalidades faturadas e ainda pendentes ficam de fora.
+    Retorna um queryset de dicionários.
+    """
+    decimal = DecimalField(max_digits=14, decimal_places=2)
+    inteiro = IntegerField()
+    return (
+        planos
+        .select_related(None)
+        .prefetch_related(None)
+        .annotate(
+            total_arrecadado=_agregado_por_plano(
+                PagamentoFuneraria, 'plano_funeraria', Sum('valor_pago'), decimal, Decimal('0'),
+                status_pagamento__in=registro.status_pagos(),
+            ),
+            total_pagamentos=_agregado_por_plano(
+                PagamentoFuneraria, 'plano_funeraria', Count('id'), inteiro, 0
+            ),
+            total_servicos=_agregado_por_plano(
+                ServicoPrestadoFuneraria, 'plano', Count('id'), inteiro, 0
+            ),
+        )
+        .values(
+            'id', 'tipo_renovacao', 'valor_mensal',
+            'total_arrecadado', 'total_pagamentos', 'total_servicos'
+        )
+    )
+
+
+def _descricao_tipo(tipo_id):
+    tipo = registro.tipos.por_id(tipo_id) if tipo_id else None
+    return tipo.descricao if tipo else None
+
+
+def linha_relatorio_financeiro(linha):
+    """Converte uma linha do queryset no formato exposto pela API"""
+    return {
+        'plano_id': linha['id'],
+        'tipo_renovacao': linha['tipo_renovacao'],
+        'tipo_renovacao_descricao': _descricao_tipo(linha['tipo_renovacao']),
+        'valor_mensal': linha['valor_mensal'],
+        'total_arrecadado': linha['total_arrecadado'],
+        'total_pagamentos': linha['total_pagamentos'],
+        'total_servicos': linha['total_servicos'],
+    }
+
+
+CABECALHO_RELATORIO_FINANCEIRO = [
+    'Plano', 'Tipo de Renovação', 'Valor Mensal', 'Total Arrecadado', 'Pagamentos', 'Serviços'
+]
+
+
+def linhas_relatorio_financeiro(linhas):
+    """Linhas do relatório financeiro na ordem de CABECALHO_RELATORIO_FINANCEIRO"""
+    for linha in linhas.iterator(chunk_size=2000):
+        yield [
+            linha['id'], _descricao_tipo(linha['tipo_renovacao']) or 'N/A', linha['valor_mensal'],
+            linha['total_arrecadado'], linha['total_pagamentos'], linha['total_servicos'],
+        ]
+
+
+def resumo_financeiro(planos):
+    """Totais gerais dos planos do relatório, sem percorrer as linhas"""
+    planos = planos.order_by().values('pk')
+    pagamentos = PagamentoFuneraria.objects.filter(plano_funeraria__in=planos).aggregate(
+        total=Sum('valor_pago', filter=Q(status_pagamento__in=registro.status_pagos())), quantidade=Count('id')
+    )
+    return [
+        ('Planos', planos.count()),
+        ('Pagamentos', pagamentos['quantidade']),
+        ('Total arrecadado (R$)', pagamentos['total'] or Decimal('0')),
+        ('Serviços', ServicoPrestadoFuneraria.objects.filter(plano__in=planos).count()),
+    ]
+
+
+def relatorio_periodo(pagamentos):
+    """Pagamentos agrupados por status e total geral do período"""
+    por_status = (
+        pagamentos
+        .order_by()
+        .values('status_pagamento')
+        .annotate(total=Sum('valor_pago'), quantidade=Count('id'))
+        .order_by('-total')
+    )
+    total_geral = pagamentos.aggregate(total=Sum('valor_pago'))['total'] or 0
+    return [
+        {
+            'status_pagamento': getattr(registro.status.por_id(linha['status_pagamento']), 'status', None),
+            'total': linha['total'],
+            'quantidade': linha['quantidade'],
+        }
+        for linha in por_status
+    ], total_geral
@@ -0,0 +1,180 @@
+# funeraria/resumos.py
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .cache import invalidar
+from .models import (
+    ClienteFuneraria, DependenteFuneraria, PagamentoFuneraria, PlanoFuneraria,
+    ResumoEstatistica, ServicoPrestadoFuneraria
+)
+
+# Data usada nas linhas do período 'total' (acumulado de todo o histórico)
+DATA_ACUMULADO = date(2000, 1, 1)
+LINHAS_POR_INSERT = 1000
+
+
+class Metrica:
+    """Métrica contada por dia de `campo_data`, opcionalmente por `chave` e somando `valor`"""
+
+    def __init__(self, nome, campo_data, chave=None, valor=None):
+        self.nome = nome
+        self.campo_data = campo_data
+        self.chave = chave
+        self.valor = valor
+
+    @property
+    def campos(self):
+        return [campo for campo in (self.campo_data, self.chave, self.valor) if campo]
+
+
+METRICAS = {
+    ClienteFuneraria: [
+        Metrica('clientes', 'created_at'),
+        Metrica('clientes_status', 'created_at', chave='cliente_status_id'),
+    ],
+    DependenteFuneraria: [Metrica('dependentes', 'created_at')],
+    PlanoFuneraria: [Metrica('planos', 'created_at')],
+    ServicoPrestadoFuneraria: [Metrica('servicos', 'data_hora_servico')],
+    PagamentoFuneraria: [
+        Metrica('pagamentos', 'data_hora_pagto', valor='valor_pago'),
+        Metrica('pagamentos_status', 'data_hora_pagto', chave='status_pagamento_id', valor='valor_pago'),
+    ],
+}
+
+
+def campos_monitorados(model):
+    return {campo for metrica in METRICAS[model] for campo in metrica.campos}
+
+
+def contribuicoes(model, valores):
+    """
+    Quanto uma linha soma nos resumos: {(métrica, chave, dia): (quantidade, valor)}.
+
+    `valores` mapeia os `campos_monitorados` do modelo para os valores da linha.
+    """
+    resultado = {}
+    for metrica in METRICAS[model]:
+        momento = valores[metrica.campo_data]
+        if momento is None:
+            continue
+        dia = timezone.localtime(momento).date()
+        chave = str(valores[metrica.chave]) if metrica.chave else ''
+        valor = (valores[metrica.valor] or Decimal('0')) if metrica.valor else Decimal('0')
+        resultado[(metrica.nome, chave, dia)] = (1, valor)
+    return resultado
+
+
+def contribuicoes_instancia(instance):
+    model = type(instance)
+    return contribuicoes(model, {campo: getattr(instance, campo) for campo in campos_monitorados(model)})
+
+
+def contribuicoes_gravadas(model, pk):
+    """Contribuições da linha como está no banco (antes de uma alteração)"""
+    valores = model.objects.filter(pk=pk).values(*campos_monitorados(model)).first()
+    return contribuicoes(model, valores) if valores else {}
+
+
+def diferenca(anteriores, novas):
+    deltas = {}
+    for chave in anteriores.keys() | novas.keys():
+        quantidade_nova, valor_novo = novas.get(chave, (0, Decimal('0')))
+        quantidade_anterior, valor_anterior = anteriores.get(chave, (0, Decimal('0')))
+        if (quantidade_nova, valor_novo) != (quantidade_anterior, valor_anterior):
+            deltas[chave] = (quantidade_nova - quantidade_anterior, valor_novo - valor_anterior)
+    return deltas
+
+
+def _somar(linhas):
+    # Um único INSERT ... ON CONFLICT por lote: incremento atômico mesmo com gravações concorrentes
+    tabela = connection.ops.quote_name(ResumoEstatistica._meta.db_table)
+    for inicio in range(0, len(linhas), LINHAS_POR_INSERT):
+        lote = linhas[inicio:inicio + LINHAS_POR_INSERT]
+        marcadores = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(lote))
+        params = [
+            valor for (periodo, data, metrica, chave), (quantidade, total) in lote
+            for valor in (periodo, data, metrica, chave, quantidade, total)
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {tabela} (periodo, data, metrica, chave, quantidade, valor) '
+                f'VALUES {marcadores} '
+                f'ON CONFLICT (periodo, data, metrica, chave) DO UPDATE SET '
+                f'quantidade = {tabela}.quantidade + EXCLUDED.quantidade, '
+                f'valor = {tabela}.valor + EXCLUDED.valor',
+                params
+            )
+
+
+def aplicar(deltas):
+    """Soma os deltas {(métrica, chave, dia): (quantidade, valor)} nos resumos diário, mensal e acumulado"""
+    linhas = defaultdict(lambda: [0, Decimal('0')])
+    for (metrica, chave, dia), (quantidade, valor) in deltas.items():
+        for periodo, data in (('dia', dia), ('mes', dia.replace(day=1)), ('total', DATA_ACUMULADO)):
+            linha = linhas[(periodo, data, metrica, chave)]
+            linha[0] += quantidade
+            linha[1] += valor
+    # Ordem fixa das linhas para que transações concorrentes não entrem em deadlock
+    _somar(sorted((chave, linha) for chave, linha in linhas.items() if linha[0] or linha[1]))
+
+
+def registrar_criados(objs):
+    """Contabiliza objetos inseridos com bulk_create, que não dispara signals"""
+    deltas = defaultdict(lambda: (0, Decimal('0')))
+    for obj in objs:
+        for chave, (quantidade, valor) in contribuicoes_instancia(obj).items():
+            deltas[chave] = (deltas[chave][0] + quantidade, deltas[chave][1] + valor)
+    aplicar(deltas)
+
+
+@transaction.atomic
+def reconstruir():
+    """Recalcula todos os resumos a partir das tabelas de origem"""
+    ResumoEstatistica.objects.all().delete()
+    deltas = {}
+    for model, metricas in METRICAS.items():
+        for metrica in metricas:
+            agrupamento = ['dia'] + ([metrica.chave] if metrica.chave else [])
+            agregados = {'quantidade': Count('pk')}
+            if metrica.valor:
+                agregados['valor'] = Sum(metrica.valor)
+            linhas = (
+                model.objects
+                .filter(**{f'{metrica.campo_data}__isnull': False})
+                .annotate(dia=TruncDate(metrica.campo_data))
+                .order_by()
+                .values(*agrupamento)
+                .annotate(**agregados)
+            )
+            for linha in linhas:
+                chave = str(linha[metrica.chave]) if metrica.chave else ''
+                deltas[(metrica.nome, chave, linha['dia'])] = (
+                    linha['quantidade'], linha.get('valor') or Decimal('0')
+                )
+    aplicar(deltas)
+    invalidar(ResumoEstatistica)
+
+
+def obter(*consultas):
+    """
+    Lê as linhas de resumo pedidas em uma única consulta.
+
+    Cada consulta é (período, data, métricas); o resultado é
+    {(período, métrica, chave): (quantidade, valor)}.
+    """
+    filtro = ResumoEstatistica.objects.none()
+    for periodo, data, metricas in consultas:
+        filtro |= ResumoEstatistica.objects.filter(periodo=periodo, data=data, metrica__in=metricas)
+    return {
+        (periodo, metrica, chave): (quantidade, valor)
+        for periodo, metrica, chave, quantidade, valor in filtro.values_list(
+            'periodo', 'metrica', 'chave', 'quantidade', 'valor'
+        )
+    }
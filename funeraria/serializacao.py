@@ -0,0 +1,209 @@
+# funeraria/serializacao.py
+
+from functools import lru_cache
+from operator import itemgetter
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.relations import PKOnlyObject
+from rest_framework.response import Response
+
+from .otimizacao import campos_serializer, campos_solicitados, selecionar_campos
+
+# Valor que indica campo omitido na resposta (SkipField do DRF)
+PULAR = object()
+
+
+def _nome_completo(first_name, last_name):
+    # Mesmo texto de AbstractUser.get_full_name()
+    return f'{first_name} {last_name}'.strip()
+
+
+# Métodos de modelo reproduzidos a partir de colunas: método -> (colunas, função)
+METODOS_COMPILADOS = {
+    AbstractUser.get_full_name: (('first_name', 'last_name'), _nome_completo),
+}
+
+
+class NaoCompilavel(Exception):
+    """O campo depende de instâncias de modelo; a listagem usa o serializer"""
+
+
+def _ausente(campo):
+    """Resultado do DRF quando uma FK intermediária do `source` é nula"""
+    if campo.default is not empty:
+        raise NaoCompilavel(campo.field_name)
+    if campo.allow_null:
+        return None
+    if not campo.required:
+        return PULAR
+    raise NaoCompilavel(campo.field_name)
+
+
+def _caminho(model, partes):
+    """
+    Percorre as FKs de `partes` (menos a última) a partir de `model`.
+
+    Devolve o modelo final, o prefixo de values() e as colunas das FKs
+    percorridas, que indicam quando o objeto intermediário não existe.
+    """
+    prefixo, presencas = '', []
+    for nome in partes:
+        try:
+            campo = model._meta.get_field(nome)
+        except FieldDoesNotExist:
+            raise NaoCompilavel(nome)
+        if not (campo.many_to_one or campo.one_to_one) or not campo.concrete or campo.name != nome:
+            raise NaoCompilavel(nome)
+        presencas.append(prefixo + nome)
+        prefixo = f'{prefixo}{nome}__'
+        model = campo.related_model
+    return model, prefixo, presencas
+
+
+def _compilar_campo(model, campo):
+    """(colunas de values(), acessor da linha) de um campo do serializer"""
+    if isinstance(campo, (serializers.BaseSerializer, serializers.ManyRelatedField)) or not campo.source_attrs:
+        raise NaoCompilavel(campo.field_name)
+    # Anotação adicionada ao queryset pelo planejamento de consultas (otimizacao.py)
+    if getattr(campo, 'anotacao', None) is not None:
+        to_representation = campo.to_representation
+        return [campo.source], lambda linha: to_representation(linha[campo.source])
+    model, prefixo, presencas = _caminho(model, campo.source_attrs[:-1])
+    if isinstance(campo, serializers.RelatedField):
+        if not campo.use_pk_only_optimization():
+            raise NaoCompilavel(campo.field_name)
+        chave = prefixo + campo.source_attrs[-1]
+        colunas = [chave]
+
+        def converter(linha):
+            return PKOnlyObject(linha[chave]) if linha[chave] is not None else None
+    else:
+        colunas, converter = _compilar_final(model, prefixo, campo)
+
+    ausente = _ausente(campo) if presencas else None
+    to_representation = campo.to_representation
+
+    def acessor(linha):
+        for presenca in presencas:
+            if linha[presenca] is None:
+                return ausente
+        valor = converter(linha)
+        return None if valor is None else to_representation(valor)
+
+    return presencas + colunas, acessor
+
+
+def _compilar_final(model, prefixo, campo):
+    """Colunas e conversão do último atributo do `source`: coluna, método conhecido ou objeto relacionado"""
+    nome = campo.source_attrs[-1]
+    try:
+        campo_modelo = model._meta.get_field(nome)
+    except FieldDoesNotExist:
+        metodo = METODOS_COMPILADOS.get(getattr(model, nome, None))
+        if metodo is None:
+            raise NaoCompilavel(campo.field_name)
+        colunas_metodo, funcao = metodo
+        colunas = [prefixo + coluna for coluna in colunas_metodo]
+        return colunas, lambda linha: funcao(*(linha[coluna] for coluna in colunas))
+    if not campo_modelo.concrete:
+        raise NaoCompilavel(campo.field_name)
+    if not campo_modelo.is_relation or campo_modelo.name != nome:
+        return [prefixo + nome], itemgetter(prefixo + nome)
+    # O campo recebe o objeto relacionado: só se declarar as colunas que lê
+    colunas_lidas = getattr(campo, 'colunas_lidas', None)
+    if not colunas_lidas:
+        raise NaoCompilavel(campo.field_name)
+    relacionado = campo_modelo.related_model
+    chave = prefixo + nome
+    atributos = [
+        (relacionado._meta.get_field(coluna).attname, f'{chave}__{coluna}') for coluna in colunas_lidas
+    ]
+
+    def converter(linha):
+        if linha[chave] is None:
+            return None
+        return SimpleNamespace(**{atributo: linha[coluna] for atributo, coluna in atributos})
+
+    return [chave] + [coluna for _, coluna in atributos], converter
+
+
+class SerializadorRapido:
+    """
+    Saída de um ModelSerializer gerada a partir de linhas de values().
+
+    Cada campo vira um acessor pré-compilado que lê as colunas da linha e
+    aplica o `to_representation` do próprio campo do serializer, com as
+    mesmas regras do DRF para valores nulos e FKs intermediárias ausentes:
+    o JSON é idêntico ao do serializer, sem instâncias de modelo por linha.
+    """
+
+    def __init__(self, colunas, acessores):
+        self.colunas = colunas
+        self.acessores = acessores
+
+    def preparar(self, queryset, colunas_extras=()):
+        colunas = dict.fromkeys([*self.colunas, *colunas_extras])
+        return queryset.prefetch_related(None).values(*colunas)
+
+    def serializar(self, linhas):
+        resultado = []
+        for linha in linhas:
+            item = {}
+            for nome, acessor in self.acessores:
+                valor = acessor(linha)
+                if valor is not PULAR:
+                    item[nome] = valor
+            resultado.append(item)
+        return resultado
+
+
+@lru_cache(maxsize=256)
+def compilar(serializer_class, campos=None):
+    """SerializadorRapido de `serializer_class` (ou só dos `campos`); None se algum campo não for compilável"""
+    model = serializer_class.Meta.model
+    colunas, acessores = [], []
+    try:
+        for nome, campo in serializer_class().fields.items():
+            if campo.write_only or (campos is not None and nome not in campos):
+                continue
+            colunas_campo, acessor = _compilar_campo(model, campo)
+            colunas += colunas_campo
+            acessores.append((nome, acessor))
+    except NaoCompilavel:
+        return None
+    return SerializadorRapido(list(dict.fromkeys(colunas)), acessores)
+
+
+class ListagemRapidaMixin:
+    """
+    `list()` servido por SerializadorRapido quando todos os campos do
+    serializer (ou de ?fields=/?exclude=) podem ser compilados; senão
+    usa o caminho normal do DRF. Filtros, ordenação e paginação são os
+    mesmos; a paginação por cursor recebe as colunas da ordenação.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        selecao = campos_solicitados(request)
+        rapido = compilar(
+            serializer_class,
+            selecionar_campos(campos_serializer(serializer_class), selecao) if selecao else None
+        )
+        if rapido is None:
+            return super().list(request, *args, **kwargs)
+
+        pk = serializer_class.Meta.model._meta.pk.name
+        colunas_cursor = [
+            pk if campo == 'pk' else campo
+            for campo in (campo.lstrip('-') for campo in getattr(self, 'ordenacao_cursor', ('-pk',)))
+        ]
+        queryset = rapido.preparar(self.filter_queryset(self.get_queryset()), colunas_cursor)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rapido.serializar(page))
+        return Response(rapido.serializar(queryset))
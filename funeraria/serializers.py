@@ -1,12 +1,118 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.db.models import Count
+from . import registro
+from .otimizacao import campos_solicitados, selecionar_campos
 from .models import (
     FuncionarioFuneraria, ClienteFuneraria, DependenteFuneraria,
     PlanoFuneraria, PagamentoFuneraria, ServicoPrestadoFuneraria,
-    FunerariaStatus, FunerariaTipos, DependenteStatus
+    FunerariaStatus, FunerariaTipos, DependenteStatus, TarefaExportacao, MENSAGEM_CPF_EM_USO
 )
 
 
+class CampoRegistro(serializers.Field):
+    """Atributo de status/tipo resolvido pelo id da FK no registro em memória, sem JOIN"""
+    
+    def __init__(self, registro, atributo, **kwargs):
+        self.registro = registro
+        self.atributo = atributo
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, pk):
+        obj = self.registro.por_id(pk)
+        return getattr(obj, self.atributo) if obj is not None else None
+
+
+class CampoContagem(serializers.IntegerField):
+    """
+    Quantidade de objetos de uma relação reversa, lida da anotação `Count()`
+    que o planejamento de consultas (funeraria/otimizacao.py) adiciona ao
+    queryset com o nome do campo; objetos sem a anotação (recém-gravados)
+    contam no banco.
+    """
+    
+    def __init__(self, relacao, **kwargs):
+        self.relacao = relacao
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    @property
+    def anotacao(self):
+        return Count(self.relacao)
+    
+    def get_attribute(self, instance):
+        valor = getattr(instance, self.source, None)
+        return getattr(instance, self.relacao).count() if valor is None else valor
+
+
+def descricao_plano(tipo_plano_id, tipo_renovacao_id, valor_mensal):
+    """Mesmo texto de PlanoFuneraria.__str__, com os tipos lidos do registro em memória"""
+    tipo_plano = registro.tipos.por_id(tipo_plano_id)
+    tipo_renovacao = registro.tipos.por_id(tipo_renovacao_id) if tipo_renovacao_id else None
+    return f"Plano {tipo_plano} - Renovação: {tipo_renovacao or 'N/A'} - R$ {valor_mensal}"
+
+
+class PlanoInfoField(serializers.Field):
+    """Descrição do plano sem acessar `tipo_plano`/`tipo_renovacao` (evita duas consultas por linha)"""
+    colunas_lidas = ('tipo_plano', 'tipo_renovacao', 'valor_mensal')
+    
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, plano):
+        return descricao_plano(plano.tipo_plano_id, plano.tipo_renovacao_id, plano.valor_mensal)
+
+
+class CamposSelecionaveisMixin:
+    """Limita a resposta aos campos de ?fields=a,b e/ou remove os de ?exclude=c (só em leituras)"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Só o serializer raiz recebe o contexto no construtor: os aninhados são mantidos inteiros
+        selecao = campos_solicitados(kwargs.get('context', {}).get('request'))
+        if selecao is not None:
+            manter = selecionar_campos(self.fields, selecao)
+            for nome in list(self.fields):
+                if nome not in manter:
+                    del self.fields[nome]
+
+
+class CpfUnicoMixin:
+    """
+    Rejeita CPF já cadastrado, com ou sem máscara, comparando a chave
+    numérica; também em atualizações parciais sem `cpf` de registros antigos
+    cujo CPF repete o de outro (sem chave desde a migração 0016).
+    """
+    
+    def validate_cpf(self, value):
+        queryset = self.Meta.model.objects.por_cpf(value)
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(MENSAGEM_CPF_EM_USO)
+        return value
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        instance = self.instance
+        if (instance is not None and 'cpf' not in attrs and instance.cpf_numero is None
+                and instance.cpf_em_uso()):
+            raise serializers.ValidationError({'cpf': [MENSAGEM_CPF_EM_USO]})
+        return attrs
+
+
+class PessoaSerializer(CamposSelecionaveisMixin, serializers.Serializer):
+    """Resultado da busca unificada de clientes e dependentes por CPF"""
+    tipo = serializers.CharField()
+    id = serializers.IntegerField()
+    nome = serializers.CharField()
+    cpf = serializers.CharField()
+    cliente_id = serializers.IntegerField(source='titular_id')
+    cliente_nome = serializers.CharField(source='titular_nome')
+
+
 class LoginSerializer(serializers.Serializer):
     """Serializer para login de funcionários"""
     username = serializers.CharField()
@@ -29,7 +135,7 @@ class LoginSerializer(serializers.Serializer):
         return data
 
 
-class FuncionarioFunerariaSerializer(serializers.ModelSerializer):
+class FuncionarioFunerariaSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
     """Serializer para funcionários da funerária"""
     password = serializers.CharField(write_only=True)
     
@@ -52,7 +158,7 @@ class FuncionarioFunerariaSerializer(serializers.ModelSerializer):
         return user
 
 
-class FunerariaStatusSerializer(serializers.ModelSerializer):
+class FunerariaStatusSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
     """Serializer para status da funerária"""
     
     class Meta:
@@ -60,7 +166,7 @@ class FunerariaStatusSerializer(serializers.ModelSerializer):
         fields = ['id', 'status', 'descricao']
 
 
-class DependenteStatusSerializer(serializers.ModelSerializer):
+class DependenteStatusSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
     """Serializer para status de dependentes"""
     
     class Meta:
@@ -68,7 +174,7 @@ class DependenteStatusSerializer(serializers.ModelSerializer):
         fields = ['id', 'status', 'descricao']
 
 
-class FunerariaTiposSerializer(serializers.ModelSerializer):
+class FunerariaTiposSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
     """Serializer para tipos de serviços"""
     
     class Meta:
@@ -76,9 +182,9 @@ class FunerariaTiposSerializer(serializers.ModelSerializer):
         fields = ['id', 'descricao']
 
 
-class PlanoFunerariaSerializer(serializers.ModelSerializer):
+class PlanoFunerariaSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
     """Serializer para planos funerários"""
-    plano_status_nome = serializers.CharField(source='plano_status.status', read_only=True)
+    plano_status_nome = CampoRegistro(registro.status, 'status', source='plano_status_id')
     funcionario_criacao_nome = serializers.CharField(
         source='funcionario_criacao.get_full_name', read_only=True
     )
@@ -98,18 +204,16 @@ class PlanoFunerariaSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class ClienteFunerariaSerializer(serializers.ModelSerializer):
+class ClienteFunerariaSerializer(CpfUnicoMixin, CamposSelecionaveisMixin, serializers.ModelSerializer):
     """Serializer para clientes da funerária"""
-    cliente_status_nome = serializers.CharField(source='cliente_status.status', read_only=True)
+    cliente_status_nome = CampoRegistro(registro.status, 'status', source='cliente_status_id')
     funcionario_cadastro_nome = serializers.CharField(
         source='funcionario_cadastro.get_full_name', read_only=True
     )
     funcionario_atualizacao_nome = serializers.CharField(
         source='funcionario_atualizacao.get_full_name', read_only=True
     )
-    total_dependentes = serializers.IntegerField(
-        source='dependentes.count', read_only=True
-    )
+    total_dependentes = CampoContagem('dependentes')
     
     class Meta:
         model = ClienteFuneraria
@@ -123,10 +227,10 @@ class ClienteFunerariaSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class DependenteFunerariaSerializer(serializers.ModelSerializer):
+class DependenteFunerariaSerializer(CpfUnicoMixin, CamposSelecionaveisMixin, serializers.ModelSerializer):
     """Serializer para dependentes dos clientes"""
     cliente_nome = serializers.CharField(source='cliente.nome', read_only=True)
-    dependente_status_nome = serializers.CharField(source='dependente_status.status', read_only=True)
+    dependente_status_nome = CampoRegistro(registro.status_dependente, 'status', source='dependente_status_id')
     funcionario_criacao_nome = serializers.CharField(
         source='funcionario_criacao.get_full_name', read_only=True
     )
@@ -147,27 +251,27 @@ class DependenteFunerariaSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class PagamentoFunerariaSerializer(serializers.ModelSerializer):
+class PagamentoFunerariaSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
     """Serializer para pagamentos dos planos"""
-    plano_info = serializers.CharField(source='plano_funeraria.__str__', read_only=True)
-    status_pagamento_nome = serializers.CharField(source='status_pagamento.status', read_only=True)
+    plano_info = PlanoInfoField(source='plano_funeraria')
+    status_pagamento_nome = CampoRegistro(registro.status, 'status', source='status_pagamento_id')
     
     class Meta:
         model = PagamentoFuneraria
         fields = [
-            'id', 'valor_pago', 'data_hora_pagto', 'forma_pagamento',
+            'id', 'valor_pago', 'data_hora_pagto',
             'plano_funeraria', 'plano_info',
             'status_pagamento', 'status_pagamento_nome',
-            'created_at'
+            'competencia', 'created_at'
         ]
-        read_only_fields = ['created_at']
+        read_only_fields = ['competencia', 'created_at']
 
 
-class ServicoPrestadoFunerariaSerializer(serializers.ModelSerializer):
+class ServicoPrestadoFunerariaSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
     """Serializer para serviços prestados"""
     cliente_nome = serializers.CharField(source='cliente.nome', read_only=True)
-    plano_info = serializers.CharField(source='plano.__str__', read_only=True)
-    tipo_descricao = serializers.CharField(source='tipo.descricao', read_only=True)
+    plano_info = PlanoInfoField(source='plano')
+    tipo_descricao = CampoRegistro(registro.tipos, 'descricao', source='tipo_id')
     funcionario_criacao_nome = serializers.CharField(
         source='funcionario_criacao.get_full_name', read_only=True
     )
@@ -210,4 +314,33 @@ class PlanoDetalhadoSerializer(PlanoFunerariaSerializer):
     class Meta(PlanoFunerariaSerializer.Meta):
         fields = PlanoFunerariaSerializer.Meta.fields + [
             'pagamentos', 'servicos', 'total_arrecadado'
-        ]
\ No newline at end of file
+        ]
+
+
+class TarefaExportacaoSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
+    """Serializer para tarefas de exportação em segundo plano"""
+    percentual = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TarefaExportacao
+        fields = [
+            'id', 'tipo', 'formato', 'parametros', 'status',
+            'linhas_processadas', 'total_linhas', 'percentual', 'erro',
+            'created_at', 'iniciada_em', 'concluida_em'
+        ]
+        read_only_fields = [
+            'status', 'linhas_processadas', 'total_linhas', 'erro',
+            'created_at', 'iniciada_em', 'concluida_em'
+        ]
+    
+    def get_percentual(self, obj):
+        if obj.status == 'concluida':
+            return 100
+        if not obj.total_linhas:
+            return 0
+        return min(100, round(obj.linhas_processadas * 100 / obj.total_linhas))
+    
+    def validate_parametros(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Os parâmetros devem ser um objeto com os filtros da listagem')
+        return value
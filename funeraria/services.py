@@ -1,7 +1,21 @@
 # funeraria/services.py
 
 from django.utils import timezone
-from .models import ServicoPrestadoFuneraria, PagamentoFuneraria, FunerariaStatus
+from . import registro
+from .models import ServicoPrestadoFuneraria, PagamentoFuneraria
+
+def registrar_cobranca(servico):
+    """Gera o pagamento pendente do serviço quando o tipo tem valor"""
+    tipo_servico = servico.tipo
+    if not tipo_servico.valor or tipo_servico.valor <= 0:
+        return None
+    
+    return PagamentoFuneraria.objects.create(
+        valor_pago=tipo_servico.valor,
+        data_hora_pagto=timezone.now(),
+        plano_funeraria=servico.plano,
+        status_pagamento=registro.status.por_nome('Pendente', 'pagamento'),
+    )
 
 def criar_servico(cliente, plano, tipo_servico, funcionario, **kwargs):
     servico = ServicoPrestadoFuneraria.objects.create(
@@ -13,15 +27,6 @@ def criar_servico(cliente, plano, tipo_servico, funcionario, **kwargs):
         data_hora_servico=timezone.now(),
         **kwargs
     )
+    registrar_cobranca(servico)
     
-    if tipo_servico.valor:
-        status_pendente = FunerariaStatus.objects.get(status='Pendente')
-        PagamentoFuneraria.objects.create(
-            valor_pago=tipo_servico.valor,
-            data_hora_pagto=timezone.now(),
-            forma_pagamento='PIX',
-            plano_funeraria=plano,
-            status_pagamento=status_pendente,
-        )
-    
-    return servico
\ No newline at end of file
+    return servico
@@ -0,0 +1,49 @@
+# funeraria/signals.py
+
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import cache, registro, resumos
+from .models import ResumoEstatistica, TarefaExportacao, VersaoTabela
+
+# Tabelas que não entram nas respostas em cache (ou que já são gravadas por SQL direto)
+MODELOS_SEM_VERSAO = (ResumoEstatistica, TarefaExportacao, VersaoTabela)
+
+
+def guardar_contribuicoes_anteriores(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Em alterações, lê do banco o que a linha somava antes para aplicar só a diferença
+    if raw or instance._state.adding or instance.pk is None:
+        instance._resumo_anterior = {}
+    elif update_fields is not None and not resumos.campos_monitorados(sender) & set(update_fields):
+        instance._resumo_anterior = None
+    else:
+        instance._resumo_anterior = resumos.contribuicoes_gravadas(sender, instance.pk)
+
+
+def atualizar_resumos(sender, instance, raw=False, **kwargs):
+    anteriores = getattr(instance, '_resumo_anterior', {})
+    if raw or anteriores is None:
+        return
+    resumos.aplicar(resumos.diferenca(anteriores, resumos.contribuicoes_instancia(instance)))
+    instance._resumo_anterior = None
+
+
+def remover_dos_resumos(sender, instance, **kwargs):
+    resumos.aplicar(resumos.diferenca(resumos.contribuicoes_instancia(instance), {}))
+
+
+def incrementar_versao(sender, **kwargs):
+    # Inclui gravações de fixtures (raw): servidores em execução precisam enxergá-las
+    cache.invalidar(sender)
+    registro.invalidar(sender)
+
+
+for model in resumos.METRICAS:
+    pre_save.connect(guardar_contribuicoes_anteriores, sender=model, dispatch_uid=f'resumo_pre_{model.__name__}')
+    post_save.connect(atualizar_resumos, sender=model, dispatch_uid=f'resumo_post_{model.__name__}')
+    post_delete.connect(remover_dos_resumos, sender=model, dispatch_uid=f'resumo_delete_{model.__name__}')
+
+for model in apps.get_app_config('funeraria').get_models():
+    if model not in MODELOS_SEM_VERSAO:
+        post_save.connect(incrementar_versao, sender=model, dispatch_uid=f'versao_post_{model.__name__}')
+        post_delete.connect(incrementar_versao, sender=model, dispatch_uid=f'versao_delete_{model.__name__}')
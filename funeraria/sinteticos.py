@@ -0,0 +1,326 @@
+# funeraria/sinteticos.py
+
+import io
+import random
+import unicodedata
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from operator import attrgetter
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import resumos
+from .cache import invalidar
+from .models import (
+    ClienteDependentePlano, ClienteFuneraria, ClientePlano, DependenteFuneraria, DependenteStatus,
+    FuncionarioFuneraria, FunerariaStatus, FunerariaTipos, PagamentoFuneraria, PlanoFuneraria,
+    ServicoPrestadoFuneraria, cpf_numerico
+)
+
+TAMANHO_LOTE = 2000
+MESES_HISTORICO = 12
+# Os CPFs sintéticos são sequenciais a partir daqui (9 dígitos-base, antes dos verificadores)
+INICIO_CPF = 100_000_000
+
+NOMES = [
+    'Ana', 'Antônio', 'Beatriz', 'Bruno', 'Camila', 'Carlos', 'Cláudia', 'Daniel', 'Eduarda', 'Eduardo',
+    'Fernanda', 'Francisco', 'Gabriela', 'Gustavo', 'Helena', 'Igor', 'Isabela', 'João', 'Júlia', 'José',
+    'Larissa', 'Lucas', 'Luíza', 'Marcos', 'Maria', 'Mateus', 'Natália', 'Paulo', 'Patrícia', 'Pedro',
+    'Rafael', 'Raimunda', 'Ricardo', 'Sebastião', 'Sofia', 'Tatiane', 'Thiago', 'Vanessa', 'Vitor', 'Yasmin',
+]
+SOBRENOMES = [
+    'Almeida', 'Alves', 'Araújo', 'Barbosa', 'Cardoso', 'Carvalho', 'Castro', 'Costa', 'Dias', 'Fernandes',
+    'Ferreira', 'Gomes', 'Lima', 'Lopes', 'Martins', 'Melo', 'Mendes', 'Moreira', 'Nascimento', 'Oliveira',
+    'Pereira', 'Ribeiro', 'Rocha', 'Rodrigues', 'Santos', 'Silva', 'Soares', 'Souza', 'Teixeira', 'Vieira',
+]
+LOGRADOUROS = ['Rua', 'Avenida', 'Travessa', 'Alameda', 'Praça']
+RUAS = [
+    'das Flores', 'Sete de Setembro', 'XV de Novembro', 'Tiradentes', 'Dom Pedro II', 'São João',
+    'Santos Dumont', 'Rui Barbosa', 'Getúlio Vargas', 'da Independência', 'Marechal Deodoro', 'do Comércio',
+]
+CIDADES = [
+    ('São Paulo', 'SP', '11'), ('Campinas', 'SP', '19'), ('Rio de Janeiro', 'RJ', '21'),
+    ('Belo Horizonte', 'MG', '31'), ('Curitiba', 'PR', '41'), ('Porto Alegre', 'RS', '51'),
+    ('Salvador', 'BA', '71'), ('Recife', 'PE', '81'), ('Fortaleza', 'CE', '85'), ('Goiânia', 'GO', '62'),
+]
+DOMINIOS = ['gmail.com', 'hotmail.com', 'outlook.com', 'yahoo.com.br', 'uol.com.br']
+# (descrição, valor mensal)
+TIPOS_PLANO = [('Plano Bronze', '49.90'), ('Plano Prata', '89.90'), ('Plano Ouro', '149.90')]
+# (descrição, valor) dos tipos de serviço prestado
+TIPOS_SERVICO = [
+    ('Velório Simples', '1500.00'), ('Velório Completo', '4500.00'), ('Cremação', '3800.00'),
+    ('Sepultamento', '2500.00'), ('Traslado', '900.00'), ('Ornamentação Floral', '600.00'),
+]
+# Quantidade de dependentes por cliente: pesos de 0, 1, 2, 3 e 4 (média de 1,5)
+PESOS_DEPENDENTES = [25, 25, 30, 15, 5]
+
+
+def gerar_cpf(numero):
+    """CPF formatado e válido a partir de um número sequencial de 9 dígitos"""
+    base = f'{numero:09d}'
+
+    def digito(digitos):
+        peso = len(digitos) + 1
+        resto = sum(int(d) * (peso - i) for i, d in enumerate(digitos)) % 11
+        return '0' if resto < 2 else str(11 - resto)
+
+    base += digito(base)
+    base += digito(base)
+    return f'{base[:3]}.{base[3:6]}.{base[6:9]}-{base[9:]}'
+
+
+def proximo_cpf_livre():
+    """Primeiro número-base acima dos CPFs já cadastrados em clientes e dependentes"""
+    maiores = [
+        model.objects.aggregate(maior=Max('cpf_numero'))['maior'] or 0
+        for model in (ClienteFuneraria, DependenteFuneraria)
+    ]
+    return max(INICIO_CPF, max(maiores) // 100 + 1)
+
+
+def _sem_acento(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode().lower()
+
+
+def _inicio_do_mes(data, meses_atras=0):
+    mes = data.year * 12 + data.month - 1 - meses_atras
+    return data.replace(year=mes // 12, month=mes % 12 + 1, day=1)
+
+
+def _valor_copy(valor):
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, bool):
+        return 't' if valor else 'f'
+    if not isinstance(valor, str):
+        return str(valor)
+    return valor.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def inserir(model, objs):
+    """
+    Insere `objs` em massa e preenche as chaves primárias. No PostgreSQL usa
+    COPY, com os ids reservados antes na sequência da tabela: a compilação do
+    INSERT do bulk_create custaria mais que o próprio banco em milhões de
+    linhas. Nos demais bancos, bulk_create.
+    """
+    if not objs:
+        return objs
+    campos = model._meta.concrete_fields
+    if any(campo.attname == 'cpf_numero' for campo in campos):
+        # Como em PessoaQuerySet.bulk_create
+        for obj in objs:
+            obj.cpf_numero = cpf_numerico(obj.cpf)
+    conexao = connections[DEFAULT_DB_ALIAS]
+    if conexao.vendor != 'postgresql':
+        return model.objects.bulk_create(objs)
+
+    agora = timezone.now()
+    for campo in campos:
+        if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False):
+            for obj in objs:
+                setattr(obj, campo.attname, agora)
+    tabela, chave = model._meta.db_table, model._meta.pk.column
+    valores = attrgetter(*(campo.attname for campo in campos))
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)', [tabela, chave, len(objs)]
+        )
+        for obj, (pk,) in zip(objs, cursor.fetchall()):
+            obj.pk = pk
+        linhas = io.StringIO()
+        for obj in objs:
+            linhas.write('\t'.join(map(_valor_copy, valores(obj))))
+            linhas.write('\n')
+        linhas.seek(0)
+        colunas = ', '.join(conexao.ops.quote_name(campo.column) for campo in campos)
+        cursor.copy_expert(f'COPY {conexao.ops.quote_name(tabela)} ({colunas}) FROM STDIN', linhas)
+    return objs
+
+
+class GeradorDados:
+    """
+    Massa de dados sintética e reprodutível (mesma semente e mesma data de
+    referência geram os mesmos dados), inserida em massa (`inserir`) em blocos de
+    `tamanho_lote` clientes, cada um na sua transação.
+
+    Cada cliente tem um plano, de 0 a 4 dependentes vinculados ao plano,
+    mensalidades desde a adesão (até `meses` meses) e, para uma parte deles,
+    serviços prestados. CPFs são válidos e sequenciais a partir do maior já
+    cadastrado; telefones seguem o DDD da cidade do endereço.
+    """
+
+    def __init__(self, seed=42, hoje=None, tamanho_lote=TAMANHO_LOTE, meses=MESES_HISTORICO):
+        self.rng = random.Random(seed)
+        self.hoje = hoje or timezone.localdate()
+        self.tamanho_lote = tamanho_lote
+        self.meses = meses
+        self.proximo_cpf = None
+
+    def preparar(self):
+        """Funcionários, status e tipos de que a massa depende (criados se faltarem)"""
+        self.funcionarios = [
+            FuncionarioFuneraria.objects.get_or_create(
+                username=f'sintetico{i}',
+                defaults={
+                    'first_name': NOMES[i], 'last_name': SOBRENOMES[i], 'cpf': gerar_cpf(INICIO_CPF - 1 - i),
+                    'data_nascimento': '1985-01-01', 'telefone': '(11) 3333-000' + str(i),
+                }
+            )[0]
+            for i in range(5)
+        ]
+
+        def status(nome, categoria):
+            return FunerariaStatus.objects.get_or_create(
+                status=nome, categoria=categoria, defaults={'descricao': nome})[0]
+
+        self.status_cliente = [status('Ativo', 'cliente'), status('Inativo', 'cliente')]
+        self.status_pagamento = {nome: status(nome, 'pagamento') for nome in ('Pago', 'Pendente', 'Cancelado')}
+        self.status_dependente = [
+            DependenteStatus.objects.get_or_create(status=nome, defaults={'descricao': nome})[0]
+            for nome in ('Ativo', 'Inativo', 'Falecido')
+        ]
+        self.tipos_plano = [
+            (FunerariaTipos.objects.get_or_create(descricao=descricao, categoria='plano')[0], Decimal(valor))
+            for descricao, valor in TIPOS_PLANO
+        ]
+        self.renovacao = FunerariaTipos.objects.get_or_create(
+            descricao='Anual', categoria='renovacao', defaults={'duracao_em_dias': 365})[0]
+        self.tipos_servico = [
+            FunerariaTipos.objects.get_or_create(
+                descricao=descricao, categoria='servico', defaults={'valor': Decimal(valor)})[0]
+            for descricao, valor in TIPOS_SERVICO
+        ]
+        self.proximo_cpf = proximo_cpf_livre()
+
+    def cpf(self):
+        numero = self.proximo_cpf
+        self.proximo_cpf += 1
+        return gerar_cpf(numero)
+
+    def nome(self):
+        return f'{self.rng.choice(NOMES)} {self.rng.choice(SOBRENOMES)} {self.rng.choice(SOBRENOMES)}'
+
+    def endereco(self):
+        cidade, uf, ddd = self.rng.choice(CIDADES)
+        rua = f'{self.rng.choice(LOGRADOUROS)} {self.rng.choice(RUAS)}, {self.rng.randint(1, 3000)}'
+        return f'{rua} - {cidade}/{uf}', ddd
+
+    def telefone(self, ddd):
+        return f'({ddd}) 9{self.rng.randint(6000, 9999)}-{self.rng.randint(0, 9999):04d}'
+
+    def nascimento(self, idade_minima, idade_maxima):
+        return self.hoje - timedelta(days=self.rng.randint(idade_minima * 365, idade_maxima * 365))
+
+    def momento(self, data):
+        """Data/hora em horário comercial do dia `data`"""
+        return timezone.make_aware(datetime.combine(data, time(self.rng.randint(8, 17), self.rng.randint(0, 59))))
+
+    def gerar(self, quantidade, progresso=None):
+        """Insere `quantidade` clientes com toda a massa associada; devolve as linhas criadas por tabela"""
+        if self.proximo_cpf is None:
+            self.preparar()
+        totais = dict.fromkeys(
+            ['clientes', 'dependentes', 'planos', 'vinculos', 'pagamentos', 'servicos'], 0
+        )
+        for inicio in range(0, quantidade, self.tamanho_lote):
+            with transaction.atomic():
+                for tabela, linhas in self.gerar_bloco(min(self.tamanho_lote, quantidade - inicio)).items():
+                    totais[tabela] += linhas
+            if progresso:
+                progresso(min(inicio + self.tamanho_lote, quantidade), quantidade)
+        # Uma reconstrução no fim sai mais barata que contabilizar cada bloco (registrar_criados)
+        resumos.reconstruir()
+        invalidar(
+            ClienteFuneraria, DependenteFuneraria, PlanoFuneraria, ClientePlano, ClienteDependentePlano,
+            PagamentoFuneraria, ServicoPrestadoFuneraria
+        )
+        return totais
+
+    def gerar_bloco(self, quantidade):
+        rng = self.rng
+        clientes, enderecos = [], []
+        for _ in range(quantidade):
+            nome = self.nome()
+            endereco, ddd = self.endereco()
+            email = f"{_sem_acento(nome).replace(' ', '.')}{rng.randint(1, 999)}@{rng.choice(DOMINIOS)}"
+            funcionario_id = rng.choice(self.funcionarios).pk
+            enderecos.append((endereco, ddd))
+            clientes.append(ClienteFuneraria(
+                nome=nome, cpf=self.cpf(), data_nascimento=self.nascimento(18, 90), telefone=self.telefone(ddd),
+                endereco=endereco, email=email,
+                cliente_status_id=self.status_cliente[1 if rng.random() < 0.1 else 0].pk,
+                funcionario_cadastro_id=funcionario_id, funcionario_atualizacao_id=funcionario_id,
+            ))
+        clientes = inserir(ClienteFuneraria, clientes)
+
+        planos, adesoes = [], []
+        for _ in clientes:
+            tipo, valor = rng.choice(self.tipos_plano)
+            funcionario_id = rng.choice(self.funcionarios).pk
+            adesoes.append(self.hoje - timedelta(days=rng.randint(0, self.meses * 30)))
+            planos.append(PlanoFuneraria(
+                tipo_plano_id=tipo.pk, valor_mensal=valor, cobertura=f'Cobertura do {tipo.descricao}',
+                tipo_renovacao_id=self.renovacao.pk if rng.random() < 0.7 else None,
+                plano_status_id=self.status_cliente[0].pk,
+                funcionario_criacao_id=funcionario_id, funcionario_atualizacao_id=funcionario_id,
+            ))
+        planos = inserir(PlanoFuneraria, planos)
+
+        vinculos, dependentes = [], []
+        for cliente, plano, adesao, (endereco, ddd) in zip(clientes, planos, adesoes, enderecos):
+            fim = adesao + timedelta(days=365)
+            vinculos.append(ClientePlano(cliente_id=cliente.pk, plano_id=plano.pk, data_inicio=adesao, data_fim=fim))
+            for _ in range(rng.choices(range(len(PESOS_DEPENDENTES)), PESOS_DEPENDENTES)[0]):
+                dependentes.append((DependenteFuneraria(
+                    nome=self.nome(), cpf=self.cpf(), data_nascimento=self.nascimento(0, 90),
+                    genero=rng.choice('MF'), telefone=self.telefone(ddd) if rng.random() < 0.5 else '',
+                    endereco=endereco, cliente_id=cliente.pk,
+                    dependente_status_id=self.status_dependente[0 if rng.random() < 0.9 else rng.randint(1, 2)].pk,
+                    funcionario_criacao_id=cliente.funcionario_cadastro_id,
+                    funcionario_atualizacao_id=cliente.funcionario_cadastro_id,
+                ), plano, adesao, fim))
+        inserir(ClientePlano, vinculos)
+        criados = inserir(DependenteFuneraria, [dependente for dependente, *_ in dependentes])
+        # Sem tipo de renovação, o fim do vínculo do dependente não fica no futuro (ClienteDependentePlano.clean)
+        inserir(ClienteDependentePlano, [
+            ClienteDependentePlano(
+                dependente_id=dependente.pk, plano_id=plano.pk, data_inicio=adesao,
+                data_fim=fim if plano.tipo_renovacao_id else min(fim, self.hoje),
+            )
+            for dependente, (_, plano, adesao, fim) in zip(criados, dependentes)
+        ])
+
+        pagamentos = []
+        for plano, adesao in zip(planos, adesoes):
+            competencia = _inicio_do_mes(adesao)
+            atual = _inicio_do_mes(self.hoje)
+            while competencia <= atual:
+                sorteio = rng.random()
+                status = 'Pago' if competencia < atual and sorteio < 0.95 else (
+                    'Cancelado' if sorteio > 0.99 else 'Pendente'
+                )
+                pagamentos.append(PagamentoFuneraria(
+                    plano_funeraria_id=plano.pk, valor_pago=plano.valor_mensal, competencia=competencia,
+                    data_hora_pagto=self.momento(min(competencia + timedelta(days=rng.randint(0, 14)), self.hoje)),
+                    status_pagamento_id=self.status_pagamento[status].pk,
+                ))
+                competencia = _inicio_do_mes(competencia, -1)
+        inserir(PagamentoFuneraria, pagamentos)
+
+        servicos = inserir(ServicoPrestadoFuneraria, [
+            ServicoPrestadoFuneraria(
+                cliente_id=cliente.pk, plano_id=plano.pk, tipo_id=rng.choice(self.tipos_servico).pk,
+                data_hora_servico=self.momento(adesao + timedelta(days=rng.randint(0, (self.hoje - adesao).days))),
+                funcionario_criacao_id=cliente.funcionario_cadastro_id,
+                funcionario_atualizacao_id=cliente.funcionario_cadastro_id,
+            )
+            for cliente, plano, adesao in zip(clientes, planos, adesoes) if rng.random() < 0.05
+        ])
+
+        return {
+            'clientes': len(clientes), 'dependentes': len(criados), 'planos': len(planos),
+            'vinculos': len(vinculos) + len(criados), 'pagamentos': len(pagamentos), 'servicos': len(servicos),
+        }
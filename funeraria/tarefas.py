@@ -0,0 +1,153 @@
+# funeraria/tarefas.py
+
+import logging
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from rest_framework.request import Request
+
+from . import exportacoes
+from .models import TarefaExportacao
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_PROGRESSO = 1000
+# Tarefas pendentes ou em execução sem atualização há mais que isso ficaram para trás num reinício
+TEMPO_PARADA = timedelta(minutes=30)
+MAX_TENTATIVAS = 3
+EM_ANDAMENTO = ('pendente', 'executando')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'EXPORTACAO_MAX_WORKERS', 2),
+                thread_name_prefix='exportacao'
+            )
+        return _executor
+
+
+def enfileirar(tarefa):
+    """Agenda a tarefa no pool de workers assim que a transação atual for confirmada"""
+    transaction.on_commit(lambda: _get_executor().submit(executar, tarefa.pk))
+
+
+def _viewset_da_tarefa(tarefa):
+    """
+    Instancia o ViewSet de origem com os parâmetros salvos, para que a
+    exportação use exatamente as mesmas colunas, filtros e ordenação do
+    endpoint síncrono.
+    """
+    from .views import (
+        ClienteFunerariaViewSet, DependenteFunerariaViewSet,
+        PagamentoFunerariaViewSet, ServicoPrestadoFunerariaViewSet
+    )
+    viewsets = {
+        'clientes': ClienteFunerariaViewSet,
+        'dependentes': DependenteFunerariaViewSet,
+        'pagamentos': PagamentoFunerariaViewSet,
+        'servicos': ServicoPrestadoFunerariaViewSet,
+    }
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.GET = QueryDict(urlencode(tarefa.parametros, doseq=True))
+    request = Request(http_request)
+    request.user = tarefa.funcionario
+    return viewsets[tarefa.tipo](request=request, format_kwarg=None, action=f'exportar_{tarefa.formato}')
+
+
+def _com_progresso(linhas, tarefa_id):
+    processadas = 0
+    for linha in linhas:
+        yield linha
+        processadas += 1
+        if processadas % INTERVALO_PROGRESSO == 0:
+            TarefaExportacao.objects.filter(pk=tarefa_id).update(
+                linhas_processadas=processadas, updated_at=timezone.now()
+            )
+    TarefaExportacao.objects.filter(pk=tarefa_id).update(linhas_processadas=processadas, updated_at=timezone.now())
+
+
+def _gravar(tarefa, queryset, colunas, caminho):
+    cabecalho = [coluna.titulo for coluna in colunas]
+    if tarefa.formato == 'xlsx':
+        linhas = _com_progresso(exportacoes.iterar_linhas(queryset, colunas, formatar=False), tarefa.pk)
+        exportacoes.escrever_xlsx(str(caminho), [(tarefa.tipo.capitalize(), cabecalho, linhas)])
+    else:
+        linhas = _com_progresso(exportacoes.iterar_linhas(queryset, colunas), tarefa.pk)
+        with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+            for bloco in exportacoes.gerar_csv(cabecalho, linhas):
+                arquivo.write(bloco)
+
+
+def executar(tarefa_id):
+    """Executa uma tarefa de exportação e grava o artefato em EXPORTACAO_PASTA"""
+    close_old_connections()
+    caminho = None
+    try:
+        tarefa = TarefaExportacao.objects.select_related('funcionario').get(pk=tarefa_id)
+        tarefa.status = 'executando'
+        tarefa.iniciada_em = timezone.now()
+        tarefa.tentativas += 1
+        tarefa.save(update_fields=['status', 'iniciada_em', 'tentativas', 'updated_at'])
+
+        view = _viewset_da_tarefa(tarefa)
+        queryset = view.filter_queryset(view.get_queryset())
+        TarefaExportacao.objects.filter(pk=tarefa.pk).update(
+            total_linhas=queryset.select_related(None).prefetch_related(None).count(), updated_at=timezone.now()
+        )
+
+        # Nome imprevisível: o arquivo não é descoberto pelo id da tarefa
+        nome = f'{tarefa.tipo}_{tarefa.pk}_{secrets.token_urlsafe(16)}.{tarefa.formato}'
+        caminho = Path(tarefa.arquivo.storage.path(nome))
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        _gravar(tarefa, queryset, view.colunas_exportacao, caminho)
+
+        agora = timezone.now()
+        TarefaExportacao.objects.filter(pk=tarefa.pk).update(
+            status='concluida', arquivo=nome, concluida_em=agora, updated_at=agora
+        )
+    except Exception as exc:
+        logger.exception('Falha na tarefa de exportação %s', tarefa_id)
+        if caminho is not None:
+            caminho.unlink(missing_ok=True)
+        agora = timezone.now()
+        TarefaExportacao.objects.filter(pk=tarefa_id).update(
+            status='erro', erro=str(exc), concluida_em=agora, updated_at=agora
+        )
+    finally:
+        close_old_connections()
+
+
+def recuperar_paradas(tempo_parada=TEMPO_PARADA, max_tentativas=MAX_TENTATIVAS):
+    """
+    Tarefas pendentes ou em execução sem atualização há mais de
+    `tempo_parada`: o processo que as executaria foi reiniciado. As que já
+    gastaram `max_tentativas` viram erro; as demais voltam para 'pendente'
+    e seus ids são devolvidos para nova execução. A troca de status é um
+    UPDATE condicional, então varreduras simultâneas não pegam a mesma tarefa.
+    """
+    agora = timezone.now()
+    paradas = TarefaExportacao.objects.filter(status__in=EM_ANDAMENTO, updated_at__lt=agora - tempo_parada)
+    falhas = paradas.filter(tentativas__gte=max_tentativas).update(
+        status='erro', erro=f'Interrompida {max_tentativas} vez(es) antes de concluir', concluida_em=agora,
+        updated_at=agora
+    )
+    recuperadas = [
+        pk for pk in paradas.filter(tentativas__lt=max_tentativas).values_list('pk', flat=True)
+        if paradas.filter(pk=pk).update(status='pendente', linhas_processadas=0, updated_at=agora)
+    ]
+    return recuperadas, falhas
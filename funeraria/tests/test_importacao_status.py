@@ -0,0 +1,61 @@
+from datetime import date
+
+from django.test import TestCase
+
+from funeraria import importacoes, registro
+from funeraria.models import FuncionarioFuneraria, FunerariaStatus, FunerariaTipos, PlanoFuneraria
+
+
+class StatusDadosIniciaisTest(TestCase):
+    """
+    Status dos dados iniciais (fixtures/initial_data.json), que não têm
+    categoria: a importação aceita o id e o nome, como o cadastro pela API.
+    O gerador de dados sintéticos sempre preenche a categoria.
+    """
+    fixtures = ['initial_data.json']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.funcionario = FuncionarioFuneraria.objects.create(
+            username='importacao', first_name='Ana', last_name='Souza', cpf='529.982.247-25',
+            data_nascimento=date(1990, 1, 1), telefone='(11) 99999-9999'
+        )
+        ativo = FunerariaStatus.objects.get(status='Ativo')
+        cls.plano = PlanoFuneraria.objects.create(
+            valor_mensal='50.00', cobertura='Cobertura', tipo_plano=FunerariaTipos.objects.first(),
+            plano_status=ativo, funcionario_criacao=cls.funcionario, funcionario_atualizacao=cls.funcionario
+        )
+        cls.pago = FunerariaStatus.objects.get(status='Pago')
+
+    def setUp(self):
+        # Os registros em memória são limpos após o commit, que não acontece dentro do TestCase
+        for registro_tabela in registro.REGISTROS.values():
+            registro_tabela.limpar()
+            self.addCleanup(registro_tabela.limpar)
+
+    def test_status_de_pagamento_pelo_id_e_pelo_nome(self):
+        linhas = [
+            {'plano': str(self.plano.pk), 'valor_pago': '50.00', 'data_hora_pagto': '2026-01-10 10:00', 'Status': valor}
+            for valor in (str(self.pago.pk), 'Pago')
+        ]
+        pagamentos, erros = importacoes.validar_pagamentos(linhas)
+        self.assertEqual(erros, [])
+        self.assertEqual([pagamento.status_pagamento_id for pagamento in pagamentos], [self.pago.pk] * 2)
+
+    def test_status_de_pagamento_inexistente(self):
+        linhas = [{'plano': str(self.plano.pk), 'valor_pago': '50.00', 'data_hora_pagto': '2026-01-10 10:00',
+                   'Status': '999'}]
+        _, erros = importacoes.validar_pagamentos(linhas)
+        self.assertEqual(erros, [(1, {'status_pagamento': ['Status de pagamento 999 não existe.']})])
+
+    def test_status_de_cliente_pelo_id_e_pelo_nome(self):
+        ativo = FunerariaStatus.objects.get(status='Ativo')
+        linhas = [
+            {'nome': 'Joana Lima', 'cpf': '111.444.777-35', 'data_nascimento': '1980-01-01',
+             'telefone': '(11) 91234-5678', 'endereco': 'Rua A', 'email': 'joana@exemplo.com', 'Status': str(ativo.pk)},
+            {'nome': 'Carlos Lima', 'cpf': '935.411.347-80', 'data_nascimento': '1982-02-02',
+             'telefone': '(11) 91234-5679', 'endereco': 'Rua A', 'email': 'carlos@exemplo.com', 'Status': 'Ativo'},
+        ]
+        relatorio = importacoes.importar_pessoas(self.funcionario, clientes=linhas)
+        self.assertEqual(relatorio['clientes'].erros, [])
+        self.assertEqual(relatorio['clientes'].importados, 2)
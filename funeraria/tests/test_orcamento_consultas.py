@@ -0,0 +1,130 @@
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from funeraria import sinteticos
+from funeraria.models import ClienteFuneraria, FuncionarioFuneraria, PlanoFuneraria
+
+CLIENTES = 30
+
+# Listagens paginadas: (rota, máximo de consultas). Medidas na paginação por
+# número de página e por cursor com páginas de 1 e de 100 itens; o número de
+# consultas não pode variar com o tamanho da página. Endpoints que exibem
+# status ou tipos contam a conferência de versão do registro (funeraria/registro.py).
+LISTAGENS = [
+    ('/api/funcionarios/', 2),
+    ('/api/status/', 2),
+    ('/api/dependente-status/', 2),
+    ('/api/tipos-servicos/', 2),
+    ('/api/clientes/', 3),
+    ('/api/dependentes/', 3),
+    ('/api/planos/', 5),
+    ('/api/pagamentos/', 3),
+    ('/api/servicos/', 3),
+    ('/api/planos/relatorio_financeiro/', 3),
+]
+
+# Actions sem paginação: (rota, parâmetro, modelo e relação usados para achar
+# o registro com mais e com menos linhas (ao menos uma), máximo de consultas)
+ACTIONS = [
+    ('/api/pagamentos/historico_plano/', 'plano_id', PlanoFuneraria, 'pagamentos', 3),
+    ('/api/servicos/por_cliente/', 'cliente_id', ClienteFuneraria, 'servicos', 2),
+    ('/api/dependentes/por_cliente/', 'cliente_id', ClienteFuneraria, 'dependentes', 2),
+]
+
+# Detalhes com serializers aninhados: (rota formatada com o objeto, modelo e relação
+# usados para achar o registro com mais e com menos linhas (ao menos uma), máximo de consultas)
+DETALHES = [
+    ('/api/clientes/{obj.pk}/detalhado/', ClienteFuneraria, 'servicos', 4),
+    ('/api/clientes/buscar_cpf/?cpf={obj.cpf}', ClienteFuneraria, 'servicos', 4),
+    ('/api/planos/{obj.pk}/detalhado/', PlanoFuneraria, 'servicos', 5),
+]
+
+# Exportações (resposta em streaming, lida por inteiro): (rota, máximo de consultas).
+# A consulta das linhas não pode agregar a tabela (anotações do serializer) antes da primeira linha.
+EXPORTACOES = [
+    ('/api/clientes/exportar_csv/', 1),
+    ('/api/clientes/exportar_xlsx/', 1),
+    ('/api/dependentes/exportar_csv/', 1),
+    ('/api/pagamentos/exportar_csv/', 1),
+    ('/api/servicos/exportar_csv/', 1),
+]
+
+
+# O cache de respostas esconderia as consultas; os registros em memória são aquecidos antes de medir
+@override_settings(CACHE_RESPOSTAS=None)
+class OrcamentoConsultasTest(TestCase):
+    """
+    Orçamento de consultas SQL por endpoint: o número de consultas fica
+    dentro do limite e não cresce com o tamanho da página ou do resultado.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        sinteticos.GeradorDados(seed=7).gerar(CLIENTES)
+
+    def setUp(self):
+        usuario = FuncionarioFuneraria(username='orcamento', is_active=True, is_staff=True, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+
+    def medir(self, rota, parametros):
+        self.client.get(rota, parametros)
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.get(rota, parametros)
+        self.assertEqual(resposta.status_code, 200, rota)
+        return len(contexto.captured_queries)
+
+    def conferir(self, rota, medidas, limite):
+        detalhes = ', '.join(f'{nome}: {quantidade}' for nome, quantidade in medidas.items())
+        self.assertEqual(len(set(medidas.values())), 1, f'{rota}: consultas variam ({detalhes})')
+        self.assertLessEqual(max(medidas.values()), limite, f'{rota}: acima do orçamento ({detalhes})')
+
+    def test_listagens(self):
+        for rota, limite in LISTAGENS:
+            with self.subTest(rota=rota):
+                medidas = {
+                    'cursor 1': self.medir(rota, {'paginacao': 'cursor', 'page_size': 1}),
+                    'cursor 100': self.medir(rota, {'paginacao': 'cursor', 'page_size': 100}),
+                }
+                self.conferir(rota, medidas, limite)
+                por_pagina = self.medir(rota, {})
+                self.assertLessEqual(por_pagina, limite, f'{rota}: paginação por página acima do orçamento')
+
+    def test_actions(self):
+        for rota, parametro, model, relacao, limite in ACTIONS:
+            with self.subTest(rota=rota):
+                ids = list(
+                    model.objects.annotate(linhas=Count(relacao)).filter(linhas__gt=0)
+                    .order_by('-linhas').values_list('pk', flat=True)
+                )
+                medidas = {
+                    'maior': self.medir(rota, {parametro: ids[0]}),
+                    'menor': self.medir(rota, {parametro: ids[-1]}),
+                }
+                self.conferir(rota, medidas, limite)
+
+    def test_exportacoes(self):
+        for rota, limite in EXPORTACOES:
+            with self.subTest(rota=rota):
+                with CaptureQueriesContext(connection) as contexto:
+                    resposta = self.client.get(rota)
+                    b''.join(resposta.streaming_content)
+                self.assertEqual(resposta.status_code, 200, rota)
+                self.assertLessEqual(len(contexto), limite, f'{rota}: acima do orçamento')
+                for consulta in contexto.captured_queries:
+                    self.assertNotIn('GROUP BY', consulta['sql'], rota)
+
+    def test_detalhes(self):
+        for rota, model, relacao, limite in DETALHES:
+            with self.subTest(rota=rota):
+                objetos = list(
+                    model.objects.annotate(linhas=Count(relacao)).filter(linhas__gt=0).order_by('-linhas')
+                )
+                medidas = {
+                    'maior': self.medir(rota.format(obj=objetos[0]), {}),
+                    'menor': self.medir(rota.format(obj=objetos[-1]), {}),
+                }
+                self.conferir(rota, medidas, limite)
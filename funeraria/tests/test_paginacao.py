@@ -0,0 +1,41 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from funeraria import sinteticos
+from funeraria.models import FuncionarioFuneraria, PagamentoFuneraria
+
+
+@override_settings(CACHE_RESPOSTAS=None)
+class PaginacaoPorCursorTest(TestCase):
+    """Paginação por cursor: percorre todas as linhas na ordenação do cursor e recusa outras ordenações"""
+
+    @classmethod
+    def setUpTestData(cls):
+        sinteticos.GeradorDados(seed=3).gerar(10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(FuncionarioFuneraria.objects.get(username='sintetico0'))
+
+    def test_percorre_ida_e_volta(self):
+        paginas, url = [], '/api/pagamentos/?paginacao=cursor&page_size=7'
+        while url:
+            resposta = self.client.get(url)
+            self.assertEqual(resposta.status_code, 200)
+            paginas.append(resposta.data)
+            url = resposta.data['next']
+        ids = [item['id'] for pagina in paginas for item in pagina['results']]
+        esperados = list(PagamentoFuneraria.objects.order_by('-data_hora_pagto', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, esperados)
+
+        anterior = self.client.get(paginas[2]['previous'])
+        self.assertEqual(anterior.data['results'], paginas[1]['results'])
+
+    def test_ordenacao(self):
+        parametros = {'paginacao': 'cursor'}
+        self.assertEqual(self.client.get('/api/pagamentos/', {**parametros, 'ordering': 'valor_pago'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/clientes/', {**parametros, 'ordering': 'nome'}).status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/pagamentos/', {**parametros, 'ordering': '-data_hora_pagto,-id'}).status_code, 200
+        )
+        self.assertEqual(self.client.get('/api/clientes/', {**parametros, 'ordering': '-id'}).status_code, 200)
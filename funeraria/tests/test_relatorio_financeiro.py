@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from funeraria import sinteticos
+from funeraria.models import FuncionarioFuneraria, PlanoFuneraria
+
+CLIENTES = 10
+
+
+@override_settings(CACHE_RESPOSTAS=None)
+class RelatorioFinanceiroConsultasTest(TestCase):
+    """O número de consultas do relatório financeiro não cresce com a quantidade de planos"""
+
+    def setUp(self):
+        self.gerador = sinteticos.GeradorDados(seed=1)
+        self.gerador.gerar(CLIENTES)
+        self.client = APIClient()
+        self.client.force_authenticate(FuncionarioFuneraria.objects.get(username='sintetico0'))
+        hoje = timezone.localdate()
+        self.chamadas = {
+            'paginada': {},
+            'periodo': {'data_inicio': (hoje - timedelta(days=30)).isoformat(), 'data_fim': hoje.isoformat()},
+        }
+
+    def consultas(self, parametros):
+        resposta = self.client.get('/api/planos/relatorio_financeiro/', parametros)
+        self.assertEqual(resposta.status_code, 200)
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.get('/api/planos/relatorio_financeiro/', parametros)
+        self.assertEqual(resposta.status_code, 200)
+        return len(contexto)
+
+    def test_consultas_constantes(self):
+        iniciais = {nome: self.consultas(parametros) for nome, parametros in self.chamadas.items()}
+        planos = PlanoFuneraria.objects.count()
+
+        self.gerador.gerar(CLIENTES * 9)
+        self.assertGreaterEqual(PlanoFuneraria.objects.count(), planos * 5)
+
+        for nome, parametros in self.chamadas.items():
+            with self.subTest(chamada=nome):
+                self.client.get('/api/planos/relatorio_financeiro/', parametros)
+                with self.assertNumQueries(iniciais[nome]):
+                    resposta = self.client.get('/api/planos/relatorio_financeiro/', parametros)
+                self.assertEqual(resposta.status_code, 200)
+                self.assertTrue(resposta.data['results'])
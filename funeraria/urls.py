@@ -6,7 +6,7 @@ from .views import (
     AuthViewSet, FuncionarioFunerariaViewSet, ClienteFunerariaViewSet,
     DependenteFunerariaViewSet, PlanoFunerariaViewSet, PagamentoFunerariaViewSet,
     ServicoPrestadoFunerariaViewSet, FunerariaStatusViewSet, FunerariaTiposViewSet,
-    DependenteStatusViewSet, DashboardViewSet
+    DependenteStatusViewSet, DashboardViewSet, TarefaExportacaoViewSet, PessoaViewSet, PerfilViewSet
 )
 
 # Configuração do router para as APIs
@@ -20,6 +20,9 @@ router.register(r'servicos', ServicoPrestadoFunerariaViewSet)
 router.register(r'status', FunerariaStatusViewSet)
 router.register(r'tipos-servicos', FunerariaTiposViewSet)
 router.register(r'dependente-status', DependenteStatusViewSet)
+router.register(r'exportacoes', TarefaExportacaoViewSet)
+router.register(r'pessoas', PessoaViewSet, basename='pessoas')
+router.register(r'perfis', PerfilViewSet, basename='perfis')
 router.register(r'auth', AuthViewSet, basename='auth')
 router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 
@@ -0,0 +1,71 @@
+# funeraria/vencimentos.py
+
+from django.db.models import DateField, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from . import registro
+from .cache import invalidar
+from .models import ClienteDependentePlano, ClientePlano, PlanoFuneraria
+
+TAMANHO_LOTE = 10000
+VINCULOS = {'clientes': ClientePlano, 'dependentes': ClienteDependentePlano}
+
+
+def atualizar_em_blocos(queryset, tamanho_lote=TAMANHO_LOTE, **valores):
+    """
+    UPDATE de `queryset` em blocos de até `tamanho_lote` linhas, cada um na
+    sua própria transação (locks curtos), até não restar linha que atenda
+    aos filtros. As linhas atualizadas precisam deixar de atendê-los.
+
+    Os filtros também ficam no UPDATE externo: numa execução simultânea, a
+    linha já alterada pela outra é reavaliada pelo PostgreSQL e ignorada.
+    """
+    total = 0
+    while True:
+        atualizadas = queryset.filter(pk__in=queryset.order_by().values('pk')[:tamanho_lote]).update(**valores)
+        total += atualizadas
+        if atualizadas < tamanho_lote:
+            return total
+
+
+def prorrogar(duracao, hoje):
+    """
+    Novo `data_fim` de um vínculo vencido: somados tantos períodos de
+    `duracao` dias quantos forem necessários para alcançar `hoje`
+    (data - data é um inteiro de dias no PostgreSQL).
+    """
+    return RawSQL(
+        'data_fim + %s * ((%s - data_fim + %s - 1) / %s)', (duracao, hoje, duracao, duracao),
+        output_field=DateField()
+    )
+
+
+def processar_vencimentos(hoje=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Renova e encerra os vínculos de clientes e dependentes a planos vencidos
+    (ativos com `data_fim` anterior a `hoje`), só com UPDATEs em blocos.
+
+    Vínculos de planos com tipo de renovação (duração em dias) e sem
+    `data_fim` do próprio plano vencida são prorrogados; os demais vencidos
+    são desativados. Devolve as quantidades por tipo de vínculo.
+    """
+    hoje = hoje or timezone.localdate()
+    renovacoes = [tipo for tipo in registro.tipos.da_categoria('renovacao') if (tipo.duracao_em_dias or 0) > 0]
+    relatorio = {}
+    for nome, model in VINCULOS.items():
+        vencidos = model.objects.filter(ativo=True, data_fim__lt=hoje)
+        renovados = 0
+        for tipo in renovacoes:
+            planos = PlanoFuneraria.objects.filter(tipo_renovacao=tipo).filter(
+                Q(data_fim__isnull=True) | Q(data_fim__gte=hoje)
+            )
+            renovados += atualizar_em_blocos(
+                vencidos.filter(plano__in=planos.values('pk')), tamanho_lote,
+                data_fim=prorrogar(tipo.duracao_em_dias, hoje)
+            )
+        encerrados = atualizar_em_blocos(vencidos, tamanho_lote, ativo=False)
+        if renovados or encerrados:
+            invalidar(model)
+        relatorio[nome] = {'renovados': renovados, 'encerrados': encerrados}
+    return relatorio
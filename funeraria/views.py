@@ -1,20 +1,20 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status, filters, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Sum, Count, Q
-from django.http import HttpResponse
+from django.http import FileResponse, Http404
 from django.utils.dateparse import parse_date
 from django.utils import timezone
-import csv
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from .models import (
     FuncionarioFuneraria, ClienteFuneraria, DependenteFuneraria,
     PlanoFuneraria, PagamentoFuneraria, ServicoPrestadoFuneraria,
-    FunerariaStatus, FunerariaTipos, DependenteStatus
+    FunerariaStatus, FunerariaTipos, DependenteStatus, TarefaExportacao, ResumoEstatistica,
+    cpf_numerico
 )
 from .serializers import (
     LoginSerializer, FuncionarioFunerariaSerializer,
@@ -22,8 +22,27 @@ from .serializers import (
     PlanoFunerariaSerializer, PagamentoFunerariaSerializer,
     ServicoPrestadoFunerariaSerializer, FunerariaStatusSerializer,
     FunerariaTiposSerializer, DependenteStatusSerializer,
-    ClienteDetalhadoSerializer, PlanoDetalhadoSerializer
+    ClienteDetalhadoSerializer, PlanoDetalhadoSerializer, TarefaExportacaoSerializer,
+    PessoaSerializer
 )
+from . import exportacoes, faturamento, importacoes, registro, relatorios, resumos, services, tarefas
+from .cache import CacheRespostaMixin
+from .otimizacao import OtimizacaoConsultasMixin
+from .perfilamento import PodePerfilar, arquivo_perfil, listar_perfis
+from .serializacao import ListagemRapidaMixin
+from .busca import BuscaTextualFilter, OrdenacaoFilter, pessoas_por_cpf
+from .exportacoes import Coluna, ExportacaoMixin, formatar_data, formatar_data_hora
+
+
+def funcionario_da_requisicao(user):
+    """
+    Funcionário do usuário autenticado. O login JWT autentica o User padrão
+    (AUTH_USER_MODEL não é o funcionário), então a correspondência é pelo
+    username; None se não houver funcionário com esse username.
+    """
+    if isinstance(user, FuncionarioFuneraria):
+        return user
+    return FuncionarioFuneraria.objects.filter(username=user.get_username()).first()
 
 
 class AuthViewSet(viewsets.ViewSet):
@@ -59,9 +78,11 @@ class AuthViewSet(viewsets.ViewSet):
             return Response({'error': 'Token inválido'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class FuncionarioFunerariaViewSet(viewsets.ModelViewSet):
+class FuncionarioFunerariaViewSet(CacheRespostaMixin, OtimizacaoConsultasMixin, ListagemRapidaMixin,
+                                  viewsets.ModelViewSet):
     queryset = FuncionarioFuneraria.objects.all()
     serializer_class = FuncionarioFunerariaSerializer
+    cache_dependencias = [FuncionarioFuneraria]
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['is_active', 'data_nascimento']
@@ -70,38 +91,44 @@ class FuncionarioFunerariaViewSet(viewsets.ModelViewSet):
     ordering = ['-date_joined']
 
 
-class FunerariaStatusViewSet(viewsets.ModelViewSet):
+class FunerariaStatusViewSet(CacheRespostaMixin, OtimizacaoConsultasMixin, ListagemRapidaMixin,
+                             viewsets.ModelViewSet):
     queryset = FunerariaStatus.objects.all()
     serializer_class = FunerariaStatusSerializer
+    cache_dependencias = [FunerariaStatus]
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['status', 'descricao']
     ordering = ['status']
 
 
-class DependenteStatusViewSet(viewsets.ModelViewSet):
+class DependenteStatusViewSet(CacheRespostaMixin, OtimizacaoConsultasMixin, ListagemRapidaMixin,
+                              viewsets.ModelViewSet):
     queryset = DependenteStatus.objects.all()
     serializer_class = DependenteStatusSerializer
+    cache_dependencias = [DependenteStatus]
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['status', 'descricao']
     ordering = ['status']
 
 
-class FunerariaTiposViewSet(viewsets.ModelViewSet):
+class FunerariaTiposViewSet(CacheRespostaMixin, OtimizacaoConsultasMixin, ListagemRapidaMixin,
+                            viewsets.ModelViewSet):
     queryset = FunerariaTipos.objects.all()
     serializer_class = FunerariaTiposSerializer
+    cache_dependencias = [FunerariaTipos]
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['descricao']
     ordering = ['descricao']
 
 
-class PlanoFunerariaViewSet(viewsets.ModelViewSet):
-    queryset = PlanoFuneraria.objects.select_related(
-        'plano_status', 'funcionario_criacao', 'funcionario_atualizacao'
-    ).prefetch_related('pagamentos', 'servicos')
+class PlanoFunerariaViewSet(CacheRespostaMixin, OtimizacaoConsultasMixin, ListagemRapidaMixin,
+                            viewsets.ModelViewSet):
+    queryset = PlanoFuneraria.objects.all()
     serializer_class = PlanoFunerariaSerializer
+    serializers_acoes = {'detalhado': PlanoDetalhadoSerializer}
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['tipo_renovacao', 'plano_status', 'funcionario_criacao']
@@ -121,52 +148,79 @@ class PlanoFunerariaViewSet(viewsets.ModelViewSet):
     @action(detail=True)
     def detalhado(self, request, pk=None):
         plano = self.get_object()
-        plano_data = PlanoDetalhadoSerializer(plano).data
-        total = plano.pagamentos.aggregate(total=Sum('valor_pago'))['total'] or 0
-        plano_data['total_arrecadado'] = total
+        serializer = self.get_serializer(plano)
+        plano_data = serializer.data
+        if 'total_arrecadado' in serializer.fields:
+            total = plano.pagamentos.filter(
+                status_pagamento__in=registro.status_pagos()
+            ).aggregate(total=Sum('valor_pago'))['total'] or 0
+            plano_data['total_arrecadado'] = total
         return Response(plano_data)
     
     @action(detail=False)
     def relatorio_financeiro(self, request):
         data_inicio = request.query_params.get('data_inicio')
         data_fim = request.query_params.get('data_fim')
-        
-        queryset = self.get_queryset()
-        
-        if data_inicio:
-            queryset = queryset.filter(created_at__gte=parse_date(data_inicio))
-        if data_fim:
-            queryset = queryset.filter(created_at__lte=parse_date(data_fim))
-        
-        relatorio = []
-        for plano in queryset:
-            total_arrecadado = plano.pagamentos.aggregate(
-                total=Sum('valor_pago')
-            )['total'] or 0
-            
-            relatorio.append({
-                'plano_id': plano.id,
-                'tipo_renovacao': plano.tipo_renovacao,
-                'valor_mensal': plano.valor_mensal,
-                'total_arrecadado': total_arrecadado,
-                'total_pagamentos': plano.pagamentos.count(),
-                'total_servicos': plano.servicos.count()
-            })
-        
-        return Response(relatorio)
+        formato = request.query_params.get('formato')
 
+        queryset = relatorios.filtrar_periodo(
+            self.filter_queryset(self.get_queryset()), 'created_at',
+            parse_date(data_inicio) if data_inicio else None,
+            parse_date(data_fim) if data_fim else None
+        )
+        linhas = relatorios.relatorio_financeiro(queryset)
 
-class ClienteFunerariaViewSet(viewsets.ModelViewSet):
-    queryset = ClienteFuneraria.objects.select_related(
-        'cliente_status', 'funcionario_cadastro', 'funcionario_atualizacao'
-    ).prefetch_related('dependentes', 'servicos')
+        if formato == 'xlsx':
+            return exportacoes.resposta_xlsx('relatorio_financeiro.xlsx', [(
+                'Planos',
+                relatorios.CABECALHO_RELATORIO_FINANCEIRO,
+                relatorios.linhas_relatorio_financeiro(linhas),
+            )])
+        if formato == 'pdf':
+            return exportacoes.resposta_pdf(
+                'relatorio_financeiro.pdf', 'Relatório Financeiro',
+                [('Planos', relatorios.CABECALHO_RELATORIO_FINANCEIRO,
+                  relatorios.linhas_relatorio_financeiro(linhas))],
+                resumo=relatorios.resumo_financeiro(queryset)
+            )
+        if formato:
+            return Response({'error': 'Formato inválido. Use xlsx ou pdf'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = self.paginate_queryset(linhas)
+        if page is not None:
+            return self.get_paginated_response(
+                [relatorios.linha_relatorio_financeiro(linha) for linha in page]
+            )
+
+        return Response([
+            relatorios.linha_relatorio_financeiro(linha)
+            for linha in linhas.iterator(chunk_size=2000)
+        ])
+
+
+class ClienteFunerariaViewSet(CacheRespostaMixin, OtimizacaoConsultasMixin, ListagemRapidaMixin,
+                              ExportacaoMixin, viewsets.ModelViewSet):
+    queryset = ClienteFuneraria.objects.all()
     serializer_class = ClienteFunerariaSerializer
+    serializers_acoes = {'detalhado': ClienteDetalhadoSerializer, 'buscar_cpf': ClienteDetalhadoSerializer}
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BuscaTextualFilter, OrdenacaoFilter]
     filterset_fields = ['cliente_status', 'funcionario_cadastro', 'data_nascimento']
     search_fields = ['nome', 'cpf', 'email', 'telefone']
+    busca_nome_fields = ['nome']
     ordering_fields = ['nome', 'data_nascimento', 'created_at']
     ordering = ['nome']
+    nome_exportacao = 'clientes'
+    colunas_exportacao = [
+        Coluna('ID', 'id'),
+        Coluna('Nome', 'nome'),
+        Coluna('CPF', 'cpf'),
+        Coluna('Data Nascimento', 'data_nascimento'),
+        Coluna('Telefone', 'telefone'),
+        Coluna('Email', 'email'),
+        Coluna('Status', 'cliente_status__status'),
+        Coluna('Data Cadastro', 'created_at', formatar_data),
+    ]
     
     def perform_create(self, serializer):
         serializer.save(
@@ -180,51 +234,103 @@ class ClienteFunerariaViewSet(viewsets.ModelViewSet):
     @action(detail=True)
     def detalhado(self, request, pk=None):
         cliente = self.get_object()
-        return Response(ClienteDetalhadoSerializer(cliente).data)
+        return Response(self.get_serializer(cliente).data)
     
     @action(detail=False, methods=['get'])
     def buscar_cpf(self, request):
         cpf = request.query_params.get('cpf')
         if not cpf:
             return Response({'error': 'CPF é obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
+        if cpf_numerico(cpf) is None:
+            return Response({'error': 'CPF inválido'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            cliente = ClienteFuneraria.objects.get(cpf=cpf)
-            return Response(ClienteDetalhadoSerializer(cliente).data)
+            cliente = self.get_queryset().por_cpf(cpf).get()
+            return Response(self.get_serializer(cliente).data)
         except ClienteFuneraria.DoesNotExist:
             return Response({'error': 'Cliente não encontrado'}, status=status.HTTP_404_NOT_FOUND)
     
-    @action(detail=False)
-    def exportar_csv(self, request):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="clientes.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'Nome', 'CPF', 'Data Nascimento', 'Telefone', 
-            'Email', 'Status', 'Data Cadastro'
-        ])
-        
-        for cliente in self.get_queryset():
-            writer.writerow([
-                cliente.id, cliente.nome, cliente.cpf, cliente.data_nascimento,
-                cliente.telefone, cliente.email, cliente.cliente_status.status,
-                cliente.created_at.strftime('%d/%m/%Y')
-            ])
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """
+        Planilhas CSV ou XLSX de clientes e/ou dependentes (multipart, campos
+        `clientes` e `dependentes`); com ?simular=1 só devolve o relatório
+        """
+        arquivos = {nome: request.FILES.get(nome) for nome in ('clientes', 'dependentes')}
+        if not any(arquivos.values()):
+            return Response(
+                {'error': 'Envie o arquivo de clientes e/ou de dependentes'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        funcionario = funcionario_da_requisicao(request.user)
+        if funcionario is None:
+            return Response(
+                {'error': 'Usuário sem cadastro de funcionário para registrar a importação'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        simular = request.query_params.get('simular', '').lower() in ('1', 'true', 'sim')
+        try:
+            linhas = {
+                nome: importacoes.iterar_linhas(arquivo, importacoes.formato_do_arquivo(
+                    arquivo.name, arquivo.content_type, importacoes.FORMATOS_PLANILHA
+                ))
+                for nome, arquivo in arquivos.items() if arquivo is not None
+            }
+            relatorio = importacoes.importar_pessoas(funcionario, simular=simular, **linhas)
+        except importacoes.ArquivoInvalido as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return response
+        resultados = [relatorio[nome] for nome in linhas]
+        if simular:
+            codigo = status.HTTP_200_OK
+        elif any(resultado.importados for resultado in resultados):
+            codigo = status.HTTP_201_CREATED
+        else:
+            codigo = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {'simulacao': simular, **{nome: relatorio[nome].como_dict() for nome in linhas}}, status=codigo
+        )
+    
 
+class PessoaViewSet(CacheRespostaMixin, viewsets.ViewSet):
+    """Busca unificada de clientes e dependentes"""
+    permission_classes = [IsAuthenticated]
+    cache_dependencias = [ClienteFuneraria, DependenteFuneraria]
+    
+    @action(detail=False, methods=['get'])
+    def buscar_cpf(self, request):
+        cpf = request.query_params.get('cpf')
+        if not cpf:
+            return Response({'error': 'CPF é obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
+        if cpf_numerico(cpf) is None:
+            return Response({'error': 'CPF inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        pessoas = list(pessoas_por_cpf(cpf))
+        if not pessoas:
+            return Response({'error': 'Nenhum cliente ou dependente encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PessoaSerializer(pessoas, many=True, context={'request': request}).data)
+    
 
-class DependenteFunerariaViewSet(viewsets.ModelViewSet):
-    queryset = DependenteFuneraria.objects.select_related(
-        'cliente', 'dependente_status', 'funcionario_criacao', 'funcionario_atualizacao'
-    )
+class DependenteFunerariaViewSet(CacheRespostaMixin, OtimizacaoConsultasMixin, ListagemRapidaMixin,
+                                 ExportacaoMixin, viewsets.ModelViewSet):
+    queryset = DependenteFuneraria.objects.all()
     serializer_class = DependenteFunerariaSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BuscaTextualFilter, OrdenacaoFilter]
     filterset_fields = ['cliente', 'dependente_status', 'genero', 'funcionario_criacao']
     search_fields = ['nome', 'cpf']
+    busca_nome_fields = ['nome']
     ordering_fields = ['nome', 'data_nascimento', 'created_at']
     ordering = ['nome']
+    nome_exportacao = 'dependentes'
+    colunas_exportacao = [
+        Coluna('ID', 'id'),
+        Coluna('Nome', 'nome'),
+        Coluna('CPF', 'cpf'),
+        Coluna('Data Nascimento', 'data_nascimento'),
+        Coluna('Gênero', 'genero'),
+        Coluna('Telefone', 'telefone'),
+        Coluna('Cliente', 'cliente__nome'),
+        Coluna('Status', 'dependente_status__status'),
+        Coluna('Data Cadastro', 'created_at', formatar_data),
+    ]
     
     def perform_create(self, serializer):
         serializer.save(
@@ -246,17 +352,57 @@ class DependenteFunerariaViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class PagamentoFunerariaViewSet(viewsets.ModelViewSet):
-    queryset = PagamentoFuneraria.objects.select_related(
-        'plano_funeraria', 'status_pagamento'
-    )
+class PagamentoFunerariaViewSet(CacheRespostaMixin, OtimizacaoConsultasMixin, ListagemRapidaMixin,
+                                ExportacaoMixin, viewsets.ModelViewSet):
+    queryset = PagamentoFuneraria.objects.all()
     serializer_class = PagamentoFunerariaSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['plano_funeraria', 'status_pagamento', 'forma_pagamento']
+    filterset_fields = ['plano_funeraria', 'status_pagamento', 'competencia']
     search_fields = ['valor_pago']
     ordering_fields = ['data_hora_pagto', 'valor_pago', 'created_at']
     ordering = ['-data_hora_pagto']
+    ordenacao_cursor = ('-data_hora_pagto', '-id')
+    nome_exportacao = 'pagamentos'
+    colunas_exportacao = [
+        Coluna('ID', 'id'),
+        Coluna('Plano', 'plano_funeraria_id'),
+        Coluna('Valor Pago', 'valor_pago'),
+        Coluna('Data/Hora Pagamento', 'data_hora_pagto', formatar_data_hora),
+        Coluna('Status', 'status_pagamento__status'),
+        Coluna('Data Cadastro', 'created_at', formatar_data),
+    ]
+    
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """Lote de pagamentos em JSON ou CSV; linhas inválidas voltam com os erros sem impedir as demais"""
+        try:
+            linhas = importacoes.linhas_da_requisicao(request, 'pagamentos')
+        except importacoes.ArquivoInvalido as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if not linhas:
+            return Response({'error': 'Nenhum pagamento informado'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        resultado = importacoes.importar_pagamentos(linhas)
+        return Response(
+            resultado.como_dict(),
+            status=status.HTTP_201_CREATED if resultado.importados else status.HTTP_400_BAD_REQUEST
+        )
+    
+    @action(detail=False, methods=['post'])
+    def faturar(self, request):
+        """Gera as mensalidades pendentes da competência (AAAA-MM, padrão: mês corrente); pode ser repetido"""
+        try:
+            resultado = faturamento.faturar(request.data.get('competencia'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except FunerariaStatus.DoesNotExist:
+            return Response(
+                {'error': 'Cadastre o status "Pendente" na categoria pagamento'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            resultado.como_dict(), status=status.HTTP_201_CREATED if resultado.geradas else status.HTTP_200_OK
+        )
     
     @action(detail=False)
     def historico_plano(self, request):
@@ -267,35 +413,52 @@ class PagamentoFunerariaViewSet(viewsets.ModelViewSet):
         pagamentos = self.get_queryset().filter(plano_funeraria_id=plano_id)
         serializer = self.get_serializer(pagamentos, many=True)
         
-        total_pago = pagamentos.aggregate(total=Sum('valor_pago'))['total'] or 0
+        totais = pagamentos.aggregate(total=Sum('valor_pago'), quantidade=Count('id'))
         
         return Response({
             'pagamentos': serializer.data,
-            'total_pago': total_pago,
-            'quantidade_pagamentos': pagamentos.count()
+            'total_pago': totais['total'] or 0,
+            'quantidade_pagamentos': totais['quantidade']
         })
     
     @action(detail=False)
     def relatorio_periodo(self, request):
         data_inicio = request.query_params.get('data_inicio')
         data_fim = request.query_params.get('data_fim')
-        
-        queryset = self.get_queryset()
-        
-        if data_inicio:
-            queryset = queryset.filter(data_hora_pagto__gte=parse_date(data_inicio))
-        if data_fim:
-            queryset = queryset.filter(data_hora_pagto__lte=parse_date(data_fim))
-        
-        formas_pagamento = queryset.values('forma_pagamento').annotate(
-            total=Sum('valor_pago'),
-            quantidade=Count('id')
-        ).order_by('-total')
-        
-        total_geral = queryset.aggregate(total=Sum('valor_pago'))['total'] or 0
-        
+        formato = request.query_params.get('formato')
+
+        queryset = relatorios.filtrar_periodo(
+            self.get_queryset(), 'data_hora_pagto',
+            parse_date(data_inicio) if data_inicio else None,
+            parse_date(data_fim) if data_fim else None
+        )
+        por_status, total_geral = relatorios.relatorio_periodo(queryset)
+
+        cabecalho_status = ['Status', 'Quantidade', 'Total (R$)']
+        linhas_status = [
+            [linha['status_pagamento'], linha['quantidade'], linha['total']] for linha in por_status
+        ]
+        if formato == 'xlsx':
+            return exportacoes.resposta_xlsx('relatorio_periodo.xlsx', [
+                ('Resumo', cabecalho_status, linhas_status + [['Total geral', None, total_geral]]),
+                ('Pagamentos', [coluna.titulo for coluna in self.colunas_exportacao],
+                 exportacoes.iterar_linhas(queryset, self.colunas_exportacao, formatar=False)),
+            ])
+        if formato == 'pdf':
+            return exportacoes.resposta_pdf(
+                'relatorio_periodo.pdf', 'Relatório de Pagamentos por Período',
+                [('Pagamentos por status', cabecalho_status, linhas_status)],
+                resumo=[
+                    ('Início', data_inicio or '-'),
+                    ('Fim', data_fim or '-'),
+                    ('Total geral (R$)', total_geral),
+                ]
+            )
+        if formato:
+            return Response({'error': 'Formato inválido. Use xlsx ou pdf'}, status=status.HTTP_400_BAD_REQUEST)
+
         return Response({
-            'formas_pagamento': formas_pagamento,
+            'status_pagamento': por_status,
             'total_geral': total_geral,
             'periodo': {
                 'data_inicio': data_inicio,
@@ -304,10 +467,9 @@ class PagamentoFunerariaViewSet(viewsets.ModelViewSet):
         })
 
 
-class ServicoPrestadoFunerariaViewSet(viewsets.ModelViewSet):
-    queryset = ServicoPrestadoFuneraria.objects.select_related(
-        'cliente', 'plano', 'tipo', 'funcionario_criacao', 'funcionario_atualizacao'
-    )
+class ServicoPrestadoFunerariaViewSet(CacheRespostaMixin, OtimizacaoConsultasMixin, ListagemRapidaMixin,
+                                      ExportacaoMixin, viewsets.ModelViewSet):
+    queryset = ServicoPrestadoFuneraria.objects.all()
     serializer_class = ServicoPrestadoFunerariaSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -315,14 +477,26 @@ class ServicoPrestadoFunerariaViewSet(viewsets.ModelViewSet):
     search_fields = ['observacoes']
     ordering_fields = ['data_hora_servico', 'created_at']
     ordering = ['-data_hora_servico']
+    ordenacao_cursor = ('-data_hora_servico', '-id')
+    nome_exportacao = 'servicos'
+    colunas_exportacao = [
+        Coluna('ID', 'id'),
+        Coluna('Data/Hora Serviço', 'data_hora_servico', formatar_data_hora),
+        Coluna('Cliente', 'cliente__nome'),
+        Coluna('Tipo', 'tipo__descricao'),
+        Coluna('Plano', 'plano_id'),
+        Coluna('Observações', 'observacoes'),
+        Coluna('Data Cadastro', 'created_at', formatar_data),
+    ]
     
     def perform_create(self, serializer):
         cliente = serializer.validated_data.get('cliente')
         
-        plano = None
-        if cliente:
+        plano = serializer.validated_data.get('plano')
+        if plano is None and cliente:
             plano = PlanoFuneraria.objects.filter(
-                cliente=cliente,
+                clientes_plano__cliente=cliente,
+                clientes_plano__ativo=True,
                 plano_status__status='Ativo'
             ).first()
         
@@ -332,18 +506,7 @@ class ServicoPrestadoFunerariaViewSet(viewsets.ModelViewSet):
             data_hora_servico=timezone.now(),
             plano=plano
         )
-        
-        tipo_servico = servico.tipo
-        if tipo_servico.valor and tipo_servico.valor > 0:
-            status_pendente = FunerariaStatus.objects.get(status='Pendente')
-            PagamentoFuneraria.objects.create(
-                valor_pago=tipo_servico.valor,
-                data_hora_pagto=timezone.now(),
-                forma_pagamento='PIX',
-                plano_funeraria=plano,
-                status_pagamento=status_pendente,
-                created_at=timezone.now()
-            )
+        services.registrar_cobranca(servico)
     
     def perform_update(self, serializer):
         serializer.save(funcionario_atualizacao=self.request.user)
@@ -370,11 +533,14 @@ class ServicoPrestadoFunerariaViewSet(viewsets.ModelViewSet):
         if data_fim:
             queryset = queryset.filter(data_hora_servico__lte=parse_date(data_fim))
         
-        tipos_servico = queryset.values(
-            'tipo__id', 'tipo__descricao'
-        ).annotate(
-            quantidade=Count('id')
-        ).order_by('-quantidade')
+        tipos_servico = [
+            {'tipo__id': linha['tipo'],
+             'tipo__descricao': getattr(registro.tipos.por_id(linha['tipo']), 'descricao', None),
+             'quantidade': linha['quantidade']}
+            for linha in queryset.order_by().values('tipo').annotate(
+                quantidade=Count('id')
+            ).order_by('-quantidade')
+        ]
         
         return Response({
             'tipos_servico': tipos_servico,
@@ -386,43 +552,125 @@ class ServicoPrestadoFunerariaViewSet(viewsets.ModelViewSet):
         })
 
 
-class DashboardViewSet(viewsets.ViewSet):
+class TarefaExportacaoViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
+                              mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Exportações em segundo plano: solicitar, acompanhar o progresso e baixar"""
+    queryset = TarefaExportacao.objects.select_related('funcionario')
+    serializer_class = TarefaExportacaoSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['tipo', 'formato', 'status']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            funcionario = funcionario_da_requisicao(self.request.user)
+            queryset = queryset.filter(funcionario=funcionario) if funcionario else queryset.none()
+        return queryset
+    
+    def create(self, request, *args, **kwargs):
+        self.funcionario = funcionario_da_requisicao(request.user)
+        if self.funcionario is None:
+            return Response(
+                {'error': 'Usuário sem cadastro de funcionário para registrar a exportação'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().create(request, *args, **kwargs)
+    
+    def perform_create(self, serializer):
+        tarefa = serializer.save(funcionario=self.funcionario)
+        tarefas.enfileirar(tarefa)
+    
+    @action(detail=True)
+    def download(self, request, pk=None):
+        tarefa = self.get_object()
+        if tarefa.status != 'concluida' or not tarefa.arquivo:
+            return Response(
+                {'error': 'A exportação ainda não foi concluída', 'status': tarefa.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(
+            tarefa.arquivo.open('rb'), as_attachment=True,
+            filename=f'{tarefa.tipo}_{tarefa.pk}.{tarefa.formato}'
+        )
+
+
+class PerfilViewSet(viewsets.ViewSet):
+    """Perfis gravados pelo PerfilamentoMiddleware: listagem e download (.prof ou resumo .txt)"""
+    permission_classes = [PodePerfilar]
+    lookup_value_regex = r'[^/]+'
+    
+    def list(self, request):
+        return Response([
+            {
+                'nome': caminho.stem,
+                'criado_em': datetime.fromtimestamp(caminho.stat().st_mtime).astimezone().isoformat(),
+                'tamanho': caminho.stat().st_size,
+                'perfil': request.build_absolute_uri(f'{caminho.name}/'),
+                'resumo': request.build_absolute_uri(f'{caminho.stem}.txt/'),
+            }
+            for caminho in listar_perfis()
+        ])
+    
+    def retrieve(self, request, pk=None):
+        caminho = arquivo_perfil(pk)
+        if caminho is None:
+            raise Http404
+        return FileResponse(caminho.open('rb'), as_attachment=caminho.suffix == '.prof', filename=caminho.name)
+
+
+def inicio_mes_atual():
+    return timezone.localdate().replace(day=1)
+
+
+class DashboardViewSet(CacheRespostaMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
+    cache_dependencias = [*resumos.METRICAS, ResumoEstatistica, FunerariaStatus]
+    
+    def get_cache_variacao(self):
+        # Os totais do mês mudam na virada do mês mesmo sem gravações
+        return inicio_mes_atual().isoformat()
     
     @action(detail=False)
     def estatisticas(self, request):
-        hoje = datetime.now().date()
-        inicio_mes = hoje.replace(day=1)
-        
-        total_clientes = ClienteFuneraria.objects.count()
-        total_dependentes = DependenteFuneraria.objects.count()
-        total_planos = PlanoFuneraria.objects.count()
+        # Lê os resumos pré-agregados (funeraria/resumos.py) em vez de varrer o histórico
+        inicio_mes = inicio_mes_atual()
+        resumo = resumos.obter(
+            ('total', resumos.DATA_ACUMULADO, ['clientes', 'dependentes', 'planos', 'clientes_status']),
+            ('mes', inicio_mes, ['servicos', 'pagamentos', 'pagamentos_status']),
+        )
         
-        servicos_mes = ServicoPrestadoFuneraria.objects.filter(
-            data_hora_servico__gte=inicio_mes
-        ).count()
+        def quantidade(periodo, metrica):
+            return resumo.get((periodo, metrica, ''), (0, 0))[0]
         
-        pagamentos_mes = PagamentoFuneraria.objects.filter(
-            data_hora_pagto__gte=inicio_mes
+        quantidades_status = {
+            int(chave): total for (periodo, metrica, chave), (total, _) in resumo.items()
+            if metrica == 'clientes_status' and total > 0
+        }
+        clientes_por_status = sorted(
+            (
+                {'cliente_status__status': getattr(registro.status.por_id(status_id), 'status', None),
+                 'quantidade': total}
+                for status_id, total in quantidades_status.items()
+            ),
+            key=lambda item: item['cliente_status__status'] or ''
         )
-        valor_arrecadado_mes = pagamentos_mes.aggregate(
-            total=Sum('valor_pago')
-        )['total'] or 0
-        
-        clientes_por_status = ClienteFuneraria.objects.values(
-            'cliente_status__status'
-        ).annotate(quantidade=Count('id'))
         
         return Response({
             'totais': {
-                'clientes': total_clientes,
-                'dependentes': total_dependentes,
-                'planos': total_planos,
-                'servicos_mes': servicos_mes
+                'clientes': quantidade('total', 'clientes'),
+                'dependentes': quantidade('total', 'dependentes'),
+                'planos': quantidade('total', 'planos'),
+                'servicos_mes': quantidade('mes', 'servicos')
             },
             'financeiro': {
-                'valor_arrecadado_mes': valor_arrecadado_mes,
-                'quantidade_pagamentos_mes': pagamentos_mes.count()
+                # Só pagamentos com status pago: as mensalidades faturadas nascem pendentes
+                'valor_arrecadado_mes': sum(
+                    resumo.get(('mes', 'pagamentos_status', str(status_id)), (0, 0))[1] or 0
+                    for status_id in registro.status_pagos()
+                ),
+                'quantidade_pagamentos_mes': quantidade('mes', 'pagamentos')
             },
-            'clientes_por_status': list(clientes_por_status)
-        })
\ No newline at end of file
+            'clientes_por_status': clientes_por_status
+        })
@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third party apps
     'rest_framework',
@@ -37,12 +38,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'funeraria.metricas.MetricasMiddleware',
+    'funeraria.instrumentacao.InstrumentacaoSQLMiddleware',
+    'funeraria.instrumentacao.ConsultasLentasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'funeraria.perfilamento.PerfilamentoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -104,6 +109,95 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Exportações em segundo plano (pool de threads local, sem broker externo). Os arquivos, com dados
+# pessoais, ficam em EXPORTACAO_PASTA, fora de MEDIA_ROOT: só são baixados pela API, com permissão
+EXPORTACAO_MAX_WORKERS = int(os.environ.get('EXPORTACAO_MAX_WORKERS', 2))
+EXPORTACAO_PASTA = os.environ.get('EXPORTACAO_PASTA', str(BASE_DIR / 'exportacoes'))
+
+# Cache das respostas GET da API (funeraria/cache.py). As chaves incluem a versão
+# das tabelas lidas, então não há expiração por tempo e um cache por processo
+# nunca serve dados antigos; um cache compartilhado (Redis, Memcached) aumenta
+# o aproveitamento entre workers. CACHE_RESPOSTAS = None desativa.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'respostas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'respostas',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+CACHE_RESPOSTAS = 'respostas'
+
+# Instrumentação SQL por requisição (funeraria/instrumentacao.py): quantidade, tempo e
+# consultas repetidas (N+1) nos cabeçalhos X-SQL-* e no logger 'funeraria.sql'.
+# Desligada por padrão; em produção, AMOSTRAGEM mede só uma fração das requisições.
+INSTRUMENTACAO_SQL = {
+    'ATIVA': os.environ.get('INSTRUMENTACAO_SQL', '0') == '1',
+    'AMOSTRAGEM': float(os.environ.get('INSTRUMENTACAO_SQL_AMOSTRAGEM', 1.0)),
+    'LIMITE_REPETICOES': int(os.environ.get('INSTRUMENTACAO_SQL_LIMITE_REPETICOES', 5)),
+    'CABECALHOS': True,
+}
+
+# Log de consultas lentas (funeraria/instrumentacao.py): consultas acima de LIMITE_MS com a view e a
+# ação de origem, no arquivo rotativo do logger 'funeraria.sql.lentas'. Uma fração (AMOSTRAGEM_EXPLAIN)
+# dos SELECTs lentos ganha o plano de EXPLAIN (ANALYZE, BUFFERS), no máximo um a cada INTERVALO_EXPLAIN
+# segundos por forma de consulta (o EXPLAIN ANALYZE executa a consulta de novo). O arquivo tem SQL e
+# URLs com CPFs: fica fora do controle de versão (.gitignore) e não deve ir para pastas públicas.
+CONSULTAS_LENTAS = {
+    'ATIVA': os.environ.get('CONSULTAS_LENTAS', '0') == '1',
+    'LIMITE_MS': float(os.environ.get('CONSULTAS_LENTAS_LIMITE_MS', 500)),
+    'AMOSTRAGEM_EXPLAIN': float(os.environ.get('CONSULTAS_LENTAS_AMOSTRAGEM_EXPLAIN', 0.2)),
+    'INTERVALO_EXPLAIN': float(os.environ.get('CONSULTAS_LENTAS_INTERVALO_EXPLAIN', 300)),
+}
+
+# Perfilamento sob demanda (funeraria/perfilamento.py): ?perfil=1 ou X-Perfil: 1, para quem
+# tem a permissão funeraria.perfilar_requisicoes; no máximo MAX_PERFIS perfis em PASTA, que
+# não pode ser servida publicamente (fora de MEDIA_ROOT): os resumos têm usuários e URLs com CPFs
+PERFILAMENTO = {
+    'PASTA': os.environ.get('PERFILAMENTO_PASTA', str(BASE_DIR / 'perfis')),
+    'MAX_PERFIS': int(os.environ.get('PERFILAMENTO_MAX_PERFIS', 50)),
+}
+
+# Métricas por view e ação (funeraria/metricas.py), no formato do Prometheus em /metricas/.
+# Com vários workers (gunicorn), PASTA é um diretório local ao host onde cada processo grava
+# o próprio estado a cada INTERVALO_GRAVACAO segundos; os arquivos de workers encerrados são
+# somados em um só. O acesso exige o TOKEN (Authorization: Bearer <token>) e um REMOTE_ADDR
+# em IPS_PERMITIDOS; sem TOKEN, /metricas/ recusa todas as requisições.
+METRICAS = {
+    'ATIVA': os.environ.get('METRICAS', '0') == '1',
+    'PASTA': os.environ.get('METRICAS_PASTA', ''),
+    'INTERVALO_GRAVACAO': float(os.environ.get('METRICAS_INTERVALO_GRAVACAO', 5)),
+    'TOKEN': os.environ.get('METRICAS_TOKEN', ''),
+    'IPS_PERMITIDOS': os.environ.get('METRICAS_IPS_PERMITIDOS', '127.0.0.1,::1').split(','),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'data': {'format': '%(asctime)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+        'consultas_lentas': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.environ.get('CONSULTAS_LENTAS_ARQUIVO', str(BASE_DIR / 'consultas_lentas.log')),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'data',
+        },
+    },
+    'loggers': {
+        'funeraria.sql': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'funeraria.sql.lentas': {'handlers': ['consultas_lentas'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -116,7 +210,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'funeraria.paginacao.PaginacaoPadrao',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
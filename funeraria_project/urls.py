@@ -5,10 +5,13 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
 
+from funeraria.metricas import metricas_view
+
 urlpatterns = [
     path('', lambda request: redirect('/admin/')),  # redireciona "/" para "/admin/"
     path('admin/', admin.site.urls),
     path('api/', include('funeraria.urls')),
+    path('metricas/', metricas_view, name='metricas'),
 ]
 
 if settings.DEBUG: